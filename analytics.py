@@ -0,0 +1,180 @@
+"""
+Vectorized spending analytics.
+
+A user's spending is loaded as column arrays (days as int64 day numbers,
+amounts as float64, categories as int codes into a names array) and every
+statistic is a handful of NumPy operations over those columns. The columns
+come from the daily rollup, which already holds one row per (day, category),
+so the load stays small even for users with 100k+ expenses.
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+
+import numpy as np
+
+from extensions import db
+from models import ExpenseDailyRollup
+
+# Column arrays for one user's spending; codes index into names
+SpendingColumns = namedtuple('SpendingColumns', 'days amounts codes names')
+
+EPOCH = date(1970, 1, 1)
+
+
+def to_day_number(day):
+    """Convert a date to days since 1970-01-01 (the datetime64[D] integer)."""
+    return (day - EPOCH).days
+
+
+def from_day_number(number):
+    return EPOCH + timedelta(days=int(number))
+
+
+def build_columns(days, amounts, categories):
+    """
+    Build SpendingColumns from parallel sequences
+
+    Args:
+        days: Dates of each row
+        amounts: Amount of each row
+        categories: Category name of each row
+    """
+    names, codes = np.unique(np.asarray(categories, dtype=object).astype(str), return_inverse=True)
+    return SpendingColumns(
+        days=np.asarray(days, dtype='datetime64[D]').astype(np.int64),
+        amounts=np.asarray(amounts, dtype=np.float64),
+        codes=codes.astype(np.int64),
+        names=names
+    )
+
+
+def load_columns(user_id, start=None, end=None):
+    """Load a user's (day, category, total) buckets from the daily rollup as columns."""
+    query = db.session.query(
+        ExpenseDailyRollup.day,
+        ExpenseDailyRollup.category,
+        ExpenseDailyRollup.total
+    ).filter(ExpenseDailyRollup.user_id == user_id)
+    if start is not None:
+        query = query.filter(ExpenseDailyRollup.day >= start)
+    if end is not None:
+        query = query.filter(ExpenseDailyRollup.day < end)
+
+    rows = query.all()
+    if not rows:
+        return build_columns([], [], [])
+    days, categories, totals = zip(*rows)
+    return build_columns(days, totals, categories)
+
+
+def category_breakdown(columns, top_n=5):
+    """
+    Get totals and shares per category, largest first
+
+    Returns:
+        tuple: (list of {category, total, share} dicts, total spend)
+    """
+    totals = np.bincount(columns.codes, weights=columns.amounts, minlength=len(columns.names))
+    total_spend = float(totals.sum())
+    shares = totals / total_spend * 100 if total_spend else np.zeros_like(totals)
+    order = np.argsort(-totals, kind='stable')
+    if top_n is not None:
+        order = order[:top_n]
+    return [{
+        'category': str(columns.names[index]),
+        'total': float(totals[index]),
+        'share': float(shares[index])
+    } for index in order], total_spend
+
+
+def daily_series(columns, end_day, days):
+    """Total spend per day for the ``days`` days ending on end_day (inclusive)."""
+    first = end_day - days + 1
+    in_window = (columns.days >= first) & (columns.days <= end_day)
+    return np.bincount(columns.days[in_window] - first, weights=columns.amounts[in_window], minlength=days)
+
+
+def rolling_mean(series, window):
+    """Trailing mean over ``window`` entries; the first window - 1 entries average what is available."""
+    sums = np.cumsum(np.concatenate(([0.0], series)))
+    counts = np.minimum(np.arange(1, len(series) + 1), window)
+    starts = np.arange(1, len(series) + 1) - counts
+    return (sums[1:] - sums[starts]) / counts
+
+
+def monthly_totals(columns, end_day, months):
+    """Total spend for each of the ``months`` calendar months ending with end_day's month."""
+    month_index = columns.days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    last = np.datetime64(from_day_number(end_day), 'M').astype(np.int64)
+    first = last - months + 1
+    in_window = (month_index >= first) & (month_index <= last)
+    totals = np.bincount(month_index[in_window] - first, weights=columns.amounts[in_window], minlength=months)
+    labels = np.arange(first, last + 1).astype('datetime64[M]').astype(str)
+    return labels, totals
+
+
+def _first_month_day(end_day, months):
+    """Day number of the first day of the month ``months - 1`` months before end_day's month."""
+    first_month = np.datetime64(from_day_number(end_day), 'M') - (months - 1)
+    return int(first_month.astype('datetime64[D]').astype(np.int64))
+
+
+def window_start(today, days=90, months=12):
+    """First day analyze() reads for these windows, to limit what load_columns fetches."""
+    end_day = to_day_number(today)
+    return from_day_number(min(_first_month_day(end_day, months), end_day - days - 28))
+
+
+def analyze(columns, today=None, top_n=5, days=90, months=12):
+    """
+    Compute the spending analytics payload from SpendingColumns
+
+    Args:
+        columns: SpendingColumns covering at least window_start(today, days, months)
+        today: Last day of the rolling and monthly windows
+        top_n: Number of categories to return
+        days: Length of the daily series the rolling averages are reported over
+        months: Number of calendar months for the category and month-over-month views
+
+    Returns:
+        dict: categories, rolling 7/30-day averages and month-over-month deltas
+    """
+    today = today or date.today()
+    end_day = to_day_number(today)
+
+    # Category totals and shares over the same calendar months as the monthly view
+    in_months = (columns.days >= _first_month_day(end_day, months)) & (columns.days <= end_day)
+    categories, total_spend = category_breakdown(SpendingColumns(
+        columns.days[in_months], columns.amounts[in_months], columns.codes[in_months], columns.names
+    ), top_n)
+
+    # Extra 29 days of history so the first reported 30-day average is complete
+    padded = daily_series(columns, end_day, days + 29)
+    rolling_7 = rolling_mean(padded, 7)[29:]
+    rolling_30 = rolling_mean(padded, 30)[29:]
+    day_labels = np.arange(end_day - days + 1, end_day + 1).astype('datetime64[D]').astype(str)
+
+    month_labels, month_values = monthly_totals(columns, end_day, months)
+    deltas = np.diff(month_values, prepend=np.nan)
+    previous = np.concatenate(([np.nan], month_values[:-1]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        changes = np.where(previous > 0, deltas / previous * 100, np.nan)
+
+    return {
+        'totalSpend': total_spend,
+        'topCategories': categories,
+        'rolling': {
+            'labels': day_labels.tolist(),
+            'daily': padded[29:].tolist(),
+            'average7': rolling_7.tolist(),
+            'average30': rolling_30.tolist(),
+            'current7': float(rolling_7[-1]),
+            'current30': float(rolling_30[-1])
+        },
+        'monthly': [{
+            'month': label,
+            'total': float(total),
+            'delta': None if np.isnan(delta) else float(delta),
+            'changePercent': None if np.isnan(change) else float(change)
+        } for label, total, delta, change in zip(month_labels, month_values, deltas, changes)]
+    }
@@ -0,0 +1,269 @@
+"""
+Nightly batch recompute of derived per-user data.
+
+Users are split into shards by id range, and the shards are spread over a
+ProcessPoolExecutor. Each worker process opens its own database engine and
+walks its shard in chunks of users, recomputing the selected tasks in bulk:
+
+- rollups: the daily and monthly expense rollups (rollups.py)
+- forecasts: goal completion forecasts (forecasting.py)
+- insights: financial advice and goal on-track counts (UserInsight)
+
+Finished shards are recorded in a JSON checkpoint file, so an interrupted run
+continues where it stopped with --resume.
+
+    flask recompute --workers 8 --checkpoint recompute.json --resume
+
+On SQLite the workers' writes are serialized by the database lock, so only
+the compute part scales with cores; use PostgreSQL or sharding (shards.py)
+for large runs. With sharding, each worker walks its id range on every
+shard.
+"""
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import load_only
+
+import forecasting
+import rollups
+import shards
+from cache import bump_data_versions
+from extensions import db
+from models import FinancialGoal, ShardDirectory, User, UserInsight
+from utils import generate_financial_advice
+
+logger = logging.getLogger(__name__)
+
+TASKS = ('rollups', 'forecasts', 'insights')
+SHARD_SIZE = 10000
+CHUNK_SIZE = 1000
+
+
+def shard_ranges(first_id, last_id, shard_size=SHARD_SIZE):
+    """Split the ids first_id..last_id (inclusive) into half-open (start, end) ranges."""
+    return [(start, min(start + shard_size, last_id + 1))
+            for start in range(first_id, last_id + 1, shard_size)]
+
+
+def compute_insights(user_range, computed_at=None):
+    """
+    Replace the UserInsight rows of every user with first <= id < last
+
+    Args:
+        user_range: (first, last) user id range
+        computed_at: Timestamp stored on the rows
+
+    Returns:
+        int: Number of rows written
+    """
+    computed_at = computed_at or datetime.utcnow()
+    first, last = user_range
+
+    users = db.session.execute(
+        select(User.id, User.monthly_income, User.savings_goal, User.emergency_fund)
+        .where(User.id >= first, User.id < last)
+    ).all()
+
+    # user_id: [total, completed, on track]
+    goal_counts = defaultdict(lambda: [0, 0, 0])
+    goals = FinancialGoal.query.options(load_only(
+        FinancialGoal.user_id, FinancialGoal.target_amount, FinancialGoal.current_amount,
+        FinancialGoal.start_date, FinancialGoal.target_date, FinancialGoal.is_completed
+    )).filter(FinancialGoal.user_id >= first, FinancialGoal.user_id < last).yield_per(CHUNK_SIZE)
+    for goal in goals:
+        counts = goal_counts[goal.user_id]
+        counts[0] += 1
+        counts[1] += bool(goal.is_completed)
+        counts[2] += goal.is_on_track()
+
+    rows = []
+    for user_id, monthly_income, savings_goal, emergency_fund in users:
+        total, completed, on_track = goal_counts.get(user_id, (0, 0, 0))
+        rows.append({
+            'user_id': user_id,
+            'advice': generate_financial_advice({
+                'monthlyIncome': monthly_income or 0,
+                'savingsGoal': savings_goal or 0,
+                'emergencyFund': emergency_fund or 0
+            }),
+            'goals_total': total,
+            'goals_completed': completed,
+            'goals_on_track': on_track,
+            'computed_at': computed_at
+        })
+
+    db.session.execute(delete(UserInsight).where(UserInsight.user_id >= first, UserInsight.user_id < last))
+    if rows:
+        db.session.execute(insert(UserInsight), rows)
+    return len(rows)
+
+
+def recompute_range(user_range, tasks=TASKS, chunk_size=CHUNK_SIZE, today=None):
+    """
+    Run tasks for every user with first <= id < last, committing after each chunk of ids
+
+    Returns:
+        int: Number of users processed
+    """
+    today = today or date.today()
+    computed_at = datetime.utcnow()
+    processed = 0
+    for start in range(user_range[0], user_range[1], chunk_size):
+        chunk = (start, min(start + chunk_size, user_range[1]))
+        user_ids = db.session.scalars(
+            select(User.id).where(User.id >= chunk[0], User.id < chunk[1]).order_by(User.id)
+        ).all()
+        if not user_ids:
+            continue
+
+        if 'rollups' in tasks:
+            rollups.rebuild_rollups(user_range=chunk)
+        if 'forecasts' in tasks:
+            forecasting.refresh_forecasts(user_ids, today=today)
+        if 'insights' in tasks:
+            compute_insights(chunk, computed_at)
+            bump_data_versions(user_ids)
+            db.session.commit()
+        processed += len(user_ids)
+    return processed
+
+
+def _init_worker(database_url):
+    """Give each worker process an app context and an engine of its own."""
+    from app import create_app
+
+    config = {'SQLALCHEMY_DATABASE_URI': database_url} if database_url else None
+    create_app(config).app_context().push()
+    # A forked worker inherits the parent's pooled connections; never reuse them
+    for engine in db.engines.values():
+        engine.dispose(close=False)
+
+
+def _run_shard(shard, tasks, chunk_size, today):
+    started = time.perf_counter()
+    try:
+        # The id range's users may be spread over several shard databases
+        users = sum(recompute_range(shard, tasks, chunk_size, today) for _ in shards.each_shard())
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        db.session.remove()
+    return users, time.perf_counter() - started
+
+
+def _load_checkpoint(path, tasks, shard_size):
+    with open(path) as f:
+        state = json.load(f)
+    if sorted(state['tasks']) != sorted(tasks) or state['shardSize'] != shard_size:
+        raise ValueError(f'Checkpoint {path} was written for other tasks or another shard size')
+    return state
+
+
+def _save_checkpoint(path, state):
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(temp_path, path)
+
+
+def run_batch(database_url=None, tasks=TASKS, workers=None, shard_size=SHARD_SIZE, chunk_size=CHUNK_SIZE,
+              checkpoint=None, resume=False, today=None, progress=None):
+    """
+    Recompute tasks for every user across a pool of worker processes (inside an app context)
+
+    Args:
+        database_url: Database the workers connect to (defaults to the app's)
+        tasks: Names from TASKS to run
+        workers: Worker processes, defaulting to the CPU count
+        shard_size: User ids per shard
+        chunk_size: User ids per transaction inside a shard
+        checkpoint: Optional JSON file recording finished shards
+        resume: Skip the shards already recorded in checkpoint
+        today: Date forecasts are projected from
+        progress: Optional callable(message) for progress output
+
+    Returns:
+        dict: Shard and user counts for this run
+    """
+    database_url = database_url or current_app.config['SQLALCHEMY_DATABASE_URI']
+    tasks = tuple(tasks)
+    today = today or date.today()
+
+    user_ids = ShardDirectory.user_id if shards.shard_count() else User.id
+    first_id, last_id = db.session.execute(select(func.min(user_ids), func.max(user_ids))).one()
+    ranges = shard_ranges(first_id, last_id, shard_size) if first_id is not None else []
+
+    if resume and checkpoint and os.path.exists(checkpoint):
+        state = _load_checkpoint(checkpoint, tasks, shard_size)
+    else:
+        state = {'tasks': list(tasks), 'shardSize': shard_size, 'done': [], 'users': 0}
+    done = {tuple(shard) for shard in state['done']}
+    pending = [shard for shard in ranges if shard not in done]
+    if progress and done:
+        progress(f'Resuming: {len(done)} of {len(ranges)} shards already done')
+
+    # Workers must not share the parent's connections
+    db.session.remove()
+    for engine in db.engines.values():
+        engine.dispose()
+
+    started = time.perf_counter()
+    processed = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(database_url,)) as pool:
+        futures = {pool.submit(_run_shard, shard, tasks, chunk_size, today): shard for shard in pending}
+        try:
+            for future in as_completed(futures):
+                shard = futures[future]
+                users, seconds = future.result()
+                processed += users
+                state['done'].append(list(shard))
+                state['users'] += users
+                if checkpoint:
+                    _save_checkpoint(checkpoint, state)
+                if progress:
+                    finished = len(state['done'])
+                    elapsed = time.perf_counter() - started
+                    remaining = elapsed / (finished - len(done)) * (len(ranges) - finished)
+                    progress(f'Shard {shard[0]}-{shard[1] - 1}: {users} users in {seconds:.1f}s '
+                             f'({finished}/{len(ranges)} shards, {processed / elapsed:.0f} users/s, '
+                             f'{remaining:.0f}s left)')
+        except BaseException:
+            pool.shutdown(cancel_futures=True)
+            raise
+
+    return {'shards': len(pending), 'users': processed, 'seconds': time.perf_counter() - started}
+
+
+@click.command('recompute')
+@click.option('--task', 'tasks', multiple=True, type=click.Choice(TASKS),
+              help='Task to run (repeatable); defaults to all of them.')
+@click.option('--workers', type=int, default=None, help='Worker processes (defaults to the CPU count).')
+@click.option('--shard-size', type=int, default=SHARD_SIZE, help='User ids per shard.')
+@click.option('--chunk-size', type=int, default=CHUNK_SIZE, help='User ids per transaction.')
+@click.option('--checkpoint', type=click.Path(dir_okay=False), default=None,
+              help='JSON file that records finished shards.')
+@click.option('--resume', is_flag=True, help='Skip the shards already recorded in --checkpoint.')
+@with_appcontext
+def recompute_command(tasks, workers, shard_size, chunk_size, checkpoint, resume):
+    """Recompute rollups, forecasts and insights for every user in parallel."""
+    if resume and not checkpoint:
+        raise click.UsageError('--resume needs --checkpoint')
+    try:
+        summary = run_batch(tasks=tasks or TASKS, workers=workers, shard_size=shard_size,
+                            chunk_size=chunk_size, checkpoint=checkpoint, resume=resume, progress=click.echo)
+        click.echo(f"Recomputed {summary['users']} users in {summary['shards']} shards "
+                   f"({summary['seconds']:.1f}s).")
+    except Exception as e:
+        logger.error(f"Error recomputing derived data: {e}")
+        raise click.ClickException(str(e))
@@ -0,0 +1,8 @@
+"""
+Benchmarks for the finance manager.
+
+``python -m benchmarks.datagen`` seeds a database with synthetic users and
+multi-year histories; ``python -m benchmarks.harness`` drives every route
+through the Flask test client and writes per-route latency percentiles as
+JSON that can be compared across commits.
+"""
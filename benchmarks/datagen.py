@@ -0,0 +1,199 @@
+"""
+Seeded synthetic data generator for benchmarks.
+
+Creates users with multi-year Expense, Income and FinancialGoal histories,
+on their shards when sharding is enabled.
+Expenses are written with executemany batches, and the rollup tables and goal
+forecasts are rebuilt once at the end, so seeding millions of rows stays
+practical. The same seed always produces the same data.
+
+    python -m benchmarks.datagen --database-url sqlite:///bench.db --users 100 --expenses-per-user 10000
+"""
+import argparse
+import math
+import os
+import random
+import time
+from datetime import date, timedelta
+
+# category: (share of expenses, median amount, log-normal sigma)
+CATEGORIES = {
+    'Food': (0.34, 350, 0.6),
+    'Transport': (0.20, 150, 0.5),
+    'Shopping': (0.15, 1200, 0.9),
+    'Bills': (0.12, 1800, 0.5),
+    'Entertainment': (0.11, 600, 0.7),
+    'Other': (0.08, 500, 1.0),
+}
+GOAL_TYPES = ['savings', 'debt_reduction', 'investment', 'emergency_fund', 'retirement', 'other']
+DESCRIPTIONS = {
+    'Food': ['Groceries', 'Lunch', 'Dinner out', 'Coffee', 'Food delivery'],
+    'Transport': ['Fuel', 'Metro card', 'Cab ride', 'Parking', 'Bus pass'],
+    'Shopping': ['Clothes', 'Electronics', 'Household items', 'Online order'],
+    'Bills': ['Electricity', 'Internet', 'Mobile recharge', 'Water', 'Rent share'],
+    'Entertainment': ['Movies', 'Streaming subscription', 'Concert', 'Games'],
+    'Other': ['Gift', 'Donation', 'Repairs', 'Miscellaneous'],
+}
+
+BENCHMARK_PASSWORD = 'benchmark'
+USERNAME_PREFIX = 'bench'
+BATCH_SIZE = 5000
+
+
+def _expense_rows(rng, user_id, expenses, start, days):
+    """Yield expense dicts for one user, spread across the history window."""
+    categories = list(CATEGORIES)
+    weights = [CATEGORIES[category][0] for category in categories]
+    for _ in range(expenses):
+        category = rng.choices(categories, weights)[0]
+        _, median, sigma = CATEGORIES[category]
+        yield {
+            'user_id': user_id,
+            'amount': round(rng.lognormvariate(math.log(median), sigma), 2),
+            'category': category,
+            'description': rng.choice(DESCRIPTIONS[category]),
+            'date': start + timedelta(days=rng.randrange(days))
+        }
+
+
+def generate(users=10, expenses_per_user=1000, years=3, seed=42, batch_size=BATCH_SIZE, progress=None):
+    """
+    Seed the database with synthetic users and their histories (inside an app context)
+
+    Args:
+        users: Number of users to create
+        expenses_per_user: Expenses per user, spread over the history window
+        years: Length of the history window ending today
+        seed: Random seed
+        batch_size: Rows per executemany insert and commit
+        progress: Optional callable(message) for progress output
+
+    Returns:
+        dict: Counts of what was created and the usernames
+    """
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+
+    import forecasting
+    import rollups
+    import shards
+    from extensions import db
+    from models import Expense, FinancialGoal, Income, User
+
+    rng = random.Random(seed)
+    today = date.today()
+    start = today - timedelta(days=365 * years)
+    days = (today - start).days + 1
+
+    # Hashing is deliberately slow, so every user shares one hash
+    password = generate_password_hash(BENCHMARK_PASSWORD)
+    offset = sum(User.query.filter(User.username.like(f'{USERNAME_PREFIX}\\_%', escape='\\')).count()
+                 for _ in shards.each_shard())
+    usernames = [f'{USERNAME_PREFIX}_{index}' for index in range(offset, offset + users)]
+    placements = shards.allocate(usernames)
+
+    created_ids = []
+    inserted = 0
+    started = time.perf_counter()
+    for shard in shards.each_shard():
+        new_users = []
+        for index, username in enumerate(usernames):
+            user_id, user_shard = placements[index]
+            if user_shard != shard:
+                continue
+            salary = round(rng.uniform(25000, 250000), -2)
+            new_users.append(User(
+                id=user_id,
+                username=username,
+                password=password,
+                full_name=f'Benchmark User {offset + index}',
+                mobile=f'9{offset + index:09d}',
+                monthly_income=salary,
+                savings_goal=round(salary * rng.uniform(0.1, 0.3), -2),
+                emergency_fund=round(salary * rng.uniform(1, 6), -2),
+                currency='INR'
+            ))
+        if not new_users:
+            continue
+        db.session.add_all(new_users)
+        db.session.flush()
+        user_ids = [user.id for user in new_users]
+
+        for user in new_users:
+            db.session.add(Income(user_id=user.id, amount=user.monthly_income, source='Salary',
+                                  frequency='monthly', date=start))
+            if rng.random() < 0.3:
+                db.session.add(Income(user_id=user.id, amount=round(user.monthly_income * rng.uniform(1, 3), -2),
+                                      source='Annual bonus', frequency='yearly', date=start))
+            for number in range(rng.randint(1, 5)):
+                target = round(rng.uniform(10000, 1000000), -3)
+                goal_start = start + timedelta(days=rng.randrange(days))
+                db.session.add(FinancialGoal(
+                    user_id=user.id,
+                    title=f'Goal {number + 1}',
+                    goal_type=rng.choice(GOAL_TYPES),
+                    target_amount=target,
+                    current_amount=round(target * rng.uniform(0, 0.9), 2),
+                    start_date=goal_start,
+                    target_date=today + timedelta(days=rng.randint(30, 1500)),
+                    priority=rng.randint(1, 5)
+                ))
+        db.session.commit()
+
+        batch = []
+        for user_id in user_ids:
+            for row in _expense_rows(rng, user_id, expenses_per_user, start, days):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    db.session.execute(insert(Expense), batch)
+                    db.session.commit()
+                    inserted += len(batch)
+                    batch = []
+                    if progress:
+                        rate = inserted / (time.perf_counter() - started)
+                        progress(f'{inserted} expenses inserted ({rate:.0f}/s)')
+        if batch:
+            db.session.execute(insert(Expense), batch)
+            db.session.commit()
+            inserted += len(batch)
+
+        if progress:
+            progress('Rebuilding expense rollups')
+        rollups.rebuild_rollups()
+        if progress:
+            progress('Refreshing goal forecasts')
+        forecasting.refresh_forecasts(user_ids)
+        created_ids.extend(user_ids)
+
+    return {
+        'users': len(created_ids),
+        'expenses': inserted,
+        'usernames': usernames
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Seed a database with synthetic benchmark data.')
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'),
+                        help='Target database (defaults to $DATABASE_URL).')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--expenses-per-user', type=int, default=1000)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    from app import create_app
+    import migrations
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.database_url} if args.database_url else None)
+
+    with app.app_context():
+        migrations.upgrade()
+        summary = generate(args.users, args.expenses_per_user, args.years, args.seed,
+                           args.batch_size, progress=print)
+    print(f"Created {summary['users']} users with {summary['expenses']} expenses.")
+
+
+if __name__ == '__main__':
+    main()
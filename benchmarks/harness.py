@@ -0,0 +1,397 @@
+"""
+Per-route latency benchmark driven through the Flask test client.
+
+Every route in routes.py is exercised as a named scenario against a seeded
+database. Each scenario reports throughput and p50/p95/p99 latency, and the
+results are written as JSON so runs can be compared across commits:
+
+    python -m benchmarks.harness --users 20 --expenses-per-user 5000 --output before.json
+    python -m benchmarks.harness --users 20 --expenses-per-user 5000 --compare before.json
+
+Write scenarios undo their own changes with untimed requests where possible,
+so the dataset stays the same size while the benchmark runs. The response
+cache is cleared before every request unless --warm-cache is given, so the
+numbers reflect the work each route does rather than cache hits.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.datagen import BENCHMARK_PASSWORD, generate
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+class Session:
+    """A logged-in test client plus the timing hook scenarios call."""
+
+    def __init__(self, client, username, rng):
+        self.client = client
+        self.username = username
+        self.rng = rng
+        self.timings = []
+        self.errors = 0
+
+    def timed(self, method, path, **kwargs):
+        """Issue a request and record its latency (including reading a streamed body)."""
+        started = time.perf_counter()
+        response = self.client.open(path, method=method, **kwargs)
+        response.get_data()
+        self.timings.append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors += 1
+        return response
+
+    def login(self):
+        return self.client.post('/login', data={'username': self.username, 'password': BENCHMARK_PASSWORD})
+
+
+def _get(path):
+    def scenario(session):
+        session.timed('GET', path)
+    return scenario
+
+
+def _expense_body(session):
+    return {
+        'amount': round(session.rng.uniform(10, 2000), 2),
+        'category': session.rng.choice(['Food', 'Transport', 'Shopping', 'Bills', 'Entertainment', 'Other']),
+        'description': 'Benchmark expense',
+        'date': (date.today() - timedelta(days=session.rng.randrange(365))).isoformat()
+    }
+
+
+def _goal_body(session):
+    return {
+        'title': 'Benchmark goal',
+        'goalType': 'savings',
+        'targetAmount': 50000,
+        'currentAmount': 1000,
+        'targetDate': (date.today() + timedelta(days=365)).isoformat(),
+        'priority': 3
+    }
+
+
+def add_expense(session):
+    response = session.timed('POST', '/api/expenses', json=_expense_body(session))
+    expense_id = response.get_json()['expense']['id']
+    session.client.delete(f'/api/expenses/{expense_id}')
+
+
+def delete_expense(session):
+    expense_id = session.client.post('/api/expenses', json=_expense_body(session)).get_json()['expense']['id']
+    session.timed('DELETE', f'/api/expenses/{expense_id}')
+
+
+def bulk_delete_expenses(session):
+    ids = [session.client.post('/api/expenses', json=_expense_body(session)).get_json()['expense']['id']
+           for _ in range(10)]
+    session.timed('POST', '/api/expenses/bulk-delete', json={'ids': ids})
+
+
+def import_expenses(session):
+    rows = ['Date,Description,Amount,Category']
+    for _ in range(50):
+        body = _expense_body(session)
+        rows.append(f"{body['date']},{body['description']},{body['amount']},{body['category']}")
+    statement = io.BytesIO('\n'.join(rows).encode())
+    # The amounts are positive, so every row is read as an expense rather than as a signed bank amount
+    response = session.timed('POST', '/api/expenses/import',
+                             data={'file': (statement, 'statement.csv'), 'amounts': 'expenses'},
+                             content_type='multipart/form-data')
+    report = response.get_json()
+    if not report.get('imported'):
+        raise RuntimeError(f'Import scenario wrote no expenses: {report}')
+
+
+def update_profile(session):
+    profile = session.client.get('/api/profile').get_json()['profile']
+    session.timed('POST', '/api/update-profile', json=profile)
+
+
+def add_goal(session):
+    response = session.timed('POST', '/api/goals', json=_goal_body(session))
+    session.client.delete(f"/api/goals/{response.get_json()['goal']['id']}")
+
+
+def update_goal(session):
+    goal_id = session.client.post('/api/goals', json=_goal_body(session)).get_json()['goal']['id']
+    session.timed('PUT', f'/api/goals/{goal_id}', json=dict(_goal_body(session), title='Renamed goal'))
+    session.client.delete(f'/api/goals/{goal_id}')
+
+
+def update_goal_progress(session):
+    goal_id = session.client.post('/api/goals', json=_goal_body(session)).get_json()['goal']['id']
+    session.timed('PUT', f'/api/goals/{goal_id}/progress', json={'currentAmount': 20000})
+    session.client.delete(f'/api/goals/{goal_id}')
+
+
+def delete_goal(session):
+    goal_id = session.client.post('/api/goals', json=_goal_body(session)).get_json()['goal']['id']
+    session.timed('DELETE', f'/api/goals/{goal_id}')
+
+
+def check_username(session):
+    session.timed('POST', '/api/check-username', json={'username': session.username})
+
+
+def login(session):
+    session.timed('POST', '/login', data={'username': session.username, 'password': BENCHMARK_PASSWORD})
+
+
+def logout(session):
+    session.timed('GET', '/logout')
+    session.login()
+
+
+def register(session):
+    username = f'bench_reg_{time.time_ns()}'
+    session.timed('POST', '/register', data={
+        'regUsername': username,
+        'regPassword': BENCHMARK_PASSWORD,
+        'confirmPassword': BENCHMARK_PASSWORD,
+        'fullName': 'Registered Benchmark User',
+        'mobile': '9000000000'
+    })
+
+
+def password_reset(session):
+    """Walk the whole reset flow on a separate anonymous client, resetting to the same password."""
+    from models import User
+
+    app = session.client.application
+    anonymous = Session(app.test_client(), session.username, session.rng)
+    anonymous.timings = session.timings
+    with app.app_context():
+        mobile = User.query.filter_by(username=session.username).with_entities(User.mobile).scalar()
+    anonymous.timed('POST', '/forgot-password', data={'recover_username': session.username, 'recover_mobile': mobile})
+    anonymous.timed('GET', '/verify-otp')
+    with app.app_context():
+        otp = User.query.filter_by(username=session.username).with_entities(User.reset_otp).scalar()
+    anonymous.timed('POST', '/verify-otp', data={'otp': otp})
+    anonymous.timed('GET', '/reset-password')
+    anonymous.timed('POST', '/reset-password', data={
+        'new_password': BENCHMARK_PASSWORD,
+        'confirm_password': BENCHMARK_PASSWORD
+    })
+    session.errors += anonymous.errors
+
+
+def build_scenarios():
+    """Map scenario names to callables taking a Session."""
+    today = date.today()
+    return {
+        'GET /': _get('/'),
+        'GET /login': _get('/login'),
+        'GET /dashboard': _get('/dashboard'),
+        'GET /expenses': _get('/expenses'),
+        'GET /goals': _get('/goals'),
+        'GET /api/expenses': _get('/api/expenses'),
+        'GET /api/expenses?limit=50': _get('/api/expenses?limit=50'),
+        'GET /api/expenses?limit=50&sort=amount-desc': _get('/api/expenses?limit=50&sort=amount-desc'),
+        'GET /api/expenses?month&year': _get(f'/api/expenses?month={today.month}&year={today.year}'),
+        'GET /api/monthly-expenses': _get('/api/monthly-expenses'),
+        'GET /api/expense-trend?range=week': _get('/api/expense-trend?range=week'),
+        'GET /api/expense-trend?range=month': _get('/api/expense-trend?range=month'),
+        'GET /api/expense-trend?range=year': _get('/api/expense-trend?range=year'),
+        'GET /api/expense-categories': _get('/api/expense-categories'),
+        'GET /api/expense-categories?range=all': _get('/api/expense-categories?range=all'),
+        'GET /api/expenses/export?format=csv': _get('/api/expenses/export?format=csv'),
+        'GET /api/expenses/export?format=ndjson': _get('/api/expenses/export?format=ndjson'),
+        'GET /api/profile': _get('/api/profile'),
+        'GET /api/currency-options': _get('/api/currency-options'),
+        'GET /api/goals': _get('/api/goals'),
+        'GET /api/dashboard-data': _get('/api/dashboard-data?period=month'),
+        'GET /api/dashboard/bootstrap': _get('/api/dashboard/bootstrap'),
+        'GET /api/expense-distribution?period=week': _get('/api/expense-distribution?period=week'),
+        'GET /api/expense-distribution?period=month': _get('/api/expense-distribution?period=month'),
+        'GET /api/expense-distribution?period=last_6_months': _get('/api/expense-distribution?period=last_6_months'),
+        'GET /api/analytics/spending': _get('/api/analytics/spending'),
+        'GET /api/recent-expenses': _get('/api/recent-expenses'),
+        'GET /api/yearly-summary': _get('/api/yearly-summary'),
+        'GET /api/achievements': _get('/api/achievements'),
+        'GET /api/insights': _get('/api/insights'),
+        'GET /api/recurring-expenses': _get('/api/recurring-expenses'),
+        'GET /api/recurring/upcoming': _get('/api/recurring/upcoming'),
+        'GET /api/cache-stats': _get('/api/cache-stats'),
+        'GET /metrics': _get('/metrics'),
+        'POST /api/expenses': add_expense,
+        'DELETE /api/expenses/<id>': delete_expense,
+        'POST /api/expenses/bulk-delete': bulk_delete_expenses,
+        'POST /api/expenses/import': import_expenses,
+        'POST /api/update-profile': update_profile,
+        'POST /api/goals': add_goal,
+        'PUT /api/goals/<id>': update_goal,
+        'PUT /api/goals/<id>/progress': update_goal_progress,
+        'DELETE /api/goals/<id>': delete_goal,
+        'POST /api/check-username': check_username,
+        'POST /login': login,
+        'GET /logout': logout,
+        'POST /register': register,
+        'password reset flow': password_reset,
+    }
+
+
+def run_scenario(sessions, scenario, iterations, warm_cache):
+    """Run one scenario round-robin across the logged-in sessions and summarize it."""
+    from cache import response_cache
+
+    timings = []
+    for session in sessions:
+        session.timings = timings
+        session.errors = 0
+
+    for iteration in range(iterations):
+        session = sessions[iteration % len(sessions)]
+        if not warm_cache:
+            response_cache.clear()
+        scenario(session)
+
+    errors = sum(session.errors for session in sessions)
+    ordered = sorted(timings)
+    total = sum(ordered)
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'throughputRps': len(ordered) / total if total else 0.0,
+        'meanMs': total / len(ordered) * 1000 if ordered else 0.0,
+        'p50Ms': percentile(ordered, 50) * 1000,
+        'p95Ms': percentile(ordered, 95) * 1000,
+        'p99Ms': percentile(ordered, 99) * 1000,
+        'maxMs': ordered[-1] * 1000 if ordered else 0.0,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(previous, current):
+    """Print p50/p95 changes per scenario against an earlier result file."""
+    print(f"{'scenario':55} {'p50 ms':>16} {'p95 ms':>16}")
+    for name, result in current['results'].items():
+        before = previous['results'].get(name)
+        if before is None:
+            continue
+        cells = []
+        for key in ('p50Ms', 'p95Ms'):
+            change = (result[key] / before[key] - 1) * 100 if before[key] else 0.0
+            cells.append(f"{result[key]:8.2f} ({change:+5.0f}%)")
+        print(f"{name:55} {cells[0]:>16} {cells[1]:>16}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark every route through the Flask test client.')
+    parser.add_argument('--database-url', default=None,
+                        help='Benchmark an existing database instead of seeding a temporary SQLite one.')
+    parser.add_argument('--users', type=int, default=10, help='Users to seed.')
+    parser.add_argument('--expenses-per-user', type=int, default=2000, help='Expenses to seed per user.')
+    parser.add_argument('--years', type=int, default=3, help='Years of history to seed.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--sessions', type=int, default=5, help='Seeded users to log in and rotate through.')
+    parser.add_argument('--iterations', type=int, default=50, help='Measured iterations per scenario.')
+    parser.add_argument('--warmup', type=int, default=5, help='Unmeasured iterations per scenario.')
+    parser.add_argument('--scenario', action='append', default=None,
+                        help='Only run scenarios containing this text (repeatable).')
+    parser.add_argument('--warm-cache', action='store_true', help='Keep the response cache between requests.')
+    parser.add_argument('--output', help='Write results as JSON to this file.')
+    parser.add_argument('--compare', help='Earlier result file to compare p50/p95 against.')
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url
+    if not database_url:
+        workdir = tempfile.mkdtemp(prefix='finance-bench-')
+        database_url = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+
+    from app import create_app
+    from extensions import db
+    from models import User
+    import migrations
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'TESTING': True,
+        'SESSION_COOKIE_SECURE': False,
+    })
+    rng = random.Random(args.seed)
+
+    with app.app_context():
+        migrations.upgrade()
+        if args.database_url:
+            usernames = [username for (username,) in User.query.filter(User.username.like('bench\\_%', escape='\\'))
+                         .order_by(User.id).with_entities(User.username).limit(args.sessions)]
+            if not usernames:
+                sys.exit('No benchmark users found; seed the database with python -m benchmarks.datagen first.')
+        else:
+            print(f'Seeding {args.users} users x {args.expenses_per_user} expenses...', file=sys.stderr)
+            usernames = generate(args.users, args.expenses_per_user, args.years, args.seed)['usernames']
+        dataset = {
+            'users': User.query.count(),
+            'expenses': db.session.execute(db.text('SELECT COUNT(*) FROM expense')).scalar()
+        }
+
+    # Requests run outside any app context, so each one gets its own g and session as in production
+    sessions = []
+    for username in usernames[:args.sessions]:
+        session = Session(app.test_client(), username, rng)
+        session.login()
+        sessions.append(session)
+
+    scenarios = build_scenarios()
+    if args.scenario:
+        scenarios = {name: scenario for name, scenario in scenarios.items()
+                     if any(text in name for text in args.scenario)}
+
+    results = {}
+    for name, scenario in scenarios.items():
+        run_scenario(sessions, scenario, args.warmup, args.warm_cache)
+        results[name] = run_scenario(sessions, scenario, args.iterations, args.warm_cache)
+        print(f"{name:55} p50 {results[name]['p50Ms']:8.2f} ms  p95 {results[name]['p95Ms']:8.2f} ms  "
+              f"p99 {results[name]['p99Ms']:8.2f} ms", file=sys.stderr)
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+            'dataset': dataset,
+            'seed': args.seed,
+            'iterations': args.iterations,
+            'warmCache': args.warm_cache
+        },
+        'results': results
+    }
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as previous:
+            compare(json.load(previous), report)
+
+
+if __name__ == '__main__':
+    main()
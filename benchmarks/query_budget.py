@@ -0,0 +1,156 @@
+"""
+Per-route SQL statement budgets.
+
+Each route in QUERY_BUDGETS is requested (with the response cache cleared)
+for a user with a small history and a user with a large one. A route fails
+when it issues more statements than its budget, or when its statement count
+grows with the size of the history. The offending statements are printed.
+
+    python -m benchmarks.query_budget
+
+Exits non-zero on any violation, so it can gate CI. Budgets count every
+statement, including the data-version lookup that fronts the ETag/response
+cache on user-specific APIs (a cache hit costs only that one lookup).
+"""
+import argparse
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import date
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from benchmarks.datagen import generate
+from benchmarks.harness import Session
+
+# path: maximum statements per request ({month} and {year} are today's)
+QUERY_BUDGETS = {
+    '/dashboard': 3,
+    '/expenses': 1,
+    '/goals': 1,
+    '/api/expenses': 2,
+    '/api/expenses?limit=50': 2,
+    '/api/expenses?limit=50&sort=amount-desc': 2,
+    '/api/expenses?month={month}&year={year}': 2,
+    '/api/monthly-expenses': 2,
+    # One more when the range is empty, to check whether the whole year is
+    '/api/expense-trend?range=week': 3,
+    '/api/expense-trend?range=month': 3,
+    '/api/expense-trend?range=year': 2,
+    '/api/expense-categories': 2,
+    '/api/expense-categories?range=all': 2,
+    '/api/profile': 2,
+    '/api/currency-options': 0,
+    # Goals and their precomputed forecasts are one join; the other statement is
+    # the data-version lookup the ETag and response cache are keyed on, and it
+    # is the only one left once the listing is cached
+    '/api/goals': 2,
+    '/api/dashboard-data?period=month': 3,
+    '/api/dashboard/bootstrap': 5,
+    '/api/expense-distribution?period=week': 2,
+    '/api/expense-distribution?period=month': 2,
+    '/api/expense-distribution?period=last_6_months': 2,
+    '/api/analytics/spending': 2,
+    '/api/recent-expenses': 2,
+    '/api/yearly-summary': 3,
+    '/api/achievements': 0,
+    '/api/insights': 1,
+    '/api/recurring-expenses': 2,
+    '/api/recurring/upcoming': 3,
+}
+
+# Expenses per user for the histories each route is checked against
+DATASET_SIZES = (50, 5000)
+
+
+@contextmanager
+def record_statements():
+    """Collect the SQL text of every statement executed inside the block."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def check_budgets(sessions, budgets=QUERY_BUDGETS):
+    """
+    Request every budgeted route once per session
+
+    Args:
+        sessions: Logged-in harness Sessions, smallest history first
+        budgets: Mapping of path to maximum statements
+
+    Returns:
+        list: (path, problem, statements) for each violation
+    """
+    from cache import response_cache
+
+    today = date.today()
+    violations = []
+    for template, budget in budgets.items():
+        path = template.format(month=today.month, year=today.year)
+        counts = []
+        for session in sessions:
+            response_cache.clear()
+            with record_statements() as statements:
+                response = session.client.get(path)
+            counts.append(len(statements))
+
+            if response.status_code >= 400:
+                violations.append((path, f'returned {response.status_code}', statements))
+            elif len(statements) > budget:
+                violations.append((path, f'{len(statements)} statements, budget is {budget}', statements))
+
+        if any(count > counts[0] for count in counts[1:]):
+            violations.append((path, f'statement count grows with history size: {counts}', []))
+    return violations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check per-route SQL statement budgets.')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='finance-budget-')
+    from app import create_app
+    import migrations
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(workdir, 'budget.db'),
+        'TESTING': True,
+        'SESSION_COOKIE_SECURE': False,
+    })
+
+    with app.app_context():
+        migrations.upgrade()
+        usernames = [generate(users=1, expenses_per_user=size, seed=args.seed)['usernames'][0]
+                     for size in DATASET_SIZES]
+
+    # Requests run outside any app context, so each one gets its own g and session as in production
+    sessions = []
+    for username in usernames:
+        session = Session(app.test_client(), username, None)
+        session.login()
+        sessions.append(session)
+
+    violations = check_budgets(sessions)
+
+    for path, problem, statements in violations:
+        print(f'FAIL {path}: {problem}')
+        for statement in statements:
+            print(f"    {' '.join(statement.split())}")
+    if violations:
+        sys.exit(1)
+    print(f'All {len(QUERY_BUDGETS)} routes within their query budgets.')
+
+
+if __name__ == '__main__':
+    main()
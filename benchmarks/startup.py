@@ -0,0 +1,216 @@
+"""
+Startup benchmark: cold start of the app and gunicorn worker spawn.
+
+Cold start is measured in fresh interpreters: importing app, create_app(), and
+the first request through the test client. Worker spawn is measured by
+starting gunicorn with and without --preload. For each worker it records the
+time from the master's fork to the end of the worker's initialization, and
+the worker's RSS, PSS (resident memory with shared pages divided between the
+processes sharing them) and private memory once every worker has booted.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --workers 8 --runs 10 --output startup.json
+
+The gunicorn part needs Linux (/proc) and is skipped elsewhere.
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COLD_START = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[1], 'TESTING': True})
+created = time.perf_counter()
+response = application.test_client().get('/login')
+response.get_data()
+served = time.perf_counter()
+print(json.dumps({'importMs': (imported - started) * 1000, 'createAppMs': (created - imported) * 1000,
+                  'firstRequestMs': (served - created) * 1000, 'status': response.status_code}))
+'''
+
+# Loaded after gunicorn.conf.py; records when each worker is forked and when it is ready
+TIMING_HOOKS = '''
+import os, time
+exec(open(os.path.join({root!r}, 'gunicorn.conf.py')).read())
+_pre_fork, _post_fork = pre_fork, post_fork
+
+
+def _record(event, worker):
+    with open(os.environ['STARTUP_TIMINGS'], 'a') as f:
+        f.write(f'{{event}} {{worker.age}} {{os.getpid()}} {{time.time()}}\\n')
+
+
+def pre_fork(server, worker):
+    _record('fork', worker)
+    _pre_fork(server, worker)
+
+
+def post_fork(server, worker):
+    _post_fork(server, worker)
+
+
+def post_worker_init(worker):
+    _record('ready', worker)
+'''
+
+
+def _summary(values):
+    values = sorted(values)
+    return {'medianMs': round(statistics.median(values), 2), 'minMs': round(values[0], 2),
+            'maxMs': round(values[-1], 2)}
+
+
+def cold_start(database_url, runs):
+    """Time import, create_app and the first request in ``runs`` fresh interpreters."""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', COLD_START, database_url], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout
+        sample = json.loads(output.strip().splitlines()[-1])
+        sample['processMs'] = (time.perf_counter() - started) * 1000
+        samples.append(sample)
+    return {key: _summary([sample[key] for sample in samples])
+            for key in ('importMs', 'createAppMs', 'firstRequestMs', 'processMs')}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _children(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name is parenthesized and may contain spaces
+                parent = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if parent == pid:
+            children.append(int(entry))
+    return children
+
+
+def _memory_kb(pid):
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {'rssKb': fields.get('Rss', 0), 'pssKb': fields.get('Pss', 0),
+            'privateKb': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)}
+
+
+def gunicorn_spawn(database_url, workers, preload, requests, timeout=60):
+    """Boot gunicorn, wait for every worker, and report spawn times and per-worker memory."""
+    port = _free_port()
+    workdir = tempfile.mkdtemp(prefix='finance-startup-')
+    config_path = os.path.join(workdir, 'gunicorn_timing.conf.py')
+    with open(config_path, 'w') as f:
+        f.write(TIMING_HOOKS.format(root=ROOT))
+    timings_path = os.path.join(workdir, 'timings.txt')
+
+    env = dict(os.environ, DATABASE_URL=database_url, STARTUP_TIMINGS=timings_path,
+               GUNICORN_BIND=f'127.0.0.1:{port}', WEB_CONCURRENCY=str(workers),
+               GUNICORN_PRELOAD='1' if preload else '0', SCHEDULER_ENABLED='0')
+    started = time.time()
+    master = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', config_path, 'main:app'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        events = {}
+        while time.time() - started < timeout:
+            if master.poll() is not None:
+                raise RuntimeError(f'gunicorn exited with status {master.returncode}')
+            if os.path.exists(timings_path):
+                with open(timings_path) as f:
+                    for line in f:
+                        event, age, _, at = line.split()
+                        events.setdefault(int(age), {})[event] = float(at)
+            if sum('ready' in worker for worker in events.values()) >= workers:
+                break
+            time.sleep(0.02)
+        else:
+            raise RuntimeError(f'Workers not ready after {timeout}s')
+        booted = max(worker['ready'] for worker in events.values())
+
+        url = f'http://127.0.0.1:{port}/login'
+        for _ in range(requests):
+            with urllib.request.urlopen(url) as response:
+                response.read()
+
+        memory = [_memory_kb(pid) for pid in _children(master.pid)]
+        return {
+            'preload': preload,
+            'workers': workers,
+            'bootMs': round((booted - started) * 1000, 2),
+            'spawn': _summary([(worker['ready'] - worker['fork']) * 1000 for worker in events.values()]),
+            'masterRssKb': _memory_kb(master.pid)['rssKb'],
+            'perWorker': {key: round(statistics.mean(sample[key] for sample in memory))
+                          for key in ('rssKb', 'pssKb', 'privateKb')},
+        }
+    finally:
+        master.send_signal(signal.SIGTERM)
+        try:
+            master.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            master.kill()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure app cold start and gunicorn worker spawn.')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters timed for the cold start.')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=50, help='Requests served before memory is sampled.')
+    parser.add_argument('--output', help='Write results as JSON to this file.')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='finance-startup-')
+    database_url = 'sqlite:///' + os.path.join(workdir, 'startup.db')
+
+    from app import create_app
+    import migrations
+
+    with create_app({'SQLALCHEMY_DATABASE_URI': database_url}).app_context():
+        migrations.upgrade()
+
+    results = {'coldStart': cold_start(database_url, args.runs), 'gunicorn': []}
+    for name, timing in results['coldStart'].items():
+        print(f"{name:16} median {timing['medianMs']:8.1f} ms  (min {timing['minMs']:.1f}, max {timing['maxMs']:.1f})")
+
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        print('Skipping gunicorn: /proc/self/smaps_rollup is not available.', file=sys.stderr)
+    else:
+        for preload in (False, True):
+            run = gunicorn_spawn(database_url, args.workers, preload, args.requests)
+            results['gunicorn'].append(run)
+            memory = run['perWorker']
+            print(f"gunicorn {'--preload' if preload else 'no preload':10} boot {run['bootMs']:8.1f} ms  "
+                  f"spawn median {run['spawn']['medianMs']:7.1f} ms  per worker RSS {memory['rssKb'] / 1024:6.1f} MB  "
+                  f"PSS {memory['pssKb'] / 1024:6.1f} MB  private {memory['privateKb'] / 1024:6.1f} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""
+Per-user versioned response cache and HTTP validators for read APIs.
+
+Cached JSON bodies are keyed by (user_id, endpoint, query args, day, data
+version). Every write path bumps the user's data version in the same
+transaction as the write, so stale entries are never served again and simply
+age out of the LRU. The same key doubles as a strong ETag, so unchanged polls
+are answered with 304 before the view runs.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+
+from flask import Response, g, make_response, request
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from extensions import db
+from models import UserDataVersion
+
+_UPSERT_INSERTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+class ResponseCache:
+    """Thread-safe LRU mapping of cache keys to (body, status, mimetype)."""
+
+    def __init__(self, maxsize=2048):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxSize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': self.hits / lookups if lookups else 0.0
+            }
+
+
+response_cache = ResponseCache(maxsize=int(os.environ.get('RESPONSE_CACHE_SIZE', 2048)))
+
+
+def get_data_version(user_id):
+    """Get the user's current data version (0 before their first write), once per request."""
+    versions = g.setdefault('data_versions', {})
+    if user_id not in versions:
+        version = db.session.query(UserDataVersion.version).filter(
+            UserDataVersion.user_id == user_id
+        ).scalar()
+        versions[user_id] = version or 0
+    return versions[user_id]
+
+
+def bump_data_version(user_id):
+    """
+    Invalidate the user's cached responses; call inside the write's transaction
+
+    Returns:
+        int: The user's new data version
+    """
+    table = UserDataVersion.__table__
+    make_insert = _UPSERT_INSERTS.get(db.session.get_bind(mapper=UserDataVersion).dialect.name)
+
+    if make_insert is not None:
+        stmt = make_insert(table).values(user_id=user_id, version=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={'version': table.c.version + 1}
+        ).returning(table.c.version)
+        return db.session.execute(stmt).scalar()
+
+    result = db.session.execute(
+        table.update().where(table.c.user_id == user_id).values(version=table.c.version + 1)
+    )
+    if result.rowcount == 0:
+        db.session.execute(table.insert().values(user_id=user_id, version=1))
+    return db.session.execute(
+        select(table.c.version).where(table.c.user_id == user_id)
+    ).scalar()
+
+
+def bump_data_versions(user_ids):
+    """Invalidate the cached responses of many users at once, for jobs that rewrite their rows."""
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+    table = UserDataVersion.__table__
+    make_insert = _UPSERT_INSERTS.get(db.session.get_bind(mapper=UserDataVersion).dialect.name)
+
+    if make_insert is None:
+        for user_id in user_ids:
+            bump_data_version(user_id)
+        return
+
+    stmt = make_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={'version': table.c.version + 1}
+    )
+    db.session.execute(stmt, [{'user_id': user_id, 'version': 1} for user_id in user_ids])
+
+
+def _request_key(view_kwargs):
+    """Identify the current request's response for the session user at their current data version."""
+    user_id = g.user_id
+    return (
+        user_id,
+        request.endpoint,
+        tuple(sorted(request.args.items(multi=True))),
+        tuple(sorted(view_kwargs.items())),
+        date.today().isoformat(),
+        get_data_version(user_id)
+    )
+
+
+def _is_success(response):
+    """True for a 200 whose JSON body (if any) isn't a {"success": false} error."""
+    if response.status_code != 200 or response.is_streamed:
+        return False
+    if not response.is_json:
+        return True
+    payload = response.get_json(silent=True)
+    return not (isinstance(payload, dict) and payload.get('success') is False)
+
+
+def versioned_etag(f):
+    """
+    Answer conditional GETs for a login_required endpoint from the data version
+
+    The ETag is derived from the request key, so a matching If-None-Match gets
+    a 304 without running the view or touching the user's data.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        etag = hashlib.sha1(repr(_request_key(kwargs)).encode()).hexdigest()
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = make_response(f(*args, **kwargs))
+            # Errors reported in a 200 body must not be revalidated as if they were the data
+            if not _is_success(response):
+                return response
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return decorated_function
+
+
+def static_etag(max_age=86400):
+    """Mark an endpoint whose response never depends on the user as publicly cacheable."""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            response = make_response(f(*args, **kwargs))
+            response.add_etag()
+            response.headers['Cache-Control'] = f'public, max-age={max_age}'
+            return response.make_conditional(request)
+        return decorated_function
+    return decorator
+
+
+def add_content_etag(response):
+    """
+    after_request fallback: validate any other JSON GET by hashing its body
+
+    This still runs the view but saves the transfer when nothing changed.
+    """
+    if (request.method == 'GET' and response.is_json and 'ETag' not in response.headers
+            and _is_success(response)):
+        response.add_etag()
+        response.headers.setdefault('Cache-Control', 'private, no-cache')
+        response.make_conditional(request)
+    return response
+
+
+def cached_response(f):
+    """
+    Serve a login_required JSON endpoint from the response cache
+
+    Only successful JSON responses are stored. The current date is part of the
+    key because several endpoints report on "this month" or "this year".
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = _request_key(kwargs)
+        entry = response_cache.get(key)
+        if entry is not None:
+            body, status, mimetype = entry
+            return Response(body, status=status, mimetype=mimetype)
+
+        response = make_response(f(*args, **kwargs))
+        if response.is_json and _is_success(response):
+            response_cache.set(key, (response.get_data(), response.status_code, response.mimetype))
+        return response
+    return decorated_function
@@ -0,0 +1,121 @@
+"""
+Engine profiles and raw database access.
+
+Postgres engines get a pool tuned for network connections. SQLite database
+files get a profile of their own. Each new connection is switched to WAL, so
+readers keep reading the last committed snapshot while a writer commits,
+instead of waiting on the writer's lock. With WAL, synchronous=NORMAL is still
+safe against corruption; it only skips an fsync per commit. A busy_timeout
+makes writers queue for the write lock instead of failing at once. mmap_size
+and cache_size keep hot pages in memory. SQLite connections are local files
+that never go stale, so the pool needs neither recycling nor pre-ping.
+
+get_db_connection() replaces the hand-opened sqlite3 connections to
+instance/financial_assistant.db. It returns a connection from the app's
+engine (the selected shard's, with sharding), so it always points at the
+configured database with these settings.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+import shards
+from extensions import db
+
+# SQLite settings and their defaults; each can be overridden in the app config
+SQLITE_DEFAULTS = {
+    'SQLITE_JOURNAL_MODE': 'WAL',
+    'SQLITE_SYNCHRONOUS': 'NORMAL',
+    'SQLITE_BUSY_TIMEOUT_MS': 5000,
+    'SQLITE_MMAP_SIZE': 256 * 1024 * 1024,
+    # Negative sizes are in KiB: 64 MB of page cache per connection
+    'SQLITE_CACHE_SIZE': -64000,
+    'SQLITE_POOL_SIZE': 5,
+}
+
+
+def _settings(config):
+    config = config or {}
+    return {key: config.get(key, default) for key, default in SQLITE_DEFAULTS.items()}
+
+
+def is_sqlite_file(database_uri):
+    """True for a SQLite URI naming a database file (not an in-memory database)."""
+    url = make_url(database_uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:') \
+        and not url.database.startswith('file::memory:')
+
+
+def engine_options(database_uri, config=None):
+    """Connection pool settings based on database type."""
+    if database_uri.startswith('postgresql'):
+        # PostgreSQL specific settings
+        return {
+            'pool_recycle': 280,
+            'pool_timeout': 20,
+            'pool_pre_ping': True,
+            'connect_args': {
+                'connect_timeout': 10
+            }
+        }
+    if is_sqlite_file(database_uri):
+        settings = _settings(config)
+        return {
+            # One connection per concurrent request in the process, a few more under bursts
+            'poolclass': QueuePool,
+            'pool_size': settings['SQLITE_POOL_SIZE'],
+            'max_overflow': settings['SQLITE_POOL_SIZE'] * 2,
+            'pool_timeout': 20,
+            'connect_args': {
+                # Seconds pysqlite waits on a locked database before raising
+                'timeout': settings['SQLITE_BUSY_TIMEOUT_MS'] / 1000,
+                # Pooled connections move between request threads
+                'check_same_thread': False,
+            }
+        }
+    # In-memory SQLite and other databases keep SQLAlchemy's default pool
+    return {}
+
+
+def sqlite_pragmas(config=None):
+    """The PRAGMA statements run on every new SQLite connection."""
+    settings = _settings(config)
+    return [
+        f"PRAGMA journal_mode={settings['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={settings['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={int(settings['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA mmap_size={int(settings['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA cache_size={int(settings['SQLITE_CACHE_SIZE'])}",
+    ]
+
+
+def configure_engine(engine, config=None):
+    """Apply the SQLite connection pragmas to ``engine``; other engines are left alone."""
+    if not is_sqlite_file(engine.url):
+        return
+    pragmas = sqlite_pragmas(config)
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def init_app(app):
+    """Configure every engine of the app for its database type."""
+    with app.app_context():
+        for engine in db.engines.values():
+            configure_engine(engine, app.config)
+
+
+def get_db_connection():
+    """
+    A connection to the selected shard, or the main database (inside an app context)
+
+    Use it as a context manager; leaving the block returns the connection to the pool.
+    """
+    return shards.current_engine().connect()
@@ -1,21 +1,32 @@
-from app import app, db, User
+from app import create_app
+from extensions import db
+from models import ShardDirectory, User
+import shards
+
+app = create_app()
 
 # Use the application context
 with app.app_context():
     try:
-        # Get count before deletion
-        user_count = User.query.count()
-        print(f"Found {user_count} users in the database")
-        
-        # Delete all users
-        User.query.delete()
-        
-        # Commit the changes
-        db.session.commit()
+        # Users live on every shard when sharding is enabled
+        for shard in shards.each_shard():
+            # Get count before deletion
+            user_count = User.query.count()
+            print(f"Found {user_count} users in the database" if shard is None else f"Found {user_count} users on shard {shard}")
+            
+            # Delete all users
+            User.query.delete()
+            
+            # Commit the changes
+            db.session.commit()
+            
+            # Verify deletion
+            remaining = User.query.count()
+            print(f"Successfully deleted all users. Remaining users: {remaining}")
         
-        # Verify deletion
-        remaining = User.query.count()
-        print(f"Successfully deleted all users. Remaining users: {remaining}")
+        if shards.shard_count():
+            ShardDirectory.query.delete()
+            db.session.commit()
         
     except Exception as e:
         # Roll back in case of error
@@ -1,52 +1,49 @@
-import sqlite3
 import datetime
 import json
 
-# Connect to the database
-def get_db_connection():
-    conn = sqlite3.connect('instance/financial_assistant.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+from sqlalchemy import inspect, text
+
+import shards
+from app import create_app
+from database import get_db_connection
+from routes import create_expense
+
+app = create_app()
 
 def check_database_tables():
     print("Checking database tables...")
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get all tables in the database
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = cursor.fetchall()
-    print("Tables in database:")
-    for table in tables:
-        print(f"  - {table['name']}")
-        
-        # Get column info for each table
-        cursor.execute(f"PRAGMA table_info({table['name']})")
-        columns = cursor.fetchall()
-        print(f"    Columns: {', '.join([col['name'] for col in columns])}")
-        
-        # Get record count for each table
-        cursor.execute(f"SELECT COUNT(*) FROM {table['name']}")
-        count = cursor.fetchone()[0]
-        print(f"    Records: {count}")
-    
-    conn.close()
+    with get_db_connection() as conn:
+        inspector = inspect(conn)
+        
+        # Get all tables in the database
+        tables = inspector.get_table_names()
+        print("Tables in database:")
+        for table in tables:
+            print(f"  - {table}")
+            
+            # Get column info for each table
+            columns = inspector.get_columns(table)
+            print(f"    Columns: {', '.join([col['name'] for col in columns])}")
+            
+            # Get record count for each table
+            count = conn.execute(text(f'SELECT COUNT(*) FROM "{table}"')).scalar()
+            print(f"    Records: {count}")
 
 def check_expenses():
     print("\nChecking expenses data...")
     conn = get_db_connection()
-    cursor = conn.cursor()
+    inspector = inspect(conn)
     
     try:
+        tables = sorted(inspector.get_table_names())
+        
         # Find the correct name for the user table
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE '%user%';")
-        user_tables = cursor.fetchall()
-        user_table = user_tables[0]['name'] if user_tables else None
+        user_tables = [name for name in tables if 'user' in name]
+        user_table = 'user' if 'user' in tables else (user_tables[0] if user_tables else None)
         
         # Find the correct name for the expense table
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE '%expense%';")
-        expense_tables = cursor.fetchall()
-        expense_table = expense_tables[0]['name'] if expense_tables else None
+        expense_tables = [name for name in tables if 'expense' in name]
+        expense_table = 'expense' if 'expense' in tables else (expense_tables[0] if expense_tables else None)
         
         print(f"User table: {user_table}")
         print(f"Expense table: {expense_table}")
@@ -56,67 +53,45 @@ def check_expenses():
             return
         
         # Get table schema
-        cursor.execute(f"PRAGMA table_info({user_table})")
-        user_columns = [col['name'] for col in cursor.fetchall()]
+        user_columns = [col['name'] for col in inspector.get_columns(user_table)]
         print(f"User columns: {user_columns}")
         
-        cursor.execute(f"PRAGMA table_info({expense_table})")
-        expense_columns = [col['name'] for col in cursor.fetchall()]
+        expense_columns = [col['name'] for col in inspector.get_columns(expense_table)]
         print(f"Expense columns: {expense_columns}")
         
         # Find the user ID column
         user_id_col = 'id' if 'id' in user_columns else 'user_id'
         
         # Get users
-        cursor.execute(f"SELECT {user_id_col}, username FROM {user_table} LIMIT 5")
-        users = cursor.fetchall()
+        users = conn.execute(text(f'SELECT {user_id_col}, username FROM "{user_table}" LIMIT 5')).mappings().all()
         print("Users:")
         for user in users:
             print(f"  - User ID: {user[user_id_col]}, Username: {user['username']}")
         
         # Get current expenses
-        cursor.execute(f"SELECT * FROM {expense_table} LIMIT 5")
-        expenses = cursor.fetchall()
+        expenses = conn.execute(text(f'SELECT * FROM "{expense_table}" LIMIT 5')).mappings().all()
         print("\nSample expenses:")
         for expense in expenses:
             expense_dict = {column: expense[column] for column in expense.keys()}
             print(f"  - {expense_dict}")
         
-        # Add a sample expense for testing
+        # Add a sample expense for testing, saved like the add expense API so rollups and caches stay in step
         user_id = users[0][user_id_col] if users else 1
         print(f"\nAdding a sample expense for user_id {user_id}")
         
-        expense_columns_str = ", ".join([col for col in expense_columns if col != 'id'])
-        placeholders = ", ".join(["?"] * (len(expense_columns) - 1))
-        
-        values = []
-        for col in expense_columns:
-            if col == 'id':
-                continue
-            elif col == 'user_id':
-                values.append(user_id)
-            elif col == 'amount':
-                values.append(5000)
-            elif col == 'category':
-                values.append('Test')
-            elif col == 'description':
-                values.append('Diagnostic test expense')
-            elif col == 'date':
-                values.append(datetime.datetime.now().strftime('%Y-%m-%d'))
-            else:
-                values.append(None)
-        
-        query = f"INSERT INTO {expense_table} ({expense_columns_str}) VALUES ({placeholders})"
-        print(f"Query: {query}")
-        print(f"Values: {values}")
-        
-        cursor.execute(query, values)
-        conn.commit()
-        print("Sample expense added successfully")
+        expense = create_expense(
+            user_id,
+            amount=5000,
+            category='Test',
+            description='Diagnostic test expense',
+            date=datetime.date.today()
+        )
+        print(f"Sample expense added successfully with ID: {expense.id}")
         
         # Verify it was added
-        cursor.execute(f"SELECT * FROM {expense_table} WHERE category = 'Test' ORDER BY id DESC LIMIT 1")
-        new_expense = cursor.fetchone()
+        new_expense = conn.execute(text(
+            f'SELECT * FROM "{expense_table}" WHERE category = \'Test\' ORDER BY id DESC LIMIT 1'
+        )).mappings().first()
         if new_expense:
             expense_dict = {column: new_expense[column] for column in new_expense.keys()}
             print(f"New expense: {expense_dict}")
@@ -131,28 +106,26 @@ def check_expenses():
 def check_monthly_summary():
     print("\nChecking monthly summary data...")
     conn = get_db_connection()
-    cursor = conn.cursor()
 
     try:
-        current_year = datetime.datetime.now().year
-        current_month = datetime.datetime.now().month
+        month_start = datetime.date.today().replace(day=1)
+        next_month = (month_start + datetime.timedelta(days=32)).replace(day=1)
 
         # Check monthly expenses
-        cursor.execute("""
+        result = conn.execute(text("""
             SELECT SUM(amount) as total, COUNT(*) as count 
             FROM expense 
-            WHERE strftime('%Y', date) = ? 
-            AND strftime('%m', date) = ?
-        """, (str(current_year), str(current_month).zfill(2)))
-
-        result = cursor.fetchone()
+            WHERE date >= :start 
+            AND date < :end
+        """), {'start': month_start, 'end': next_month}).mappings().first()
         print(f"Current month expenses:")
         print(f"  Total amount: {result['total'] or 0}")
         print(f"  Number of transactions: {result['count'] or 0}")
 
         # Check user savings goals
-        cursor.execute("SELECT COUNT(*) as count FROM financial_goal WHERE is_completed = 0")
-        active_goals = cursor.fetchone()['count']
+        active_goals = conn.execute(text(
+            "SELECT COUNT(*) as count FROM financial_goal WHERE is_completed = :completed"
+        ), {'completed': False}).scalar()
         print(f"\nActive financial goals: {active_goals}")
 
     except Exception as e:
@@ -163,6 +136,12 @@ def check_monthly_summary():
         conn.close()
 
 if __name__ == "__main__":
-    check_database_tables()
-    check_expenses()
-    check_monthly_summary()
\ No newline at end of file
+    with app.app_context():
+        # With sharding, the main database holds the directory and each shard its users' rows
+        for shard in shards.each_database():
+            if shards.shard_count():
+                print("\n=== Main database ===" if shard is None else f"\n=== Shard {shard} ===")
+            check_database_tables()
+            if shard is not None or not shards.shard_count():
+                check_expenses()
+                check_monthly_summary()
\ No newline at end of file
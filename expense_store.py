@@ -0,0 +1,196 @@
+"""
+Compact per-user expense columns kept in a bounded LRU.
+
+Aggregation routes only need each expense's date, category and amount, so
+instead of materializing Expense ORM objects they read from a columnar copy:
+day numbers in array('i'), amounts in array('d') and dictionary-encoded
+category codes in array('I'), about 16 bytes per expense. Entries are tagged
+with the user's data version; add_expense appends in place, and any other
+write (or a write from another worker) leaves the entry behind the database
+version so it is reloaded on next use.
+
+The store is per process. With EXPENSE_STORE_WARM set, each worker preloads
+its recently active users on a background thread after its first request.
+"""
+import logging
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import func, select
+
+import shards
+from analytics import SpendingColumns, to_day_number
+from cache import get_data_version
+from extensions import db
+from models import Expense, ExpenseDailyRollup
+
+logger = logging.getLogger(__name__)
+
+LOAD_BATCH_SIZE = 5000
+# Users with spending this recent are preloaded by warm()
+WARM_DAYS = 7
+
+
+class UserExpenses:
+    """One user's expenses as parallel arrays, in (date, id) order with later appends at the end."""
+
+    __slots__ = ('version', 'days', 'amounts', 'codes', 'names', 'name_codes')
+
+    def __init__(self, version):
+        self.version = version
+        self.days = array('i')
+        self.amounts = array('d')
+        self.codes = array('I')
+        self.names = []
+        self.name_codes = {}
+
+    def append(self, day, category, amount):
+        code = self.name_codes.get(category)
+        if code is None:
+            code = self.name_codes[category] = len(self.names)
+            self.names.append(category)
+        self.days.append(to_day_number(day))
+        self.amounts.append(amount)
+        self.codes.append(code)
+
+    def nbytes(self):
+        return sum(column.itemsize * len(column) for column in (self.days, self.amounts, self.codes))
+
+    def columns(self):
+        """Copy the arrays into NumPy SpendingColumns (the arrays stay appendable)."""
+        return SpendingColumns(
+            days=np.frombuffer(self.days, dtype=np.int32).astype(np.int64),
+            amounts=np.frombuffer(self.amounts, dtype=np.float64).copy(),
+            codes=np.frombuffer(self.codes, dtype=np.uint32).astype(np.int64),
+            names=np.array(self.names, dtype=str)
+        )
+
+
+class ExpenseStore:
+    """Thread-safe LRU of UserExpenses keyed by user id."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def columns(self, user_id):
+        """Get the user's expenses as SpendingColumns, loading them if missing or stale."""
+        version = get_data_version(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(user_id)
+                return entry.columns()
+
+        entry = self._load(user_id, version)
+        with self._lock:
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return entry.columns()
+
+    def _load(self, user_id, version):
+        entry = UserExpenses(version)
+        stmt = select(Expense.date, Expense.category, Expense.amount).where(
+            Expense.user_id == user_id
+        ).order_by(Expense.date, Expense.id).execution_options(yield_per=LOAD_BATCH_SIZE)
+        for day, category, amount in db.session.execute(stmt):
+            entry.append(day, category, amount)
+        return entry
+
+    def append(self, user_id, expenses, version):
+        """
+        Add newly committed expenses to a cached user
+
+        Args:
+            user_id: Owner of the expenses
+            expenses: Objects with date, category and amount attributes
+            version: The data version bump_data_version returned for this write
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return
+            if entry.version != version - 1:
+                # Another write landed in between; reload on next use
+                del self._entries[user_id]
+                return
+            for expense in expenses:
+                entry.append(expense.date, expense.category, expense.amount)
+            entry.version = version
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'users': len(self._entries),
+                'maxUsers': self.maxsize,
+                'expenses': sum(len(entry.days) for entry in self._entries.values()),
+                'bytes': sum(entry.nbytes() for entry in self._entries.values())
+            }
+
+
+expense_store = ExpenseStore(maxsize=int(os.environ.get('EXPENSE_STORE_SIZE', 256)))
+
+
+def warm(days=WARM_DAYS):
+    """
+    Load the most recently active users into this process's store (inside an app context)
+
+    Returns:
+        int: Number of users loaded
+    """
+    since = date.today() - timedelta(days=days)
+    warmed = 0
+    for _ in shards.each_shard():
+        user_ids = db.session.scalars(
+            select(ExpenseDailyRollup.user_id)
+            .where(ExpenseDailyRollup.day >= since)
+            .group_by(ExpenseDailyRollup.user_id)
+            .order_by(func.max(ExpenseDailyRollup.day).desc())
+            .limit(expense_store.maxsize)
+        ).all()
+        for user_id in user_ids:
+            expense_store.columns(user_id)
+        warmed += len(user_ids)
+        db.session.remove()
+    return warmed
+
+
+def init_app(app):
+    """Warm each worker process's store after its first request if EXPENSE_STORE_WARM is set."""
+    if not app.config.get('EXPENSE_STORE_WARM'):
+        return
+
+    lock = threading.Lock()
+    warmed_in = []
+
+    def run():
+        with app.app_context():
+            try:
+                logger.info(f"Expense store warmed with {warm()} users")
+            except Exception:
+                logger.exception("Warming the expense store failed")
+
+    @app.before_request
+    def start_warming():
+        # Started on the first request so it fills the worker's store, not a preloading parent's
+        if os.getpid() in warmed_in:
+            return
+        with lock:
+            if os.getpid() not in warmed_in:
+                warmed_in.append(os.getpid())
+                threading.Thread(target=run, name='expense-store-warm', daemon=True).start()
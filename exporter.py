@@ -0,0 +1,86 @@
+"""
+Streaming export of a user's expense history as CSV or NDJSON.
+
+Rows are read from a server-side cursor in fixed-size batches and written out
+as they arrive, so an export never holds the whole history in memory.
+"""
+import csv
+import io
+import json
+
+from sqlalchemy import select
+
+from extensions import db
+from models import Expense
+from queries import date_range_filter
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+EXPORT_COLUMNS = ('id', 'date', 'category', 'description', 'amount')
+YIELD_PER = 1000
+
+
+def _rows(user_id, start=None, end=None):
+    """Yield plain column tuples for the user's expenses in date order."""
+    stmt = select(
+        Expense.id,
+        Expense.date,
+        Expense.category,
+        Expense.description,
+        Expense.amount
+    ).where(
+        Expense.user_id == user_id,
+        *date_range_filter(start, end)
+    ).order_by(Expense.date, Expense.id).execution_options(
+        stream_results=True,
+        yield_per=YIELD_PER
+    )
+    for row in db.session.execute(stmt):
+        yield row
+
+
+def iter_csv(user_id, start=None, end=None):
+    """Yield the export as CSV text, one chunk per fetched batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    pending = 0
+
+    for row in _rows(user_id, start, end):
+        writer.writerow((row.id, row.date.strftime('%Y-%m-%d'), row.category, row.description or '', row.amount))
+        pending += 1
+        if pending >= YIELD_PER:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    yield buffer.getvalue()
+
+
+def iter_ndjson(user_id, start=None, end=None):
+    """Yield the export as newline-delimited JSON, one chunk per fetched batch."""
+    lines = []
+    for row in _rows(user_id, start, end):
+        lines.append(json.dumps({
+            'id': row.id,
+            'date': row.date.strftime('%Y-%m-%d'),
+            'category': row.category,
+            'description': row.description,
+            'amount': row.amount
+        }))
+        if len(lines) >= YIELD_PER:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def iter_export(user_id, fmt, start=None, end=None):
+    """Pick the chunk generator for an export format."""
+    if fmt == 'ndjson':
+        return iter_ndjson(user_id, start, end)
+    return iter_csv(user_id, start, end)
@@ -0,0 +1,347 @@
+"""
+Precomputed goal completion forecasts.
+
+Each goal's contribution history (its GoalContribution ledger, or just its
+start date and current amount for goals older than the ledger) is fitted by
+least squares to get a monthly contribution rate, and each user's monthly surplus (income minus the spending
+in the monthly rollup) is exponentially smoothed to estimate how much that
+rate can vary. Both fits are vectorized across every goal and user in a batch.
+The projected completion date and its confidence band are stored in
+GoalForecast, so /api/goals only reads them. Goal writes don't refit: they mark
+the user's forecasts stale, and the scheduler's refresh_stale_forecasts job
+refits them (along with goals that have no forecast yet) shortly after.
+
+    flask refresh-forecasts
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+
+import click
+import numpy as np
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func, insert, or_, select, update
+
+import recurrence
+import shards
+from analytics import from_day_number, to_day_number
+from cache import bump_data_versions
+from extensions import db
+from models import ExpenseMonthlyRollup, FinancialGoal, GoalContribution, GoalForecast, User
+
+logger = logging.getLogger(__name__)
+
+MONTH_DAYS = 30.4375
+SURPLUS_MONTHS = 12
+SMOOTHING = 0.3
+# Two-sided 80% band
+BAND_Z = 1.2816
+# Projections further out than this are reported as never completing
+MAX_HORIZON_MONTHS = 1200
+# Most recent ledger entries fitted per goal
+MAX_HISTORY_POINTS = 120
+USERS_PER_BATCH = 500
+
+
+def fit_rates(times, amounts, mask):
+    """
+    Least-squares slope of amount over time for every row at once
+
+    Args:
+        times: 2-D array of observation times in months, one goal per row
+        amounts: 2-D array of cumulative amounts, same shape as times
+        mask: Boolean array marking which entries of each row are observations
+
+    Returns:
+        tuple: (slopes, standard errors), zero where a row has too few points
+    """
+    weights = mask.astype(np.float64)
+    counts = weights.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_t = np.where(counts > 0, (weights * times).sum(axis=1) / counts, 0.0)
+        mean_a = np.where(counts > 0, (weights * amounts).sum(axis=1) / counts, 0.0)
+        dt = (times - mean_t[:, None]) * weights
+        da = (amounts - mean_a[:, None]) * weights
+        sxx = (dt * dt).sum(axis=1)
+        slopes = np.where(sxx > 0, (dt * da).sum(axis=1) / sxx, 0.0)
+        residuals = da - slopes[:, None] * dt
+        dof = counts - 2
+        stderr = np.where((dof > 0) & (sxx > 0),
+                          np.sqrt((residuals * residuals).sum(axis=1) / dof / sxx), 0.0)
+    return slopes, stderr
+
+
+def smooth_surplus(surplus, mask, alpha=SMOOTHING):
+    """
+    Exponentially weighted level and spread of each row's monthly surplus
+
+    Args:
+        surplus: 2-D array of monthly surplus, one user per row, oldest month first
+        mask: Boolean array marking the months that count for each user
+        alpha: Smoothing factor; the newest month has weight 1, the one before 1 - alpha
+
+    Returns:
+        tuple: (level, standard deviation) per row
+    """
+    ages = np.arange(surplus.shape[1] - 1, -1, -1)
+    weights = (1 - alpha) ** ages * mask
+    totals = weights.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        level = np.where(totals > 0, (weights * surplus).sum(axis=1) / totals, 0.0)
+        variance = np.where(totals > 0, (weights * (surplus - level[:, None]) ** 2).sum(axis=1) / totals, 0.0)
+    return level, np.sqrt(variance)
+
+
+def project(remaining, rates, stddevs, today, z=BAND_Z):
+    """
+    Completion dates for the remaining amounts at each rate and its band
+
+    Returns:
+        tuple: (projected, earliest, latest) lists of dates, None where never reached
+    """
+    def months_to_finish(rate):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            months = np.where(rate > 0, remaining / rate, np.inf)
+        return np.where(months <= MAX_HORIZON_MONTHS, months, np.inf)
+
+    start = to_day_number(today)
+
+    def to_dates(months):
+        return [None if np.isinf(value) else from_day_number(start + round(value * MONTH_DAYS))
+                for value in months]
+
+    return (to_dates(months_to_finish(rates)),
+            to_dates(months_to_finish(rates + z * stddevs)),
+            to_dates(months_to_finish(rates - z * stddevs)))
+
+
+def _month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+def _load_goals(user_ids, today):
+    return db.session.execute(
+        select(FinancialGoal.id, FinancialGoal.user_id, FinancialGoal.target_amount,
+               FinancialGoal.current_amount, FinancialGoal.start_date, FinancialGoal.priority,
+               recurrence.monthly_income_column(today), User.created_at)
+        .join(User, User.id == FinancialGoal.user_id)
+        .where(FinancialGoal.user_id.in_(user_ids))
+        .where(or_(FinancialGoal.is_completed.is_(None), FinancialGoal.is_completed.is_(False)))
+        .order_by(FinancialGoal.id)
+    ).all()
+
+
+def _contribution_history(goal_ids, user_ids, starts, currents, today):
+    """
+    Padded (times, amounts, mask) arrays of each goal's balance over time, in months since its start
+
+    Goals without ledger entries get two points: nothing at the start date and
+    the current amount today. A row only counts when its points span a month.
+    """
+    ledger = defaultdict(list)
+    rows = db.session.execute(
+        select(GoalContribution.goal_id, GoalContribution.created_at, GoalContribution.balance)
+        .where(GoalContribution.user_id.in_(user_ids))
+        .order_by(GoalContribution.goal_id, GoalContribution.id)
+    )
+    for goal_id, created_at, balance in rows:
+        ledger[goal_id].append((created_at.date(), balance))
+
+    histories = []
+    for goal_id, start, current in zip(goal_ids, starts, currents):
+        points = ledger.get(goal_id, [(start, 0.0)])[-MAX_HISTORY_POINTS:]
+        histories.append(points + [(today, current)])
+
+    width = max(len(points) for points in histories)
+    times = np.zeros((len(histories), width))
+    amounts = np.zeros((len(histories), width))
+    mask = np.zeros((len(histories), width), dtype=bool)
+    for row, (start, points) in enumerate(zip(starts, histories)):
+        times[row, :len(points)] = [(day - start).days / MONTH_DAYS for day, _ in points]
+        amounts[row, :len(points)] = [balance for _, balance in points]
+        mask[row, :len(points)] = True
+
+    span = np.where(mask, times, -np.inf).max(axis=1) - np.where(mask, times, np.inf).min(axis=1)
+    has_history = span >= 1
+    return times, amounts, mask & has_history[:, None], has_history
+
+
+def _surplus_matrix(user_ids, incomes, created, today):
+    """Monthly income minus spending for the last SURPLUS_MONTHS complete months."""
+    last = _month_index(today) - 1
+    first = last - SURPLUS_MONTHS + 1
+    first_day = date(first // 12, first % 12 + 1, 1)
+    end_day = date(today.year, today.month, 1)
+
+    rows = db.session.execute(
+        select(ExpenseMonthlyRollup.user_id, ExpenseMonthlyRollup.month, func.sum(ExpenseMonthlyRollup.total))
+        .where(ExpenseMonthlyRollup.user_id.in_(user_ids))
+        .where(ExpenseMonthlyRollup.month >= first_day, ExpenseMonthlyRollup.month < end_day)
+        .group_by(ExpenseMonthlyRollup.user_id, ExpenseMonthlyRollup.month)
+    ).all()
+
+    position = {user_id: index for index, user_id in enumerate(user_ids)}
+    spending = np.zeros((len(user_ids), SURPLUS_MONTHS))
+    active = np.zeros((len(user_ids), SURPLUS_MONTHS), dtype=bool)
+    if rows:
+        row_users, months, totals = zip(*rows)
+        users = np.array([position[user_id] for user_id in row_users])
+        columns = np.array([_month_index(month) for month in months]) - first
+        spending[users, columns] = totals
+        active[users, columns] = True
+
+    # A month counts once the user existed or had spending in it
+    joined = np.array([_month_index(day) for day in created]) - first
+    active |= np.arange(SURPLUS_MONTHS)[None, :] >= joined[:, None]
+    return np.asarray(incomes, dtype=np.float64)[:, None] - spending, active
+
+
+def _forecast_batch(user_ids, today, computed_at):
+    """Fit and project every open goal of user_ids, returning GoalForecast rows."""
+    goals = _load_goals(user_ids, today)
+    if not goals:
+        return []
+
+    goal_ids, owners, targets, currents, starts, priorities, incomes, created = zip(*goals)
+    targets = np.asarray(targets, dtype=np.float64)
+    currents = np.nan_to_num(np.asarray(currents, dtype=np.float64))
+
+    times, amounts, mask, has_history = _contribution_history(goal_ids, user_ids, starts, currents, today)
+    observed, observed_error = fit_rates(times, amounts, mask)
+
+    # Surplus per user, shared across the user's open goals by priority (1 = highest)
+    users, user_index = np.unique(np.asarray(owners), return_inverse=True)
+    first_goal = np.unique(user_index, return_index=True)[1]
+    user_incomes = [incomes[index] or 0.0 for index in first_goal]
+    user_created = [created[index] or today for index in first_goal]
+    surplus, mask = _surplus_matrix(users.tolist(), user_incomes, user_created, today)
+    level, spread = smooth_surplus(surplus, mask)
+    weights = 6 - np.clip(np.nan_to_num(np.asarray(priorities, dtype=np.float64), nan=3), 1, 5)
+    shares = weights / np.bincount(user_index, weights=weights)[user_index]
+    capacity = np.maximum(level[user_index], 0) * shares
+    capacity_error = spread[user_index] * shares
+
+    rates = np.where(has_history, observed, capacity)
+    stddevs = np.where(has_history, np.hypot(observed_error, capacity_error), capacity_error)
+    remaining = np.maximum(targets - currents, 0)
+    projected, earliest, latest = project(remaining, rates, stddevs, today)
+
+    return [{
+        'goal_id': goal_ids[index],
+        'user_id': owners[index],
+        'monthly_rate': float(rates[index]),
+        'rate_stddev': float(stddevs[index]),
+        'projected_date': projected[index],
+        'earliest_date': earliest[index],
+        'latest_date': latest[index],
+        'computed_at': computed_at
+    } for index in range(len(goal_ids))]
+
+
+def refresh_forecasts(user_ids=None, today=None, commit=True):
+    """
+    Recompute and store the forecasts of every open goal
+
+    Args:
+        user_ids: Only refresh these users, or None for everyone with goals
+        today: Date the projections start from
+        commit: Commit after each batch, bumping the batch's data versions; pass
+            False to join the caller's transaction, which bumps the version itself
+
+    Returns:
+        int: Number of forecasts written
+    """
+    today = today or date.today()
+    computed_at = datetime.utcnow()
+    if user_ids is None:
+        user_ids = db.session.scalars(
+            select(FinancialGoal.user_id).distinct().order_by(FinancialGoal.user_id)
+        ).all()
+    user_ids = list(user_ids)
+
+    written = 0
+    for offset in range(0, len(user_ids), USERS_PER_BATCH):
+        batch = user_ids[offset:offset + USERS_PER_BATCH]
+        rows = _forecast_batch(batch, today, computed_at)
+        db.session.execute(delete(GoalForecast).where(GoalForecast.user_id.in_(batch)))
+        if rows:
+            db.session.execute(insert(GoalForecast), rows)
+        written += len(rows)
+        if commit:
+            bump_data_versions(batch)
+            db.session.commit()
+    return written
+
+
+def stale_forecast_users():
+    """Ids of the users with an open goal whose forecast is stale or missing."""
+    return db.session.scalars(
+        select(FinancialGoal.user_id).distinct()
+        .outerjoin(GoalForecast, GoalForecast.goal_id == FinancialGoal.id)
+        .where(or_(FinancialGoal.is_completed.is_(None), FinancialGoal.is_completed.is_(False)))
+        .where(or_(GoalForecast.goal_id.is_(None), GoalForecast.stale.is_(True)))
+        .order_by(FinancialGoal.user_id)
+    ).all()
+
+
+def refresh_stale_forecasts(today=None):
+    """Refit the forecasts of users whose goals changed since their last refresh."""
+    return refresh_forecasts(stale_forecast_users(), today=today)
+
+
+def mark_stale(user_id):
+    """
+    Flag the user's forecasts for the next refresh_stale_forecasts, in the caller's transaction
+
+    All of a user's goals share their monthly surplus, so a write to one goal
+    makes every forecast of the user stale.
+    """
+    db.session.execute(
+        update(GoalForecast).where(GoalForecast.user_id == user_id).values(stale=True)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def delete_forecast(goal_id):
+    """Remove a goal's forecast ahead of deleting the goal."""
+    db.session.execute(delete(GoalForecast).where(GoalForecast.goal_id == goal_id))
+
+
+def forecast_json(forecast, goal):
+    """Serialize a stored GoalForecast for the goals API, or None if there is none."""
+    if forecast is None:
+        return None
+
+    def iso(day):
+        return day.strftime('%Y-%m-%d') if day else None
+
+    return {
+        'projectedDate': iso(forecast.projected_date),
+        'earliestDate': iso(forecast.earliest_date),
+        'latestDate': iso(forecast.latest_date),
+        'monthlyRate': forecast.monthly_rate,
+        'onTrack': forecast.projected_date is not None and forecast.projected_date <= goal.target_date,
+        'stale': forecast.stale,
+        'computedAt': forecast.computed_at.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+
+@click.command('refresh-forecasts')
+@click.option('--user-id', type=int, default=None, help='Only refresh forecasts for this user.')
+@with_appcontext
+def refresh_forecasts_command(user_id):
+    """Recompute the stored goal completion forecasts."""
+    try:
+        if user_id is not None:
+            if not shards.select_for_user(user_id):
+                raise click.ClickException(f'User {user_id} is not in the shard directory.')
+            written = refresh_forecasts([user_id])
+        else:
+            written = sum(refresh_forecasts() for _ in shards.each_shard())
+        click.echo(f'Refreshed {written} goal forecasts.')
+    except click.ClickException:
+        raise
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error refreshing forecasts: {e}")
+        raise click.ClickException(str(e))
@@ -0,0 +1,43 @@
+"""
+gunicorn settings.
+
+    gunicorn main:app                    # uses this file from the working directory
+    GUNICORN_PRELOAD=0 gunicorn main:app
+
+With preload (the default) the master imports the app once and forks the
+workers from it, so the interpreter, numpy and the route modules are loaded
+once and shared copy-on-write instead of once per worker. The objects created
+while loading are moved out of the garbage collector's reach before forking,
+because a collection in a worker would otherwise write to (and so copy) every
+page holding them. Each worker then replaces the database connections it
+inherited with its own.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1').lower() in ('1', 'true', 'yes')
+# Restart workers now and then so a slow leak can't grow forever
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = max(max_requests // 10, 0)
+
+
+def pre_fork(server, worker):
+    # Everything allocated so far is left alone by the collector, so its pages stay shared
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if not server.cfg.preload_app:
+        return
+    from extensions import db
+    from main import app
+
+    # Pooled connections opened in the master must not be shared with it
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -0,0 +1,278 @@
+"""
+Streaming bulk import of expenses from CSV and OFX bank statements.
+
+Statements are parsed row by row from the open file, validated with the same
+rules as the add expense API, and inserted in executemany batches with one
+commit per batch, so memory stays flat no matter how long the history is.
+
+Only debits become expenses. In a CSV with separate debit and credit columns,
+rows without a debit are skipped. A single amount column is read as signed
+(negative = debit) unless amounts='expenses' says every row is an expense, as
+in this app's own CSV export. Skipped credits are counted in the report.
+"""
+import csv
+import io
+import logging
+import re
+from collections import namedtuple
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import insert
+
+import rollups
+import shards
+from cache import bump_data_version
+from extensions import db
+from models import Expense
+from utils import parse_expense_data
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+SUPPORTED_FORMATS = ('csv', 'ofx')
+# How a CSV amount column is read: bank-style signed amounts, or every row an expense
+AMOUNT_CONVENTIONS = ('signed', 'expenses')
+
+# Header aliases seen in common bank CSV exports, mapped to expense fields
+CSV_COLUMNS = {
+    'date': ('date', 'transaction date', 'posted date', 'posting date', 'value date'),
+    'amount': ('amount', 'transaction amount'),
+    'debit': ('debit', 'debit amount', 'withdrawal', 'withdrawal amount'),
+    'credit': ('credit', 'credit amount', 'deposit', 'deposit amount'),
+    'category': ('category',),
+    'description': ('description', 'memo', 'narration', 'payee', 'details', 'name'),
+}
+
+# Row shape handed to rollups.apply_expenses for each inserted batch
+ImportedExpense = namedtuple('ImportedExpense', 'user_id date category amount')
+
+_OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+def detect_format(filename, requested=None):
+    """Pick the statement format from an explicit choice or the file extension."""
+    if requested:
+        fmt = requested.lower()
+    elif filename and filename.lower().endswith(('.ofx', '.qfx')):
+        fmt = 'ofx'
+    else:
+        fmt = 'csv'
+    if fmt not in SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}'. Use csv or ofx.")
+    return fmt
+
+
+def _signed_amount(value):
+    """Normalize an amount cell, turning accounting negatives like (12.50) into -12.50."""
+    amount = value.replace(',', '').strip()
+    if amount.startswith('(') and amount.endswith(')'):
+        amount = '-' + amount[1:-1].strip()
+    return amount
+
+
+def iter_csv_rows(stream, default_category='Other', amounts='signed'):
+    """
+    Yield (row number, expense data) pairs from a CSV statement
+
+    Headers are matched case-insensitively against CSV_COLUMNS. A debit column
+    takes precedence over an amount column. Credits are yielded with None as
+    their data so they can be counted as skipped.
+    """
+    reader = csv.reader(stream)
+    try:
+        headers = [header.strip().lower() for header in next(reader)]
+    except StopIteration:
+        return
+
+    positions = {}
+    for field, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in headers:
+                positions[field] = headers.index(alias)
+                break
+
+    for line_number, row in enumerate(reader, start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+        data = {}
+        for field, position in positions.items():
+            data[field] = row[position].strip() if position < len(row) else ''
+        if 'debit' in positions:
+            amount = _signed_amount(data.pop('debit'))
+            if not amount and data.get('credit'):
+                yield line_number, None
+                continue
+            amount = amount.lstrip('-')
+        else:
+            amount = _signed_amount(data.get('amount', ''))
+            if amounts == 'signed' and amount:
+                if not amount.startswith('-'):
+                    yield line_number, None
+                    continue
+                amount = amount[1:]
+        data.pop('credit', None)
+        data['amount'] = amount
+        data['category'] = data.get('category') or default_category
+        yield line_number, data
+
+
+def _iter_ofx_tags(stream, chunk_size=65536):
+    """Yield (closing, tag, text) tokens from an OFX stream, reading it in chunks."""
+    buffer = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        # Keep a possibly incomplete trailing tag for the next chunk
+        cut = buffer.rfind('<')
+        if cut <= 0:
+            continue
+        for match in _OFX_TAG.finditer(buffer, 0, cut):
+            yield match.group(1) == '/', match.group(2).upper(), match.group(3).strip()
+        buffer = buffer[cut:]
+    for match in _OFX_TAG.finditer(buffer):
+        yield match.group(1) == '/', match.group(2).upper(), match.group(3).strip()
+
+
+def iter_ofx_rows(stream, default_category='Other'):
+    """
+    Yield (transaction number, expense data) pairs from an OFX/QFX statement
+
+    Works for both SGML (OFX 1.x, unclosed tags) and XML (OFX 2.x) files.
+    Only debits (negative TRNAMT) are expenses; credits are yielded with None
+    as their data.
+    """
+    transaction = None
+    number = 0
+    for closing, tag, text in _iter_ofx_tags(stream):
+        if tag == 'STMTTRN':
+            if not closing:
+                transaction = {}
+                number += 1
+                continue
+            if transaction is not None:
+                amount = transaction.get('TRNAMT', '').replace(',', '')
+                if not amount.startswith('-'):
+                    transaction = None
+                    yield number, None
+                    continue
+                posted = transaction.get('DTPOSTED', '')[:8]
+                try:
+                    date_str = datetime.strptime(posted, '%Y%m%d').strftime('%Y-%m-%d')
+                except ValueError:
+                    date_str = posted
+                yield number, {
+                    'amount': amount[1:],
+                    'category': default_category,
+                    'description': transaction.get('NAME') or transaction.get('MEMO', ''),
+                    'date': date_str
+                }
+            transaction = None
+        elif transaction is not None and not closing and text:
+            transaction[tag] = text
+
+
+def _flush(user_id, batch):
+    """Insert one batch with executemany, update rollups and commit."""
+    db.session.execute(insert(Expense), [dict(row, user_id=user_id) for row in batch])
+    rollups.apply_expenses(
+        ImportedExpense(user_id, row['date'], row['category'], row['amount']) for row in batch
+    )
+    bump_data_version(user_id)
+    db.session.commit()
+
+
+def import_expenses(user_id, stream, fmt='csv', default_category='Other', batch_size=BATCH_SIZE,
+                    amounts='signed'):
+    """
+    Stream a bank statement into the user's expenses
+
+    Args:
+        user_id: Owner of the imported expenses
+        stream: Text stream positioned at the start of the statement
+        fmt: 'csv' or 'ofx'
+        default_category: Category for rows that don't carry one
+        batch_size: Rows per executemany insert and commit
+        amounts: 'signed' or 'expenses', for a CSV with a single amount column
+
+    Returns:
+        dict: imported count, rejected count, skipped credits and the first per-row errors
+    """
+    if amounts not in AMOUNT_CONVENTIONS:
+        raise ValueError(f"Unsupported amounts '{amounts}'. Use signed or expenses.")
+    if fmt == 'ofx':
+        rows = iter_ofx_rows(stream, default_category)
+    else:
+        rows = iter_csv_rows(stream, default_category, amounts)
+    imported = 0
+    rejected = 0
+    skipped = 0
+    errors = []
+    batch = []
+
+    try:
+        for row_number, data in rows:
+            if data is None:
+                skipped += 1
+                continue
+            try:
+                fields = parse_expense_data(data)
+            except ValueError as e:
+                rejected += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({'row': row_number, 'message': str(e)})
+                continue
+
+            batch.append(fields)
+            if len(batch) >= batch_size:
+                _flush(user_id, batch)
+                imported += len(batch)
+                batch = []
+
+        if batch:
+            _flush(user_id, batch)
+            imported += len(batch)
+    except Exception:
+        db.session.rollback()
+        logger.exception(f"Import failed for user {user_id} after {imported} expenses")
+        raise
+
+    return {
+        'imported': imported,
+        'rejected': rejected,
+        'skipped': skipped,
+        'errors': errors
+    }
+
+
+def open_upload(file_storage):
+    """Wrap an uploaded file's binary stream as text without reading it into memory."""
+    return io.TextIOWrapper(file_storage.stream, encoding='utf-8-sig', errors='replace', newline='')
+
+
+@click.command('import-expenses')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--user-id', type=int, required=True, help='Owner of the imported expenses.')
+@click.option('--format', 'fmt', type=click.Choice(SUPPORTED_FORMATS), default=None,
+              help='Statement format (defaults to the file extension).')
+@click.option('--default-category', default='Other', show_default=True)
+@click.option('--amounts', type=click.Choice(AMOUNT_CONVENTIONS), default='signed', show_default=True,
+              help="How a single CSV amount column is read: negative debits, or every row an expense.")
+@click.option('--batch-size', type=int, default=BATCH_SIZE, show_default=True)
+@with_appcontext
+def import_expenses_command(path, user_id, fmt, default_category, amounts, batch_size):
+    """Import expenses from a CSV or OFX bank statement."""
+    if not shards.select_for_user(user_id):
+        raise click.ClickException(f'User {user_id} is not in the shard directory.')
+    fmt = detect_format(path, fmt)
+    with open(path, encoding='utf-8-sig', errors='replace', newline='') as stream:
+        report = import_expenses(user_id, stream, fmt, default_category, batch_size, amounts)
+
+    click.echo(f"Imported {report['imported']} expenses, rejected {report['rejected']} rows, "
+               f"skipped {report['skipped']} credits.")
+    for error in report['errors']:
+        click.echo(f"  Row {error['row']}: {error['message']}")
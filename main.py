@@ -1,18 +1,18 @@
-from app import app, db
+from app import create_app
 import logging
+import migrations
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Create database tables if they don't exist
-try:
-    with app.app_context():
-        logger.info("Creating database tables if they don't exist...")
-        db.create_all()
-        logger.info("Database tables created successfully.")
-except Exception as e:
-    logger.error(f"Error creating database tables: {e}")
+# Imported by gunicorn (main:app); the schema is managed with `flask --app main migrate`
+app = create_app()
 
 if __name__ == "__main__":
+    try:
+        with app.app_context():
+            logger.info("Applying pending database migrations...")
+            migrations.upgrade()
+            logger.info("Database schema is up to date.")
+    except Exception as e:
+        logger.error(f"Error migrating database: {e}")
     app.run(host="0.0.0.0", port=5000, debug=True)
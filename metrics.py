@@ -0,0 +1,174 @@
+"""
+Low-overhead request instrumentation exposed in Prometheus text format.
+
+Every request records its latency, database query count and time, response
+size and status code against the matched endpoint (not the raw URL, so label
+cardinality stays bounded). Histograms use fixed buckets and are updated under
+one lock, which costs a few microseconds per request.
+
+Metrics are kept per process; with several gunicorn workers each worker
+reports its own series, so scrape them individually or aggregate by instance.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+from extensions import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a running sum and count."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """Yield (le, cumulative count) pairs, ending with +Inf."""
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            yield bound, running
+        yield '+Inf', self.count
+
+
+class MetricsRegistry:
+    """Per-endpoint request metrics for one process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}
+        self.query_count = {}
+        self.query_seconds = {}
+        self.response_bytes = {}
+        self.responses = {}
+
+    def _histogram(self, series, key, buckets):
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram(buckets)
+        return histogram
+
+    def observe(self, endpoint, method, status, seconds, queries, query_seconds, size):
+        key = (endpoint, method)
+        with self._lock:
+            self._histogram(self.latency, key, LATENCY_BUCKETS).observe(seconds)
+            self._histogram(self.query_count, key, QUERY_COUNT_BUCKETS).observe(queries)
+            self.query_seconds[key] = self.query_seconds.get(key, 0.0) + query_seconds
+            if size is not None:
+                self._histogram(self.response_bytes, key, SIZE_BUCKETS).observe(size)
+            status_key = (endpoint, method, str(status))
+            self.responses[status_key] = self.responses.get(status_key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            for series in (self.latency, self.query_count, self.query_seconds,
+                           self.response_bytes, self.responses):
+                series.clear()
+
+    def render(self):
+        """Render every series in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            _render_histogram(lines, 'http_request_duration_seconds',
+                              'Request latency by endpoint.', self.latency)
+            _render_histogram(lines, 'http_request_db_queries',
+                              'Database queries issued per request.', self.query_count)
+            lines.append('# HELP http_request_db_seconds_total Time spent in database queries.')
+            lines.append('# TYPE http_request_db_seconds_total counter')
+            for (endpoint, method), total in sorted(self.query_seconds.items()):
+                lines.append(f'http_request_db_seconds_total{_labels(endpoint=endpoint, method=method)} {total}')
+            _render_histogram(lines, 'http_response_size_bytes',
+                              'Response body size by endpoint.', self.response_bytes)
+            lines.append('# HELP http_responses_total Responses by endpoint and status code.')
+            lines.append('# TYPE http_responses_total counter')
+            for (endpoint, method, status), total in sorted(self.responses.items()):
+                lines.append(f'http_responses_total{_labels(endpoint=endpoint, method=method, status=status)} {total}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(**labels):
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in labels.items()
+    )
+    return '{' + pairs + '}'
+
+
+def _render_histogram(lines, name, help_text, series):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} histogram')
+    for (endpoint, method), histogram in sorted(series.items()):
+        for bound, count in histogram.samples():
+            lines.append(f'{name}_bucket{_labels(endpoint=endpoint, method=method, le=bound)} {count}')
+        lines.append(f'{name}_sum{_labels(endpoint=endpoint, method=method)} {histogram.sum}')
+        lines.append(f'{name}_count{_labels(endpoint=endpoint, method=method)} {histogram.count}')
+
+
+registry = MetricsRegistry()
+
+
+# The start time lives on the statement's execution context, so a statement
+# that raises (and never gets an after_cursor_execute) leaves nothing behind
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.metrics_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'metrics_query_start', None)
+    if started is not None and has_request_context() and 'metrics_start' in g:
+        g.metrics_queries += 1
+        g.metrics_query_seconds += time.perf_counter() - started
+
+
+def _start_timer():
+    g.metrics_queries = 0
+    g.metrics_query_seconds = 0.0
+    g.metrics_start = time.perf_counter()
+
+
+def _record_response(response):
+    if 'metrics_start' not in g:
+        return response
+    size = None if response.is_streamed else response.calculate_content_length()
+    registry.observe(
+        request.endpoint or 'unmatched',
+        request.method,
+        response.status_code,
+        time.perf_counter() - g.metrics_start,
+        g.metrics_queries,
+        g.metrics_query_seconds,
+        size
+    )
+    return response
+
+
+def metrics_view():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    """Instrument every request and the app's engines, and serve the metrics at /metrics."""
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    app.before_request(_start_timer)
+    app.after_request(_record_response)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
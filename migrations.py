@@ -0,0 +1,192 @@
+"""
+Versioned schema migrations.
+
+The schema is no longer created when the app is imported. Each migration
+below runs once per database, in order, and is recorded in SchemaMigration.
+Migrations are idempotent, so a database whose schema was created by the old
+create_all-at-import code upgrades cleanly. With sharding, the main database
+and every shard are migrated in turn, each getting only its own tables.
+
+    flask migrate            # apply pending migrations
+    flask migrate --status   # list applied and pending migrations
+"""
+import logging
+from collections import namedtuple
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import inspect, insert, select, text
+from sqlalchemy.exc import IntegrityError
+
+import shards
+from extensions import db
+from models import Expense, ExpenseDailyRollup, FinancialGoal, GoalForecast, SchemaMigration, ShardDirectory
+
+logger = logging.getLogger(__name__)
+
+Migration = namedtuple('Migration', 'version name func')
+MIGRATIONS = []
+
+
+def migration(version, name):
+    """Register a function as migration ``version``; versions must be added in increasing order."""
+    def register(func):
+        if MIGRATIONS and version <= MIGRATIONS[-1].version:
+            raise ValueError(f'Migration {version} is out of order')
+        MIGRATIONS.append(Migration(version, name, func))
+        return func
+    return register
+
+
+def _tables():
+    """The tables that belong in the database being migrated."""
+    tables = db.metadata.sorted_tables
+    if not shards.shard_count():
+        return tables
+    if shards.current_shard() is None:
+        return [table for table in tables
+                if table.name in shards.DIRECTORY_TABLES | shards.PER_DATABASE_TABLES]
+    return [table for table in tables if table.name not in shards.DIRECTORY_TABLES]
+
+
+def _has_table(table):
+    return table in _tables()
+
+
+@migration(1, 'create_tables')
+def create_tables():
+    """Create any table that doesn't exist yet."""
+    db.metadata.create_all(shards.current_engine(), tables=_tables())
+
+
+@migration(2, 'expense_user_date_index')
+def expense_user_date_index():
+    """Composite (user_id, date) index on databases created before it was added."""
+    if not _has_table(Expense.__table__):
+        return
+    for index in Expense.__table__.indexes:
+        index.create(shards.current_engine(), checkfirst=True)
+
+
+@migration(3, 'financial_goal_version')
+def financial_goal_version():
+    """Optimistic concurrency column on databases created before it was added."""
+    if not _has_table(FinancialGoal.__table__):
+        return
+    columns = {column['name'] for column in inspect(shards.current_engine()).get_columns(FinancialGoal.__tablename__)}
+    if 'version' not in columns:
+        db.session.execute(text(
+            f'ALTER TABLE {FinancialGoal.__tablename__} ADD COLUMN version INTEGER NOT NULL DEFAULT 1'
+        ))
+        db.session.commit()
+
+
+@migration(4, 'backfill_rollups')
+def backfill_rollups():
+    """Build the expense rollups for expenses written before the rollup tables existed."""
+    import rollups
+
+    if not _has_table(Expense.__table__):
+        return
+    has_expenses = db.session.scalar(select(Expense.id).limit(1)) is not None
+    has_rollups = db.session.scalar(select(ExpenseDailyRollup.user_id).limit(1)) is not None
+    if has_expenses and not has_rollups:
+        rollups.rebuild_rollups()
+
+
+@migration(5, 'shard_directory')
+def shard_directory():
+    """Shard directory on databases created before sharding was added."""
+    if _has_table(ShardDirectory.__table__):
+        ShardDirectory.__table__.create(shards.current_engine(), checkfirst=True)
+
+
+@migration(6, 'goal_forecast_stale')
+def goal_forecast_stale():
+    """Stale flag on forecasts of databases created before goal writes stopped refitting them."""
+    if not _has_table(GoalForecast.__table__):
+        return
+    columns = {column['name'] for column in inspect(shards.current_engine()).get_columns(GoalForecast.__tablename__)}
+    if 'stale' not in columns:
+        db.session.execute(text(
+            f'ALTER TABLE {GoalForecast.__tablename__} ADD COLUMN stale BOOLEAN NOT NULL DEFAULT FALSE'
+        ))
+        db.session.commit()
+
+
+def applied_versions():
+    """Versions already applied to the selected database, creating the bookkeeping table if needed."""
+    SchemaMigration.__table__.create(shards.current_engine(), checkfirst=True)
+    return set(db.session.scalars(select(SchemaMigration.version)))
+
+
+def pending_migrations():
+    applied = applied_versions()
+    return [step for step in MIGRATIONS if step.version not in applied]
+
+
+def _database_name(shard):
+    return 'main database' if shard is None else f'shard {shard}'
+
+
+def upgrade(target=None, echo=None):
+    """
+    Apply pending migrations in order to every database (inside an app context)
+
+    Args:
+        target: Stop after this version, or None for the latest
+        echo: Optional callable told the name of each migration as it runs
+
+    Returns:
+        list: Versions applied (once per database they were applied to)
+    """
+    applied = []
+    for shard in shards.each_database():
+        applied.extend(_upgrade_database(target, echo, shard))
+    return applied
+
+
+def _upgrade_database(target, echo, shard):
+    applied = []
+    for step in pending_migrations():
+        if target is not None and step.version > target:
+            break
+        if echo:
+            prefix = f'{_database_name(shard)}: ' if shards.shard_count() else ''
+            echo(f'{prefix}Applying {step.version:04d} {step.name}')
+        step.func()
+        try:
+            db.session.execute(insert(SchemaMigration).values(
+                version=step.version, name=step.name, applied_at=datetime.utcnow()
+            ))
+            db.session.commit()
+        except IntegrityError:
+            # Another process applied it concurrently; migrations are idempotent
+            db.session.rollback()
+        applied.append(step.version)
+    return applied
+
+
+@click.command('migrate')
+@click.option('--status', is_flag=True, help='List applied and pending migrations without applying them.')
+@click.option('--target', type=int, default=None, help='Stop after this migration version.')
+@with_appcontext
+def migrate_command(status, target):
+    """Bring the database schema up to date."""
+    try:
+        if status:
+            for shard in shards.each_database():
+                if shards.shard_count():
+                    click.echo(f'{_database_name(shard)}:')
+                applied = applied_versions()
+                for step in MIGRATIONS:
+                    state = 'applied' if step.version in applied else 'pending'
+                    click.echo(f'{step.version:04d} {step.name}: {state}')
+            return
+        applied = upgrade(target, echo=click.echo)
+        click.echo(f'Applied {len(applied)} migrations.' if applied else 'Database schema is up to date.')
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error migrating database: {e}")
+        raise click.ClickException(str(e))
@@ -1,5 +1,8 @@
 from extensions import db
-from datetime import datetime
+from datetime import datetime, timedelta
+
+# How long a password reset OTP stays valid
+RESET_OTP_LIFETIME = timedelta(minutes=15)
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -35,6 +38,11 @@ class Expense(db.Model):
     date = db.Column(db.Date, nullable=False, default=datetime.utcnow().date())
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Composite index so per-user date range reads don't scan the user's full history
+    __table_args__ = (
+        db.Index('ix_expense_user_date', 'user_id', 'date'),
+    )
+    
     def __repr__(self):
         return f'<Expense {self.id} - ${self.amount}>'
 
@@ -52,6 +60,10 @@ class FinancialGoal(db.Model):
     is_completed = db.Column(db.Boolean, default=False)
     milestones_reached = db.Column(db.Integer, default=0)  # Count of milestone celebrations (25%, 50%, 75%, 100%)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped by every UPDATE, which only applies if the row still has the version it was read at
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    
+    __mapper_args__ = {'version_id_col': version}
     
     def __repr__(self):
         return f'<FinancialGoal {self.title} - Progress: {self.get_progress_percentage()}%>'
@@ -96,14 +108,145 @@ class FinancialGoal(db.Model):
         
         return progress_percentage >= time_percentage
 
+class GoalContribution(db.Model):
+    """Append-only ledger of changes to a goal's current_amount"""
+    id = db.Column(db.Integer, primary_key=True)
+    goal_id = db.Column(db.Integer, db.ForeignKey('financial_goal.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    amount = db.Column(db.Float, nullable=False)  # Change applied; negative for withdrawals and corrections
+    balance = db.Column(db.Float, nullable=False)  # current_amount after the change
+    source = db.Column(db.String(20), nullable=False)  # initial, contribution, progress or edit
+    goal_version = db.Column(db.Integer, nullable=False)  # FinancialGoal.version the change produced
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_goal_contribution_goal_id', 'goal_id', 'id'),
+        db.Index('ix_goal_contribution_user_id', 'user_id'),
+    )
+    
+    def __repr__(self):
+        return f'<GoalContribution {self.goal_id} {self.amount:+} = {self.balance}>'
+
 class Income(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     amount = db.Column(db.Float, nullable=False)
     source = db.Column(db.String(100), nullable=False)
-    frequency = db.Column(db.String(20), nullable=False)  # monthly, weekly, yearly
+    frequency = db.Column(db.String(20), nullable=False)  # weekly, biweekly, monthly, quarterly, yearly or once
     date = db.Column(db.Date, nullable=False, default=datetime.utcnow().date())
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
         return f'<Income {self.id} - ${self.amount} ({self.frequency})>'
+
+class RecurringExpense(db.Model):
+    """Template for an expense that repeats; recurrence.materialize_recurring_expenses writes the Expense rows"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    amount = db.Column(db.Float, nullable=False)
+    category = db.Column(db.String(50), nullable=False)
+    description = db.Column(db.String(200))
+    frequency = db.Column(db.String(20), nullable=False)  # weekly, biweekly, monthly, quarterly or yearly
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=True)
+    next_date = db.Column(db.Date, nullable=True, index=True)  # First occurrence not yet materialized; None when finished
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<RecurringExpense {self.id} - ${self.amount} ({self.frequency})>'
+
+class ExpenseDailyRollup(db.Model):
+    """Per-day expense totals, kept in step with Expense writes (see rollups.py)"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    expense_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<ExpenseDailyRollup {self.user_id} {self.day} {self.category} - ${self.total}>'
+
+class ExpenseMonthlyRollup(db.Model):
+    """Per-month expense totals; month is stored as the first day of the month"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)
+    category = db.Column(db.String(50), primary_key=True)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    expense_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<ExpenseMonthlyRollup {self.user_id} {self.month} {self.category} - ${self.total}>'
+
+class UserDataVersion(db.Model):
+    """Counter bumped on every write to a user's data, used to key cached responses (see cache.py)"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<UserDataVersion {self.user_id} v{self.version}>'
+
+class GoalForecast(db.Model):
+    """Projected completion of a goal, refreshed in batch by forecasting.refresh_forecasts"""
+    goal_id = db.Column(db.Integer, db.ForeignKey('financial_goal.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    monthly_rate = db.Column(db.Float, nullable=False, default=0.0)  # Expected contribution per month
+    rate_stddev = db.Column(db.Float, nullable=False, default=0.0)
+    projected_date = db.Column(db.Date, nullable=True)  # None when the goal never completes at this rate
+    earliest_date = db.Column(db.Date, nullable=True)  # Confidence band around projected_date
+    latest_date = db.Column(db.Date, nullable=True)
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    stale = db.Column(db.Boolean, nullable=False, default=False)  # A goal write changed the inputs since
+    
+    def __repr__(self):
+        return f'<GoalForecast {self.goal_id} - {self.projected_date}>'
+
+class UserInsight(db.Model):
+    """Per-user derived data recomputed by the nightly batch (see batch.py)"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    advice = db.Column(db.Text, nullable=False)
+    goals_total = db.Column(db.Integer, nullable=False, default=0)
+    goals_completed = db.Column(db.Integer, nullable=False, default=0)
+    goals_on_track = db.Column(db.Integer, nullable=False, default=0)
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<UserInsight {self.user_id} - {self.goals_on_track}/{self.goals_total} on track>'
+
+class ScheduledJob(db.Model):
+    """Schedule and lease of a periodic job; a worker runs a job only while it holds the lease (see scheduler.py)"""
+    name = db.Column(db.String(64), primary_key=True)
+    next_run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    lease_owner = db.Column(db.String(128), nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+    last_started_at = db.Column(db.DateTime, nullable=True)
+    last_finished_at = db.Column(db.DateTime, nullable=True)
+    last_status = db.Column(db.String(20), nullable=True)  # succeeded or failed
+    last_error = db.Column(db.Text, nullable=True)
+    run_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<ScheduledJob {self.name} next at {self.next_run_at}>'
+
+class SchemaMigration(db.Model):
+    """A schema migration that has been applied to this database (see migrations.py)"""
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    applied_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SchemaMigration {self.version} {self.name}>'
+
+class ShardDirectory(db.Model):
+    """Which shard database holds each user's rows; lives in the main database (see shards.py)"""
+    # AUTOINCREMENT so ids of deleted users are never handed out again
+    __table_args__ = {'sqlite_autoincrement': True}
+    
+    user_id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(64), unique=True, nullable=False)
+    shard = db.Column(db.Integer, nullable=False, index=True)
+    moving = db.Column(db.Boolean, nullable=False, default=False)  # Set while shard-rebalance copies the rows
+    moved_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ShardDirectory {self.user_id} {self.username} on shard {self.shard}>'
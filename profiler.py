@@ -0,0 +1,180 @@
+"""
+Opt-in per-request SQL profiler.
+
+When SQL_PROFILER is enabled, every statement a request runs is recorded with
+its timing and a normalized fingerprint (literals and IN lists collapsed).
+After the request, fingerprints seen SQL_PROFILER_REPEAT_THRESHOLD or more
+times are logged as likely N+1 patterns, and statements slower than
+SQL_PROFILER_SLOW_MS are logged with their EXPLAIN / EXPLAIN QUERY PLAN output.
+The worst offenders across requests are summarized at /api/debug/sql-profile,
+which only exists while the app runs in debug or testing mode: fingerprints,
+timings and plans are never served by a production app.
+"""
+import logging
+import re
+import threading
+import time
+
+from flask import current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event
+
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLOW_MS = 100
+DEFAULT_REPEAT_THRESHOLD = 2
+MAX_TRACKED_OFFENDERS = 500
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*(?:\?|%\(\w+\)s|%s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|%s|:\w+))*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+# EXPLAIN prefix per dialect; other dialects are profiled without plans
+_EXPLAIN_PREFIXES = {
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'postgresql': 'EXPLAIN ',
+}
+
+
+def fingerprint(statement):
+    """Normalize a SQL statement so executions differing only in values compare equal."""
+    normalized = _STRING_LITERAL.sub('?', statement)
+    normalized = _NUMBER_LITERAL.sub('?', normalized)
+    normalized = _PLACEHOLDER_LIST.sub('(...)', normalized)
+    return _WHITESPACE.sub(' ', normalized).strip()
+
+
+class OffenderStats:
+    """Bounded summary of flagged (endpoint, fingerprint) pairs across requests."""
+
+    def __init__(self, max_entries=MAX_TRACKED_OFFENDERS):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, fp, kind, executions, seconds, plan=None):
+        with self._lock:
+            key = (endpoint, fp, kind)
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.max_entries:
+                    return
+                entry = self._entries[key] = {
+                    'endpoint': endpoint,
+                    'kind': kind,
+                    'fingerprint': fp,
+                    'requests': 0,
+                    'maxExecutions': 0,
+                    'totalMs': 0.0,
+                    'maxMs': 0.0,
+                    'plan': None
+                }
+            entry['requests'] += 1
+            entry['maxExecutions'] = max(entry['maxExecutions'], executions)
+            entry['totalMs'] += seconds * 1000
+            entry['maxMs'] = max(entry['maxMs'], seconds * 1000)
+            if plan is not None:
+                entry['plan'] = plan
+
+    def worst(self, limit=20):
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda entry: entry['totalMs'], reverse=True)
+            return [dict(entry) for entry in entries[:limit]]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+offenders = OffenderStats()
+
+
+# Kept on the execution context rather than the connection, so statements that
+# raise don't leave a start time behind for the next statement to pick up
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.profiler_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'profiler_query_start', None)
+    if started is not None and has_request_context() and 'sql_profile' in g:
+        g.sql_profile.append((statement, parameters, executemany, conn.engine, time.perf_counter() - started))
+
+
+def explain(engine, statement, parameters):
+    """Get the query plan for a statement as a list of lines, or None if unavailable."""
+    prefix = _EXPLAIN_PREFIXES.get(engine.dialect.name)
+    if prefix is None:
+        return None
+    try:
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql(prefix + statement, parameters or ()).fetchall()
+    except Exception as e:
+        logger.debug(f"Could not explain statement: {e}")
+        return None
+    return [' | '.join(str(value) for value in row) for row in rows]
+
+
+def _start_profile():
+    g.sql_profile = []
+
+
+def _analyze_profile(response):
+    statements = g.pop('sql_profile', None)
+    if not statements:
+        return response
+
+    config = current_app.config
+    slow_seconds = config.get('SQL_PROFILER_SLOW_MS', DEFAULT_SLOW_MS) / 1000
+    repeat_threshold = config.get('SQL_PROFILER_REPEAT_THRESHOLD', DEFAULT_REPEAT_THRESHOLD)
+    endpoint = request.endpoint or 'unmatched'
+
+    groups = {}
+    for statement, parameters, executemany, engine, seconds in statements:
+        fp = fingerprint(statement)
+        group = groups.setdefault(fp, [0, 0.0])
+        group[0] += 1
+        group[1] += seconds
+
+        if seconds >= slow_seconds:
+            plan = None if executemany else explain(engine, statement, parameters)
+            offenders.record(endpoint, fp, 'slow', 1, seconds, plan)
+            logger.warning(
+                f"Slow query ({seconds * 1000:.1f} ms) in {endpoint}: {fp}"
+                + (''.join(f"\n    {line}" for line in plan) if plan else '')
+            )
+
+    for fp, (executions, seconds) in groups.items():
+        if executions >= repeat_threshold:
+            offenders.record(endpoint, fp, 'repeated', executions, seconds)
+            logger.warning(f"Query repeated {executions}x ({seconds * 1000:.1f} ms) in {endpoint}: {fp}")
+
+    return response
+
+
+def sql_profile_view():
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({
+        'success': True,
+        'offenders': offenders.worst(limit)
+    })
+
+
+def init_app(app):
+    """Attach the profiler to the app's engines when SQL_PROFILER is enabled."""
+    if not app.config.get('SQL_PROFILER'):
+        return
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    app.before_request(_start_profile)
+    app.after_request(_analyze_profile)
+    if app.debug or app.testing:
+        app.add_url_rule('/api/debug/sql-profile', 'sql_profile', sql_profile_view)
+    logger.info('SQL profiler enabled')
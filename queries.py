@@ -0,0 +1,182 @@
+"""
+Shared query helpers for expense reads.
+
+All period filters are expressed as half-open ``date >= start AND date < end``
+ranges so they can use the composite (user_id, date) index on Expense instead
+of scanning the user's whole history through ``extract()``.
+"""
+import base64
+import json
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, or_
+
+from models import Expense
+
+# Sort options accepted by the expenses API, as (column, descending)
+EXPENSE_SORTS = {
+    'date-desc': (Expense.date, True),
+    'date-asc': (Expense.date, False),
+    'amount-desc': (Expense.amount, True),
+    'amount-asc': (Expense.amount, False),
+}
+
+MAX_PAGE_SIZE = 500
+
+
+def _as_date(value):
+    """Normalize datetime/date values to a plain date."""
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def month_range(year, month):
+    """
+    Get the half-open date range covering a calendar month
+
+    Args:
+        year: Four digit year
+        month: Month number (1-12)
+
+    Returns:
+        tuple: (start, end) dates where end is the first day of the next month
+    """
+    start = date(year, month, 1)
+    if month == 12:
+        end = date(year + 1, 1, 1)
+    else:
+        end = date(year, month + 1, 1)
+    return start, end
+
+
+def year_range(year):
+    """Get the half-open date range covering a calendar year."""
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+def days_range(end, days):
+    """
+    Get the half-open date range for the last ``days`` days ending on ``end``
+
+    Args:
+        end: Last day to include (date or datetime)
+        days: Number of days to include, counting ``end`` itself
+
+    Returns:
+        tuple: (start, end) dates where end is the day after ``end``
+    """
+    end = _as_date(end)
+    return end - timedelta(days=days - 1), end + timedelta(days=1)
+
+
+def clamp_range(start, end, outer_start, outer_end):
+    """Intersect two half-open ranges, e.g. a rolling window with the current year."""
+    start = max(_as_date(start), _as_date(outer_start))
+    end = min(_as_date(end), _as_date(outer_end))
+    if end < start:
+        end = start
+    return start, end
+
+
+def date_range_filter(start, end, column=Expense.date):
+    """Build the sargable filter conditions for a half-open date range."""
+    conditions = []
+    if start is not None:
+        conditions.append(column >= _as_date(start))
+    if end is not None:
+        conditions.append(column < _as_date(end))
+    return conditions
+
+
+def user_expenses_between(user_id, start=None, end=None):
+    """
+    Get a query for a user's expenses within a half-open date range
+
+    Args:
+        user_id: ID of the expense owner
+        start: First day to include, or None for no lower bound
+        end: First day to exclude, or None for no upper bound
+
+    Returns:
+        Query: Expense query filtered on (user_id, date)
+    """
+    return Expense.query.filter(
+        Expense.user_id == user_id,
+        *date_range_filter(start, end)
+    )
+
+
+def encode_cursor(sort, expense):
+    """Encode the keyset position after ``expense`` as an opaque URL-safe token."""
+    column, _ = EXPENSE_SORTS[sort]
+    value = getattr(expense, column.key)
+    if isinstance(value, date):
+        value = value.isoformat()
+    payload = json.dumps([sort, value, expense.id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(sort, cursor):
+    """
+    Decode a token produced by encode_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed or was issued for another sort order
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, value, expense_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if cursor_sort != sort:
+        raise ValueError('Cursor does not match the requested sort order')
+    column, _ = EXPENSE_SORTS[sort]
+    try:
+        if column is Expense.date:
+            value = date.fromisoformat(value)
+        else:
+            value = float(value)
+        # Booleans and floats are not ids, even though int() would accept them
+        if isinstance(expense_id, bool) or not isinstance(expense_id, int):
+            raise TypeError(expense_id)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor')
+    return value, expense_id
+
+
+def paginate_expenses(query, sort='date-desc', limit=50, cursor=None):
+    """
+    Fetch one keyset page of an Expense query
+
+    Pages are ordered on (sort column, id) so ties are broken deterministically,
+    and only ``limit + 1`` rows are read to find out whether another page exists.
+
+    Args:
+        query: Filtered Expense query
+        sort: One of EXPENSE_SORTS
+        limit: Page size
+        cursor: Token from a previous page's ``next_cursor``, or None for the first page
+
+    Returns:
+        tuple: (expenses, next_cursor) where next_cursor is None on the last page
+    """
+    column, descending = EXPENSE_SORTS[sort]
+
+    if cursor:
+        value, last_id = decode_cursor(sort, cursor)
+        if descending:
+            query = query.filter(or_(column < value, and_(column == value, Expense.id < last_id)))
+        else:
+            query = query.filter(or_(column > value, and_(column == value, Expense.id > last_id)))
+
+    if descending:
+        query = query.order_by(column.desc(), Expense.id.desc())
+    else:
+        query = query.order_by(column.asc(), Expense.id.asc())
+
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(sort, rows[-1])
+    return rows, None
@@ -0,0 +1,209 @@
+"""
+Recurring incomes and expenses.
+
+occurrences() lazily expands a recurrence (an anchor date and a frequency)
+into its dates inside any window, jumping straight to the first date in the
+window instead of walking from the anchor. Recurring expense templates are
+materialized into ordinary Expense rows, in batches, by
+materialize_recurring_expenses (run by the scheduler). Reads therefore never
+expand recurrences. Incomes stay as templates. Their monthly equivalent is
+summed in SQL by monthly_income_column.
+"""
+import heapq
+from calendar import monthrange
+from datetime import date, timedelta
+
+from sqlalchemy import case, func, select
+
+import rollups
+from cache import bump_data_version
+from expense_store import expense_store
+from extensions import db
+from models import Expense, Income, RecurringExpense, User
+
+# frequency: (days, months) between occurrences
+STEPS = {
+    'weekly': (7, 0),
+    'biweekly': (14, 0),
+    'monthly': (0, 1),
+    'quarterly': (0, 3),
+    'yearly': (0, 12),
+}
+
+# Occurrences per month, for normalizing amounts to a monthly figure
+MONTHLY_FACTORS = {
+    'weekly': 365.25 / 7 / 12,
+    'biweekly': 365.25 / 14 / 12,
+    'monthly': 1.0,
+    'quarterly': 1 / 3,
+    'yearly': 1 / 12,
+    'once': 0.0,
+}
+
+MATERIALIZE_BATCH_SIZE = 500
+
+
+def _add_months(anchor, months):
+    """anchor moved by ``months``, keeping its day of month where the month is long enough."""
+    year, month = divmod(anchor.year * 12 + anchor.month - 1 + months, 12)
+    return date(year, month + 1, min(anchor.day, monthrange(year, month + 1)[1]))
+
+
+def occurrences(anchor, frequency, start=None, end=None):
+    """
+    Lazily yield the dates a recurrence falls on, with start <= date < end
+
+    Args:
+        anchor: Date of the first occurrence
+        frequency: A key of STEPS, or 'once'
+        start: First date of the window (defaults to anchor)
+        end: Date after the window, or None for no end
+    """
+    start = max(start or anchor, anchor)
+    if frequency == 'once':
+        if anchor >= start and (end is None or anchor < end):
+            yield anchor
+        return
+    if frequency not in STEPS:
+        raise ValueError(f'Unknown frequency: {frequency}')
+
+    days, months = STEPS[frequency]
+    if days:
+        # Jump to the first occurrence on or after start
+        current = anchor + timedelta(days=-(-(start - anchor).days // days) * days)
+        step = timedelta(days=days)
+        while end is None or current < end:
+            yield current
+            current += step
+        return
+
+    # Months are always counted from the anchor, so a 31st doesn't drift to the 28th
+    count = ((start.year - anchor.year) * 12 + start.month - anchor.month) // months
+    current = _add_months(anchor, count * months)
+    if current < start:
+        count += 1
+        current = _add_months(anchor, count * months)
+    while end is None or current < end:
+        yield current
+        count += 1
+        current = _add_months(anchor, count * months)
+
+
+def monthly_income_column(today=None):
+    """
+    SQL expression for a user's monthly income, correlated to User
+
+    The sum of the incomes that have started, each normalized to a monthly
+    amount by its frequency (unknown frequencies count as monthly), or the
+    profile's monthly_income when the user has no income records.
+    """
+    today = today or date.today()
+    frequency = func.lower(Income.frequency)
+    factor = case(*[(frequency == name, value) for name, value in MONTHLY_FACTORS.items()], else_=1.0)
+    incomes = select(func.sum(Income.amount * factor)).where(
+        Income.user_id == User.id,
+        Income.date <= today
+    ).correlate(User).scalar_subquery()
+    return func.coalesce(incomes, User.monthly_income, 0)
+
+
+def monthly_income(user_id, today=None):
+    """The user's normalized monthly income in one query, or None if the user doesn't exist."""
+    return db.session.scalar(select(monthly_income_column(today)).where(User.id == user_id))
+
+
+def _stream(dates, **fields):
+    for day in dates:
+        yield dict(fields, date=day)
+
+
+def upcoming(user_id, start, end):
+    """
+    Lazily merge the user's income and recurring expense occurrences in [start, end), by date
+
+    Yields:
+        dict: date, type ('income' or 'expense'), label and amount of each occurrence
+    """
+    streams = []
+    for income in Income.query.filter_by(user_id=user_id):
+        frequency = income.frequency.lower()
+        if frequency not in STEPS and frequency != 'once':
+            frequency = 'monthly'
+        streams.append(_stream(occurrences(income.date, frequency, start, end),
+                               type='income', label=income.source, amount=income.amount))
+
+    templates = RecurringExpense.query.filter(
+        RecurringExpense.user_id == user_id,
+        RecurringExpense.next_date.isnot(None)
+    )
+    for template in templates:
+        stop = end
+        if template.end_date is not None:
+            stop = min(end, template.end_date + timedelta(days=1))
+        streams.append(_stream(occurrences(template.start_date, template.frequency, start, stop),
+                               type='expense', label=template.description or template.category,
+                               amount=template.amount, category=template.category))
+    return heapq.merge(*streams, key=lambda item: item['date'])
+
+
+def _next_date(template, after):
+    """First occurrence of template on or after ``after``, or None once it has ended."""
+    upcoming_date = next(occurrences(template.start_date, template.frequency, after), None)
+    if upcoming_date is not None and template.end_date is not None and upcoming_date > template.end_date:
+        return None
+    return upcoming_date
+
+
+def materialize_recurring_expenses(today=None, user_ids=None, batch_size=MATERIALIZE_BATCH_SIZE):
+    """
+    Write Expense rows for every template occurrence up to today, committing per batch of templates
+
+    Args:
+        today: Last date to materialize
+        user_ids: Only these users' templates, or None for everyone
+        batch_size: Templates per transaction
+
+    Returns:
+        int: Number of expenses written
+    """
+    today = today or date.today()
+    stop = today + timedelta(days=1)
+    written = 0
+    last_id = 0
+    while True:
+        query = RecurringExpense.query.filter(
+            RecurringExpense.next_date.isnot(None),
+            RecurringExpense.next_date <= today,
+            RecurringExpense.id > last_id
+        )
+        if user_ids is not None:
+            query = query.filter(RecurringExpense.user_id.in_(user_ids))
+        templates = query.order_by(RecurringExpense.id).limit(batch_size).all()
+        if not templates:
+            return written
+
+        expenses = []
+        for template in templates:
+            end = stop
+            if template.end_date is not None:
+                end = min(end, template.end_date + timedelta(days=1))
+            expenses.extend(Expense(
+                user_id=template.user_id,
+                amount=template.amount,
+                category=template.category,
+                description=template.description,
+                date=day
+            ) for day in occurrences(template.start_date, template.frequency, template.next_date, end))
+            template.next_date = _next_date(template, stop)
+
+        db.session.add_all(expenses)
+        rollups.apply_expenses(expenses)
+        changed_users = sorted({expense.user_id for expense in expenses})
+        for user_id in changed_users:
+            bump_data_version(user_id)
+        db.session.commit()
+        for user_id in changed_users:
+            expense_store.invalidate(user_id)
+
+        written += len(expenses)
+        last_id = templates[-1].id
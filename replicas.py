@@ -0,0 +1,121 @@
+"""
+Read replica routing.
+
+When REPLICA_DATABASE_URL is set, the replica is added as the "replica" bind,
+and views decorated with @read_replica run their reads against it. Everything
+else uses the primary: other views, flushes and INSERT/UPDATE/DELETE
+statements, and every request from a client that wrote within the last
+REPLICA_READ_YOUR_WRITES_SECONDS. That window covers replication lag, so a
+client always sees its own writes. It is kept in the session cookie, so it
+holds across gunicorn workers.
+
+Locally, two SQLite files work as primary and replica. `flask replica-sync`
+copies the primary into the replica (real replicas are kept in sync by the
+database's own replication):
+
+    DATABASE_URL=sqlite:///primary.db REPLICA_DATABASE_URL=sqlite:///replica.db flask --app main replica-sync
+"""
+import logging
+import time
+from functools import wraps
+
+import click
+from flask import current_app, g, has_request_context, request, session
+from flask.cli import with_appcontext
+from flask_sqlalchemy.session import Session
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND = 'replica'
+DEFAULT_READ_YOUR_WRITES_SECONDS = 5
+# Session key holding the time until which the client's reads stay on the primary
+PRIMARY_UNTIL_KEY = 'primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def use_replica():
+    """True while the current request's reads may go to the replica."""
+    return has_request_context() and g.get('use_replica', False)
+
+
+class RoutingSession(Session):
+    """
+    Session sending user tables to the selected shard (see shards.py), and
+    other reads to the replica bind during @read_replica requests
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        # Imported here because shards imports the db this session class is created for
+        from shards import route
+
+        if bind is None:
+            engine = route(self._db.engines, mapper, clause)
+            if engine is not None:
+                return engine
+        if bind is None and not self._flushing and not getattr(clause, 'is_dml', False) and use_replica():
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_replica(f):
+    """Serve a read-only view from the replica unless the client wrote recently."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.use_replica = (
+            REPLICA_BIND in current_app.config.get('SQLALCHEMY_BINDS', {})
+            and request.method in SAFE_METHODS
+            and session.get(PRIMARY_UNTIL_KEY, 0) <= time.time()
+        )
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def configure(app):
+    """Add the replica bind from REPLICA_DATABASE_URL (before db.init_app)."""
+    import database
+
+    replica_url = app.config.get('REPLICA_DATABASE_URL')
+    if not replica_url:
+        return
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    binds[REPLICA_BIND] = dict(database.engine_options(replica_url, app.config), url=replica_url)
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+
+def init_app(app):
+    """Keep clients on the primary for a while after they write."""
+    if not app.config.get('REPLICA_DATABASE_URL'):
+        return
+    window = app.config.get('REPLICA_READ_YOUR_WRITES_SECONDS', DEFAULT_READ_YOUR_WRITES_SECONDS)
+
+    @app.after_request
+    def remember_write(response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            session[PRIMARY_UNTIL_KEY] = round(time.time() + window, 3)
+        return response
+
+
+@click.command('replica-sync')
+@with_appcontext
+def replica_sync_command():
+    """Copy a SQLite primary into its SQLite replica (for local testing)."""
+    db = current_app.extensions['sqlalchemy']
+    replica = db.engines.get(REPLICA_BIND)
+    if replica is None:
+        raise click.ClickException('REPLICA_DATABASE_URL is not set.')
+    if db.engine.dialect.name != 'sqlite' or replica.dialect.name != 'sqlite':
+        raise click.ClickException("Only SQLite files can be synced; use the database's own replication.")
+    try:
+        source = db.engine.raw_connection()
+        target = replica.raw_connection()
+        try:
+            source.driver_connection.backup(target.driver_connection)
+        finally:
+            target.close()
+            source.close()
+        click.echo('Replica synced from the primary.')
+    except Exception as e:
+        logger.error(f"Error syncing replica: {e}")
+        raise click.ClickException(str(e))
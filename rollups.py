@@ -0,0 +1,289 @@
+"""
+Incrementally maintained expense rollups.
+
+Daily and monthly totals per (user, bucket, category) are adjusted in the same
+transaction as every Expense write, so dashboard reads cost O(buckets) instead
+of re-aggregating the user's raw expenses on every load.
+"""
+import logging
+from collections import defaultdict
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import Date, cast, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+import shards
+from cache import bump_data_versions
+from extensions import db
+from models import Expense, ExpenseDailyRollup, ExpenseMonthlyRollup, User
+
+logger = logging.getLogger(__name__)
+
+_UPSERT_INSERTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _dialect_name(model):
+    return db.session.get_bind(mapper=model).dialect.name
+
+
+def _upsert(model, key_columns, params):
+    """Add total/expense_count deltas onto existing rollup rows, creating missing rows."""
+    if not params:
+        return
+    table = model.__table__
+    make_insert = _UPSERT_INSERTS.get(_dialect_name(model))
+
+    if make_insert is not None:
+        stmt = make_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={
+                'total': table.c.total + stmt.excluded.total,
+                'expense_count': table.c.expense_count + stmt.excluded.expense_count
+            }
+        )
+        db.session.execute(stmt, params)
+        return
+
+    # Generic fallback: update in place, insert when the bucket doesn't exist yet
+    for row in params:
+        key_filter = [table.c[column] == row[column] for column in key_columns]
+        result = db.session.execute(
+            table.update().where(*key_filter).values(
+                total=table.c.total + row['total'],
+                expense_count=table.c.expense_count + row['expense_count']
+            )
+        )
+        if result.rowcount == 0:
+            db.session.execute(table.insert(), [row])
+
+
+def apply_expenses(expenses, sign=1):
+    """
+    Adjust the rollups for a batch of expenses without committing
+
+    Args:
+        expenses: Iterable of objects with user_id, date, category and amount
+            attributes (Expense instances or result rows)
+        sign: 1 when the expenses were added, -1 when they were removed
+    """
+    daily = defaultdict(lambda: [0.0, 0])
+    monthly = defaultdict(lambda: [0.0, 0])
+    user_ids = set()
+
+    for expense in expenses:
+        amount = float(expense.amount) * sign
+        day_key = (expense.user_id, expense.date, expense.category)
+        month_key = (expense.user_id, _month_start(expense.date), expense.category)
+        daily[day_key][0] += amount
+        daily[day_key][1] += sign
+        monthly[month_key][0] += amount
+        monthly[month_key][1] += sign
+        user_ids.add(expense.user_id)
+
+    if not user_ids:
+        return
+
+    _upsert(ExpenseDailyRollup, ['user_id', 'day', 'category'], [
+        {'user_id': user_id, 'day': day, 'category': category, 'total': total, 'expense_count': count}
+        for (user_id, day, category), (total, count) in daily.items()
+    ])
+    _upsert(ExpenseMonthlyRollup, ['user_id', 'month', 'category'], [
+        {'user_id': user_id, 'month': month, 'category': category, 'total': total, 'expense_count': count}
+        for (user_id, month, category), (total, count) in monthly.items()
+    ])
+
+    # Drop buckets that no longer contain any expenses
+    if sign < 0:
+        for model in (ExpenseDailyRollup, ExpenseMonthlyRollup):
+            model.query.filter(
+                model.user_id.in_(user_ids),
+                model.expense_count <= 0
+            ).delete(synchronize_session=False)
+
+
+def daily_totals(user_id, start, end):
+    """Get {day: total} for a half-open date range from the daily rollup."""
+    rows = db.session.query(
+        ExpenseDailyRollup.day,
+        func.sum(ExpenseDailyRollup.total)
+    ).filter(
+        ExpenseDailyRollup.user_id == user_id,
+        ExpenseDailyRollup.day >= start,
+        ExpenseDailyRollup.day < end
+    ).group_by(ExpenseDailyRollup.day).all()
+    return {day: float(total) for day, total in rows}
+
+
+def monthly_totals(user_id, start, end):
+    """Get {month start: total} for a half-open, month-aligned range from the monthly rollup."""
+    rows = db.session.query(
+        ExpenseMonthlyRollup.month,
+        func.sum(ExpenseMonthlyRollup.total)
+    ).filter(
+        ExpenseMonthlyRollup.user_id == user_id,
+        ExpenseMonthlyRollup.month >= start,
+        ExpenseMonthlyRollup.month < end
+    ).group_by(ExpenseMonthlyRollup.month).all()
+    return {month: float(total) for month, total in rows}
+
+
+def category_totals(user_id, start, end):
+    """Get [(category, total)] for a half-open, month-aligned range from the monthly rollup."""
+    rows = db.session.query(
+        ExpenseMonthlyRollup.category,
+        func.sum(ExpenseMonthlyRollup.total)
+    ).filter(
+        ExpenseMonthlyRollup.user_id == user_id,
+        ExpenseMonthlyRollup.month >= start,
+        ExpenseMonthlyRollup.month < end
+    ).group_by(ExpenseMonthlyRollup.category).all()
+    return [(category, float(total)) for category, total in rows]
+
+
+def daily_category_totals(user_id, start=None, end=None):
+    """Get [(category, total)] for any half-open day range (either bound optional) from the daily rollup."""
+    query = db.session.query(
+        ExpenseDailyRollup.category,
+        func.sum(ExpenseDailyRollup.total)
+    ).filter(ExpenseDailyRollup.user_id == user_id)
+    if start is not None:
+        query = query.filter(ExpenseDailyRollup.day >= start)
+    if end is not None:
+        query = query.filter(ExpenseDailyRollup.day < end)
+    rows = query.group_by(ExpenseDailyRollup.category).all()
+    return [(category, float(total)) for category, total in rows]
+
+
+def monthly_category_totals(user_id, start, end):
+    """Get [(month start, category, total, expense_count)] for a half-open, month-aligned range."""
+    rows = db.session.query(
+        ExpenseMonthlyRollup.month,
+        ExpenseMonthlyRollup.category,
+        ExpenseMonthlyRollup.total,
+        ExpenseMonthlyRollup.expense_count
+    ).filter(
+        ExpenseMonthlyRollup.user_id == user_id,
+        ExpenseMonthlyRollup.month >= start,
+        ExpenseMonthlyRollup.month < end
+    ).order_by(ExpenseMonthlyRollup.month).all()
+    return [(month, category, float(total), count) for month, category, total, count in rows]
+
+
+def expense_count(user_id, start, end):
+    """Count a user's expenses in a half-open, month-aligned range from the monthly rollup."""
+    return db.session.query(
+        func.coalesce(func.sum(ExpenseMonthlyRollup.expense_count), 0)
+    ).filter(
+        ExpenseMonthlyRollup.user_id == user_id,
+        ExpenseMonthlyRollup.month >= start,
+        ExpenseMonthlyRollup.month < end
+    ).scalar()
+
+
+def _scope(query, column, user_id, user_range):
+    if user_id is not None:
+        query = query.filter(column == user_id)
+    if user_range is not None:
+        query = query.filter(column >= user_range[0], column < user_range[1])
+    return query
+
+
+def rebuild_rollups(user_id=None, user_range=None):
+    """
+    Recompute the rollup tables from the raw Expense rows, bump the rebuilt
+    users' data versions and commit
+
+    Args:
+        user_id: Only rebuild this user's rollups, or None for everyone
+        user_range: Only rebuild users with first <= id < last, as a (first, last) tuple
+    """
+    for model in (ExpenseDailyRollup, ExpenseMonthlyRollup):
+        _scope(model.query, model.user_id, user_id, user_range).delete(synchronize_session=False)
+
+    daily_source = db.session.query(
+        Expense.user_id,
+        Expense.date,
+        Expense.category,
+        func.sum(Expense.amount),
+        func.count(Expense.id)
+    )
+    daily_source = _scope(daily_source, Expense.user_id, user_id, user_range)
+    daily_source = daily_source.group_by(Expense.user_id, Expense.date, Expense.category)
+
+    db.session.execute(insert(ExpenseDailyRollup).from_select(
+        ['user_id', 'day', 'category', 'total', 'expense_count'],
+        daily_source
+    ))
+
+    # Months are built from the (much smaller) daily rollup
+    dialect = _dialect_name(ExpenseMonthlyRollup)
+    if dialect == 'sqlite':
+        month_expr = func.date(ExpenseDailyRollup.day, 'start of month')
+    elif dialect == 'postgresql':
+        month_expr = cast(func.date_trunc('month', ExpenseDailyRollup.day), Date)
+    else:
+        month_expr = None
+
+    if month_expr is not None:
+        monthly_source = db.session.query(
+            ExpenseDailyRollup.user_id,
+            month_expr,
+            ExpenseDailyRollup.category,
+            func.sum(ExpenseDailyRollup.total),
+            func.sum(ExpenseDailyRollup.expense_count)
+        )
+        monthly_source = _scope(monthly_source, ExpenseDailyRollup.user_id, user_id, user_range)
+        monthly_source = monthly_source.group_by(
+            ExpenseDailyRollup.user_id, month_expr, ExpenseDailyRollup.category
+        )
+        db.session.execute(insert(ExpenseMonthlyRollup).from_select(
+            ['user_id', 'month', 'category', 'total', 'expense_count'],
+            monthly_source
+        ))
+    else:
+        monthly = defaultdict(lambda: [0.0, 0])
+        daily_rows = _scope(ExpenseDailyRollup.query, ExpenseDailyRollup.user_id, user_id, user_range)
+        for row in daily_rows.yield_per(1000):
+            bucket = monthly[(row.user_id, _month_start(row.day), row.category)]
+            bucket[0] += row.total
+            bucket[1] += row.expense_count
+        if monthly:
+            db.session.execute(insert(ExpenseMonthlyRollup), [
+                {'user_id': uid, 'month': month, 'category': category, 'total': total, 'expense_count': count}
+                for (uid, month, category), (total, count) in monthly.items()
+            ])
+
+    # Cached analytics responses were computed from the old rollups
+    bump_data_versions(db.session.scalars(_scope(select(User.id), User.id, user_id, user_range)))
+    db.session.commit()
+
+
+@click.command('rebuild-rollups')
+@click.option('--user-id', type=int, default=None, help='Only rebuild rollups for this user.')
+@with_appcontext
+def rebuild_rollups_command(user_id):
+    """Backfill the daily and monthly expense rollup tables."""
+    try:
+        if user_id is not None:
+            if not shards.select_for_user(user_id):
+                raise click.ClickException(f'User {user_id} is not in the shard directory.')
+            rebuild_rollups(user_id)
+        else:
+            for _ in shards.each_shard():
+                rebuild_rollups()
+        click.echo('Expense rollups rebuilt successfully.')
+    except click.ClickException:
+        raise
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error rebuilding rollups: {e}")
+        raise click.ClickException(str(e))
@@ -0,0 +1,1959 @@
+"""
+The app's pages and JSON APIs, registered on the app by create_app (see app.py).
+"""
+import os
+import logging
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import (Blueprint, current_app, render_template, request, redirect, url_for, flash, session, jsonify,
+                   Response, stream_with_context, g)
+from werkzeug.security import generate_password_hash, check_password_hash
+import json
+from calendar import monthrange
+from extensions import db
+import random
+import string
+from sqlalchemy import func, and_, delete, select, inspect
+from sqlalchemy.orm import load_only
+from sqlalchemy.orm.exc import StaleDataError
+import calendar
+
+from models import (User, Expense, FinancialGoal, GoalContribution, Income, GoalForecast, UserInsight,
+                    RecurringExpense, RESET_OTP_LIFETIME)
+from queries import (month_range, year_range, days_range, clamp_range, user_expenses_between,
+                     paginate_expenses, EXPENSE_SORTS, MAX_PAGE_SIZE)
+import rollups
+import analytics
+import forecasting
+import recurrence
+import numpy as np
+from expense_store import expense_store
+import importer
+import exporter
+from utils import parse_expense_data
+from cache import (cached_response, versioned_etag, static_etag, bump_data_version, response_cache)
+from replicas import read_replica
+import shards
+
+bp = Blueprint('main', __name__)
+
+# Upper bound on IDs accepted by a single bulk delete request
+MAX_BULK_DELETE = 1000
+
+# Tries at a goal contribution before reporting a conflict with concurrent writers
+GOAL_WRITE_ATTEMPTS = 3
+
+# How often last_activity is rewritten; each rewrite re-signs and resends the session cookie
+LAST_ACTIVITY_GRANULARITY = timedelta(minutes=1)
+
+# Login required decorator
+def login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            flash('Please log in to access this page', 'error')
+            return redirect(url_for('main.login'))
+        
+        now = datetime.now()
+        last_activity = None
+        
+        # Check if session is expired
+        if 'last_activity' in session:
+            last_activity = datetime.fromisoformat(session['last_activity'])
+            if now - last_activity > timedelta(minutes=30):
+                session.clear()
+                flash('Your session has expired. Please log in again.', 'info')
+                return redirect(url_for('main.login'))
+        
+        # Update last activity timestamp, at most once per LAST_ACTIVITY_GRANULARITY
+        if last_activity is None or now - last_activity >= LAST_ACTIVITY_GRANULARITY:
+            session['last_activity'] = now.isoformat()
+        
+        g.user_id = session['user_id']
+        if not shards.select_for_user(g.user_id):
+            session.clear()
+            flash('Please log in to access this page', 'error')
+            return redirect(url_for('main.login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+def get_current_user(*columns):
+    """
+    Get the logged-in user, loading it from the database at most once per request.
+
+    Pass column names to load only those columns. If the user was already loaded
+    without some of the requested columns, they are fetched in one extra query
+    rather than one lazy load per attribute. The user is kept on g.current_user.
+    """
+    if 'current_user' not in g:
+        options = [load_only(*[getattr(User, column) for column in columns])] if columns else None
+        g.current_user = db.session.get(User, g.user_id, options=options)
+    elif g.current_user is not None:
+        missing = inspect(g.current_user).unloaded.intersection(columns or User.__table__.columns.keys())
+        if missing:
+            db.session.refresh(g.current_user, attribute_names=list(missing))
+    return g.current_user
+
+# Currencies a user can pick for their profile
+CURRENCY_OPTIONS = [
+    {'code': 'INR', 'name': 'Indian Rupee', 'symbol': '₹'},
+    {'code': 'USD', 'name': 'US Dollar', 'symbol': '$'},
+    {'code': 'EUR', 'name': 'Euro', 'symbol': '€'},
+    {'code': 'GBP', 'name': 'British Pound', 'symbol': '£'},
+    {'code': 'JPY', 'name': 'Japanese Yen', 'symbol': '¥'},
+    {'code': 'CAD', 'name': 'Canadian Dollar', 'symbol': 'CA$'},
+    {'code': 'AUD', 'name': 'Australian Dollar', 'symbol': 'A$'}
+]
+
+MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+               'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+# User columns read by profile_payload
+PROFILE_COLUMNS = ('username', 'full_name', 'mobile', 'monthly_income', 'savings_goal',
+                   'emergency_fund', 'financial_goal', 'currency')
+
+# Shared payload builders, used by the single-purpose APIs and the dashboard bootstrap
+def profile_payload(user):
+    return {
+        'username': user.username,
+        'fullName': user.full_name,
+        'mobile': user.mobile,
+        'monthlyIncome': user.monthly_income,
+        'savingsGoal': user.savings_goal,
+        'emergencyFund': user.emergency_fund,
+        'financialGoal': user.financial_goal,
+        'currency': user.currency
+    }
+
+def recent_expenses_payload(user_id, year, limit=5):
+    start, end = year_range(year)
+    expenses = user_expenses_between(user_id, start, end) \
+        .order_by(Expense.date.desc()).limit(limit).all()
+    return [{
+        'id': expense.id,
+        'date': expense.date.strftime('%Y-%m-%d'),
+        'category': expense.category,
+        'description': expense.description,
+        'amount': expense.amount
+    } for expense in expenses]
+
+def month_trend_payload(daily_totals, year, month):
+    """Labels and values for every day of a month, with missing days as 0."""
+    month_start, _ = month_range(year, month)
+    last_day = calendar.monthrange(year, month)[1]
+    labels = []
+    values = []
+    for day in range(1, last_day + 1):
+        date = month_start.replace(day=day)
+        labels.append(date.strftime('%d'))  # Day of month
+        values.append(daily_totals.get(date, 0))
+    return labels, values
+
+def yearly_summary_payload(monthly_totals, monthly_income):
+    """Expenses and savings per month (index 0 = January) from {month start: total}."""
+    expenses_by_month = [0] * 12
+    for month_start, total in monthly_totals.items():
+        expenses_by_month[month_start.month - 1] = total
+    savings_by_month = [max(0, monthly_income - expenses) for expenses in expenses_by_month]
+    return expenses_by_month, savings_by_month
+
+# Routes for authentication
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        username = request.form.get('username')
+        password = request.form.get('password')
+        
+        user = shards.find_user(username)
+        
+        if user and check_password_hash(user.password, password):
+            session['user_id'] = user.id
+            session['username'] = user.username
+            session['last_activity'] = datetime.now().isoformat()
+            session.permanent = True  # Use permanent session with lifetime
+            flash('Login successful!', 'success')
+            return redirect(url_for('main.dashboard'))
+        else:
+            # Check if the username doesn't exist
+            if not user:
+                flash('Username not found. Please register to create an account.', 'register')
+            else:
+                flash('Invalid username or password. Please try again.', 'error')
+    
+    return render_template('login.html')
+
+@bp.route('/register', methods=['POST'])
+def register():
+    username = request.form.get('regUsername')
+    password = request.form.get('regPassword')
+    confirm_password = request.form.get('confirmPassword')
+    full_name = request.form.get('fullName')
+    mobile = request.form.get('mobile')
+    
+    # Debug log to check form data
+    current_app.logger.debug(f"Form data: {request.form}")
+    
+    if not username or not password or not confirm_password or not full_name or not mobile:
+        flash('All fields are required', 'error')
+        return redirect(url_for('main.login'))
+    
+    if password != confirm_password:
+        flash('Passwords do not match', 'error')
+        return redirect(url_for('main.login'))
+    
+    user = shards.find_user(username)
+    if user:
+        flash('Username already exists. Please choose another one.', 'error')
+        return redirect(url_for('main.login'))
+    
+    user_id = None
+    try:
+        hashed_password = generate_password_hash(password)
+        # Reserves the id and picks the shard when sharding is on
+        user_id = shards.register(username)
+        new_user = User(
+            id=user_id,
+            username=username,
+            password=hashed_password,
+            full_name=full_name,
+            mobile=mobile
+        )
+        db.session.add(new_user)
+        db.session.commit()
+        
+        # Return to login page with show_reg_success flag to display notification
+        return render_template('login.html', show_reg_success=True)
+    except Exception as e:
+        db.session.rollback()
+        shards.release(user_id)
+        logging.error(f"Registration error: {e}")
+        flash('An error occurred during registration. Please try again.', 'error')
+        return redirect(url_for('main.login'))
+
+@bp.route('/logout')
+def logout():
+    session.pop('user_id', None)
+    session.pop('username', None)
+    flash('You have been logged out successfully', 'info')
+    return redirect(url_for('main.login'))
+
+# Main application routes
+@bp.route('/')
+def index():
+    if 'user_id' in session:
+        return redirect(url_for('main.dashboard'))
+    return redirect(url_for('main.login'))
+
+@bp.route('/dashboard')
+@login_required
+def dashboard():
+    # Get some basic metrics for the dashboard
+    user_id = g.user_id
+    
+    # Get the current user
+    user = get_current_user('monthly_income', 'currency')
+    if not user:
+        flash('User not found', 'error')
+        return redirect(url_for('main.logout'))
+
+    # Calculate monthly expenses
+    current_month = datetime.now().month
+    current_year = datetime.now().year
+    
+    # Sum expenses for the current month
+    start, end = month_range(current_year, current_month)
+    total_expenses = user_expenses_between(user_id, start, end).with_entities(
+        func.coalesce(func.sum(Expense.amount), 0)
+    ).scalar()
+    
+    # User's income and savings
+    monthly_income = user.monthly_income or 0
+    total_savings = monthly_income - total_expenses if monthly_income > 0 else 0
+    
+    # Count active goals
+    active_goals = FinancialGoal.query.filter_by(
+        user_id=user_id, 
+        is_completed=False
+    ).count()
+    
+    # Passing the user's currency preference
+    currency = user.currency if user else 'INR'
+    
+    return render_template(
+        'dashboard.html',
+        total_expenses=total_expenses,
+        total_savings=total_savings,
+        active_goals=active_goals,
+        monthly_income=monthly_income,
+        currency=currency,
+        css_files=['dashboard.css']
+    )
+
+@bp.route('/expenses')
+@login_required
+def expenses():
+    # Get the current user
+    user = get_current_user('currency')
+    if not user:
+        flash('User not found', 'error')
+        return redirect(url_for('main.logout'))
+        
+    # Get user's currency
+    currency = user.currency if user else 'INR'
+    
+    return render_template('expenses.html', 
+                          currency=currency,
+                          css_files=['expenses.css'])
+
+@bp.route('/goals')
+@login_required
+def goals():
+    # Get the current user
+    user = get_current_user('currency')
+    if not user:
+        flash('User not found', 'error')
+        return redirect(url_for('main.logout'))
+        
+    # Get user's currency
+    currency = user.currency if user else 'INR'
+    
+    return render_template('goals.html',
+                          currency=currency,
+                          css_files=['goals.css'])
+
+# API Routes for expenses
+@bp.route('/api/expenses', methods=['GET'])
+@login_required
+@versioned_etag
+def get_expenses():
+    """
+    List the user's expenses, one keyset page at a time.
+
+    Query params: limit, cursor, sort (date-desc, date-asc, amount-desc, amount-asc),
+    start_date/end_date (inclusive, YYYY-MM-DD), month/year, category,
+    min_amount/max_amount. Without a limit the whole filtered history is returned.
+    """
+    user_id = g.user_id
+    limit = request.args.get('limit', None)
+    cursor = request.args.get('cursor', None)
+    sort = request.args.get('sort', 'date-desc')
+    month = request.args.get('month', None)
+    year = request.args.get('year', None)
+    category = request.args.get('category', None)
+    
+    if sort not in EXPENSE_SORTS:
+        return jsonify({
+            'success': False,
+            'message': f"Invalid sort. Use one of: {', '.join(EXPENSE_SORTS)}."
+        }), 400
+    
+    # Date range filter, either an explicit start/end or a month/year
+    start = end = None
+    try:
+        if request.args.get('start_date'):
+            start = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date()
+        if request.args.get('end_date'):
+            end = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() + timedelta(days=1)
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': 'Invalid date format. Use YYYY-MM-DD.'
+        }), 400
+    
+    if month and year and start is None and end is None:
+        try:
+            start, end = month_range(int(year), int(month))
+        except ValueError:
+            pass
+    
+    query = user_expenses_between(user_id, start, end)
+    
+    if category:
+        query = query.filter(Expense.category == category)
+    
+    try:
+        if request.args.get('min_amount'):
+            query = query.filter(Expense.amount >= float(request.args['min_amount']))
+        if request.args.get('max_amount'):
+            query = query.filter(Expense.amount <= float(request.args['max_amount']))
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': 'Invalid amount filter'
+        }), 400
+    
+    try:
+        limit = min(max(int(limit), 1), MAX_PAGE_SIZE) if limit else None
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': 'Invalid limit'
+        }), 400
+    
+    next_cursor = None
+    if limit is None:
+        column, descending = EXPENSE_SORTS[sort]
+        expenses = query.order_by(
+            column.desc() if descending else column.asc(),
+            Expense.id.desc() if descending else Expense.id.asc()
+        ).all()
+    else:
+        try:
+            expenses, next_cursor = paginate_expenses(query, sort, limit, cursor)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+    
+    expense_list = []
+    for expense in expenses:
+        expense_list.append({
+            'id': expense.id,
+            'amount': expense.amount,
+            'category': expense.category,
+            'description': expense.description,
+            'date': expense.date.strftime('%Y-%m-%d')
+        })
+    
+    return jsonify({
+        'success': True,
+        'expenses': expense_list,
+        'nextCursor': next_cursor,
+        'hasMore': next_cursor is not None
+    })
+
+@bp.route('/api/monthly-expenses', methods=['GET'])
+@login_required
+@versioned_etag
+@cached_response
+def get_monthly_expenses():
+    user_id = g.user_id
+    
+    # Get month and year from query params or use current month/year
+    try:
+        month = int(request.args.get('month', datetime.now().month))
+        year = int(request.args.get('year', datetime.now().year))
+        start, end = month_range(year, month)
+    except ValueError:
+        month = datetime.now().month
+        year = datetime.now().year
+        start, end = month_range(year, month)
+    
+    # Category totals for the specified month come from the monthly rollup
+    categories = rollups.category_totals(user_id, start, end)
+    total_amount = sum(amount for _, amount in categories)
+    
+    # Convert to list of objects
+    category_data = [
+        {'category': category, 'amount': amount}
+        for category, amount in categories
+    ]
+    
+    return jsonify({
+        'success': True,
+        'total': total_amount,
+        'month': month,
+        'year': year,
+        'categories': category_data
+    })
+
+@bp.route('/api/expenses', methods=['POST'])
+@login_required
+def add_expense():
+    user_id = g.user_id
+    data = request.json
+    
+    try:
+        try:
+            fields = parse_expense_data(data)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        
+        new_expense = create_expense(user_id, **fields)
+        
+        return jsonify({
+            'success': True,
+            'expense': {
+                'id': new_expense.id,
+                'amount': new_expense.amount,
+                'category': new_expense.category,
+                'description': new_expense.description,
+                'date': new_expense.date.strftime('%Y-%m-%d')
+            }
+        })
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error adding expense: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error adding expense: {str(e)}'
+        }), 500
+
+def create_expense(user_id, **fields):
+    """Save an expense with its rollups, data version and expense store entry, and commit."""
+    expense = Expense(user_id=user_id, **fields)
+    db.session.add(expense)
+    rollups.apply_expenses([expense])
+    version = bump_data_version(user_id)
+    db.session.commit()
+    expense_store.append(user_id, [expense], version)
+    return expense
+
+@bp.route('/api/expenses/<int:expense_id>', methods=['DELETE'])
+@login_required
+def delete_expense(expense_id):
+    user_id = g.user_id
+    
+    try:
+        expense = Expense.query.filter_by(id=expense_id, user_id=user_id).first()
+        
+        if not expense:
+            return jsonify({
+                'success': False,
+                'message': 'Expense not found or not authorized'
+            }), 404
+        
+        rollups.apply_expenses([expense], sign=-1)
+        db.session.delete(expense)
+        bump_data_version(user_id)
+        db.session.commit()
+        expense_store.invalidate(user_id)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Expense deleted successfully'
+        })
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error deleting expense: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error deleting expense: {str(e)}'
+        }), 500
+
+def _is_expense_id(value):
+    """True for an int or a string of digits (bools and floats are rejected)."""
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return True
+    return isinstance(value, str) and value.isascii() and value.isdigit()
+
+@bp.route('/api/expenses/bulk-delete', methods=['POST'])
+@login_required
+def bulk_delete_expenses():
+    """Delete several of the user's expenses in one statement and one transaction."""
+    user_id = g.user_id
+    data = request.get_json(silent=True)
+    ids = data.get('ids') if isinstance(data, dict) else None
+
+    if not isinstance(ids, list):
+        return jsonify({
+            'success': False,
+            'message': 'ids must be a list of expense IDs'
+        }), 400
+
+    if not ids:
+        return jsonify({
+            'success': False,
+            'message': 'No expense IDs provided'
+        }), 400
+
+    if len(ids) > MAX_BULK_DELETE:
+        return jsonify({
+            'success': False,
+            'message': f'Cannot delete more than {MAX_BULK_DELETE} expenses at once'
+        }), 400
+
+    if not all(_is_expense_id(expense_id) for expense_id in ids):
+        return jsonify({
+            'success': False,
+            'message': 'ids must be a list of expense IDs'
+        }), 400
+
+    expense_ids = [int(expense_id) for expense_id in ids]
+
+    try:
+        owned = and_(Expense.id.in_(set(expense_ids)), Expense.user_id == user_id)
+        deleted_columns = (Expense.id, Expense.user_id, Expense.date, Expense.category, Expense.amount)
+        
+        if db.session.get_bind(mapper=Expense).dialect.delete_returning:
+            # The rows handed back are exactly the ones this statement removed
+            deleted = db.session.execute(
+                delete(Expense).where(owned).returning(*deleted_columns)
+            ).all()
+        else:
+            deleted = db.session.execute(select(*deleted_columns).where(owned).with_for_update()).all()
+            db.session.execute(delete(Expense).where(owned))
+        
+        rollups.apply_expenses(deleted, sign=-1)
+        bump_data_version(user_id)
+        db.session.commit()
+        expense_store.invalidate(user_id)
+        
+        deleted_ids = {row.id for row in deleted}
+        results = [{
+            'id': expense_id,
+            'success': expense_id in deleted_ids,
+            'message': 'Expense deleted successfully' if expense_id in deleted_ids
+                       else 'Expense not found or not authorized'
+        } for expense_id in expense_ids]
+        
+        return jsonify({
+            'success': True,
+            'deleted': len(deleted_ids),
+            'requested': len(expense_ids),
+            'results': results
+        })
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error bulk deleting expenses: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error deleting expenses: {str(e)}'
+        }), 500
+
+def recurring_expense_payload(template):
+    return {
+        'id': template.id,
+        'amount': template.amount,
+        'category': template.category,
+        'description': template.description,
+        'frequency': template.frequency,
+        'startDate': template.start_date.strftime('%Y-%m-%d'),
+        'endDate': template.end_date.strftime('%Y-%m-%d') if template.end_date else None,
+        'nextDate': template.next_date.strftime('%Y-%m-%d') if template.next_date else None
+    }
+
+@bp.route('/api/recurring-expenses', methods=['GET'])
+@login_required
+@versioned_etag
+def get_recurring_expenses():
+    templates = RecurringExpense.query.filter_by(user_id=g.user_id).order_by(RecurringExpense.id).all()
+    
+    return jsonify({
+        'success': True,
+        'recurringExpenses': [recurring_expense_payload(template) for template in templates]
+    })
+
+@bp.route('/api/recurring-expenses', methods=['POST'])
+@login_required
+def add_recurring_expense():
+    """Create a recurring expense template; occurrences up to today are added as expenses right away."""
+    user_id = g.user_id
+    data = request.json or {}
+    
+    try:
+        amount = float(data.get('amount', 0))
+        category = data.get('category')
+        frequency = (data.get('frequency') or '').lower()
+        start_date = datetime.strptime(data.get('startDate', ''), '%Y-%m-%d').date()
+        end_date = datetime.strptime(data['endDate'], '%Y-%m-%d').date() if data.get('endDate') else None
+    except (TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'message': 'Invalid amount or date. Use YYYY-MM-DD for dates.'
+        }), 400
+    
+    if amount <= 0 or not category or frequency not in recurrence.STEPS:
+        return jsonify({
+            'success': False,
+            'message': f"Amount, category and a frequency ({', '.join(recurrence.STEPS)}) are required"
+        }), 400
+    
+    if end_date is not None and end_date < start_date:
+        return jsonify({
+            'success': False,
+            'message': 'End date cannot be before the start date'
+        }), 400
+    
+    try:
+        template = RecurringExpense(
+            user_id=user_id,
+            amount=amount,
+            category=category,
+            description=data.get('description', ''),
+            frequency=frequency,
+            start_date=start_date,
+            end_date=end_date,
+            next_date=start_date
+        )
+        db.session.add(template)
+        bump_data_version(user_id)
+        db.session.commit()
+        
+        materialized = recurrence.materialize_recurring_expenses(user_ids=[user_id])
+        
+        return jsonify({
+            'success': True,
+            'recurringExpense': recurring_expense_payload(template),
+            'materialized': materialized
+        })
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error adding recurring expense: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error adding recurring expense: {str(e)}'
+        }), 500
+
+@bp.route('/api/recurring-expenses/<int:template_id>', methods=['DELETE'])
+@login_required
+def delete_recurring_expense(template_id):
+    """Stop a recurring expense; expenses it already added are kept."""
+    user_id = g.user_id
+    
+    try:
+        template = RecurringExpense.query.filter_by(id=template_id, user_id=user_id).first()
+        
+        if not template:
+            return jsonify({
+                'success': False,
+                'message': 'Recurring expense not found or not authorized'
+            }), 404
+        
+        db.session.delete(template)
+        bump_data_version(user_id)
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': 'Recurring expense deleted successfully'
+        })
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error deleting recurring expense: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error deleting recurring expense: {str(e)}'
+        }), 500
+
+@bp.route('/api/recurring/upcoming', methods=['GET'])
+@login_required
+@versioned_etag
+def get_upcoming_recurring():
+    """Income and recurring expense occurrences over the next ``days`` days (max 366)."""
+    days = min(max(request.args.get('days', 30, type=int), 1), 366)
+    start = datetime.now().date()
+    occurrences = recurrence.upcoming(g.user_id, start, start + timedelta(days=days))
+    
+    return jsonify({
+        'success': True,
+        'upcoming': [dict(item, date=item['date'].strftime('%Y-%m-%d')) for item in occurrences]
+    })
+
+@bp.route('/api/expenses/import', methods=['POST'])
+@login_required
+def import_expenses():
+    """Import expenses from an uploaded CSV or OFX bank statement."""
+    user_id = g.user_id
+    upload = request.files.get('file')
+    
+    if not upload or not upload.filename:
+        return jsonify({
+            'success': False,
+            'message': 'No statement file uploaded'
+        }), 400
+    
+    amounts = request.form.get('amounts', 'signed')
+    try:
+        fmt = importer.detect_format(upload.filename, request.form.get('format'))
+        if amounts not in importer.AMOUNT_CONVENTIONS:
+            raise ValueError(f"Unsupported amounts '{amounts}'. Use signed or expenses.")
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    try:
+        report = importer.import_expenses(
+            user_id,
+            importer.open_upload(upload),
+            fmt,
+            default_category=request.form.get('defaultCategory') or 'Other',
+            amounts=amounts
+        )
+        return jsonify({
+            'success': True,
+            **report
+        })
+    except Exception as e:
+        logging.error(f"Error importing expenses: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error importing expenses: {str(e)}'
+        }), 500
+
+@bp.route('/api/expenses/export', methods=['GET'])
+@login_required
+def export_expenses():
+    """Stream the user's expenses as CSV or NDJSON, optionally within a date range."""
+    user_id = g.user_id
+    fmt = request.args.get('format', 'csv').lower()
+    
+    if fmt not in exporter.EXPORT_FORMATS:
+        return jsonify({
+            'success': False,
+            'message': 'Invalid format. Use csv or ndjson.'
+        }), 400
+    
+    try:
+        start = end = None
+        if request.args.get('start_date'):
+            start = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date()
+        if request.args.get('end_date'):
+            end = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() + timedelta(days=1)
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': 'Invalid date format. Use YYYY-MM-DD.'
+        }), 400
+    
+    filename = f"expenses-{datetime.now().strftime('%Y%m%d')}.{fmt}"
+    return Response(
+        stream_with_context(exporter.iter_export(user_id, fmt, start, end)),
+        mimetype=exporter.EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@bp.route('/api/expense-trend')
+@login_required
+@read_replica
+@versioned_etag
+@cached_response
+def expense_trend():
+    """Get expense trend data for visualization."""
+    try:
+        # Get request parameters
+        range_param = request.args.get('range', 'month')
+        user_id = g.user_id
+        
+        # Initialize empty values
+        labels = []
+        values = []
+        
+        # Only the current year is charted to avoid showing last year's data
+        current_year = datetime.now().year
+        year_start, year_end = year_range(current_year)
+        
+        if range_param == 'week':
+            # Get daily expenses for the last 7 days
+            today = datetime.now().date()
+            start_date, end_date = days_range(today, 7)
+            
+            # Only include current year data and nothing after today
+            start_date, end_date = clamp_range(start_date, end_date, year_start, year_end)
+            
+            # Daily totals come from the daily rollup
+            daily_expenses = rollups.daily_totals(user_id, start_date, end_date)
+            
+            # Convert to arrays for chart.js, with missing days as 0
+            for i in range(7):
+                day = today - timedelta(days=6-i)
+                labels.append(day.strftime('%a'))
+                values.append(daily_expenses.get(day, 0))
+            
+            range_totals = daily_expenses
+            
+        elif range_param == 'month':
+            # Get current month and year
+            today = datetime.now()
+            current_month = today.month
+            current_year = today.year
+            
+            # Daily totals for current month come from the daily rollup
+            month_start, month_end = month_range(current_year, current_month)
+            daily_expenses = rollups.daily_totals(user_id, month_start, month_end)
+            
+            # Convert to arrays for chart.js, with missing days as 0
+            labels, values = month_trend_payload(daily_expenses, current_year, current_month)
+            
+            range_totals = daily_expenses
+            
+        else:  # yearly
+            # Get monthly expenses for the current year
+            current_year = datetime.now().year
+            
+            # Monthly totals come from the monthly rollup
+            monthly_expenses = rollups.monthly_totals(user_id, year_start, year_end)
+            
+            # Initialize all months to 0
+            all_months = {i: 0 for i in range(1, 13)}
+            
+            # Fill in actual data
+            for month_start, total in monthly_expenses.items():
+                all_months[month_start.month] = total
+            
+            # Convert to arrays for chart.js
+            for month_num, amount in all_months.items():
+                labels.append(MONTH_NAMES[month_num - 1])
+                values.append(amount)
+            
+            range_totals = monthly_expenses
+        
+        # An empty range only means "no data" if the whole current year is empty,
+        # so the year's expense count is only looked up in that case
+        if not range_totals and (range_param not in ('week', 'month') or
+                                 rollups.expense_count(user_id, year_start, year_end) == 0):
+            return jsonify({
+                'success': True,
+                'labels': [],
+                'values': [],
+                'message': 'No expense data available'
+            })
+        
+        return jsonify({
+            'success': True,
+            'labels': labels,
+            'values': values
+        })
+        
+    except Exception as e:
+        current_app.logger.exception(f"Error in expense trend API: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Failed to fetch expense trend data',
+            'error': str(e)
+        })
+
+@bp.route('/api/expense-categories', methods=['GET'])
+@login_required
+@versioned_etag
+@cached_response
+def get_expense_categories():
+    user_id = g.user_id
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    all_time = request.args.get('range') == 'all'
+    
+    if start_date or end_date or all_time:
+        # Arbitrary inclusive day range, summed from the daily rollup
+        try:
+            start = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+            end = datetime.strptime(end_date, '%Y-%m-%d').date() + timedelta(days=1) if end_date else None
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': 'Invalid date format. Use YYYY-MM-DD.'
+            }), 400
+        categories = rollups.daily_category_totals(user_id, start, end)
+    else:
+        # Category totals for the current year come from the monthly rollup
+        start, end = year_range(datetime.now().year)
+        categories = rollups.category_totals(user_id, start, end)
+    
+    # Convert to list of objects
+    result = [
+        {'category': category, 'amount': amount}
+        for category, amount in categories
+    ]
+    
+    return jsonify({
+        'success': True,
+        'categories': result
+    })
+
+@bp.route('/api/update-profile', methods=['POST'])
+@login_required
+def update_profile():
+    user_id = g.user_id
+    data = request.json
+    
+    try:
+        monthly_income = data.get('monthlyIncome')
+        savings_goal = data.get('savingsGoal')
+        emergency_fund = data.get('emergencyFund')
+        financial_goal = data.get('financialGoal')
+        currency = data.get('currency')
+        
+        user = get_current_user()
+        if user:
+            user.monthly_income = float(monthly_income) if monthly_income else 0
+            user.savings_goal = float(savings_goal) if savings_goal else 0
+            user.emergency_fund = float(emergency_fund) if emergency_fund else 0
+            user.financial_goal = financial_goal
+            
+            # Update currency if provided
+            if currency and currency in [option['code'] for option in CURRENCY_OPTIONS]:
+                user.currency = currency
+                
+            bump_data_version(user_id)
+            db.session.commit()
+            
+            return jsonify({
+                'success': True,
+                'message': 'Profile updated successfully'
+            })
+        else:
+            return jsonify({
+                'success': False,
+                'message': 'User not found'
+            }), 404
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error updating profile: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error updating profile: {str(e)}'
+        }), 500
+        
+# Get user profile data
+@bp.route('/api/profile', methods=['GET'])
+@login_required
+@versioned_etag
+@cached_response
+def get_profile():
+    user = get_current_user(*PROFILE_COLUMNS)
+    
+    if not user:
+        return jsonify({
+            'success': False,
+            'message': 'User not found'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'profile': profile_payload(user)
+    })
+
+# Currency options API
+@bp.route('/api/currency-options', methods=['GET'])
+@static_etag()
+def get_currency_options():
+    return jsonify({
+        'success': True,
+        'currencies': CURRENCY_OPTIONS
+    })
+
+# API Routes for Financial Goals
+@bp.route('/api/goals', methods=['GET'])
+@login_required
+@read_replica
+@versioned_etag
+@cached_response
+def get_goals():
+    user_id = g.user_id
+    # Forecasts are precomputed by forecasting.refresh_forecasts, so this is a single join
+    goals = db.session.query(FinancialGoal, GoalForecast).outerjoin(
+        GoalForecast, GoalForecast.goal_id == FinancialGoal.id
+    ).filter(FinancialGoal.user_id == user_id).all()
+    
+    goal_list = []
+    for goal, forecast in goals:
+        goal_list.append({
+            'id': goal.id,
+            'title': goal.title,
+            'description': goal.description,
+            'goalType': goal.goal_type,
+            'targetAmount': goal.target_amount,
+            'currentAmount': goal.current_amount,
+            'startDate': goal.start_date.strftime('%Y-%m-%d'),
+            'targetDate': goal.target_date.strftime('%Y-%m-%d'),
+            'priority': goal.priority,
+            'isCompleted': goal.is_completed,
+            'milestonesReached': goal.milestones_reached,
+            'progressPercentage': goal.get_progress_percentage(),
+            'daysRemaining': goal.get_days_remaining(),
+            'isOnTrack': goal.is_on_track(),
+            'forecast': forecasting.forecast_json(forecast, goal),
+            'version': goal.version
+        })
+    
+    return jsonify({
+        'success': True,
+        'goals': goal_list
+    })
+
+@bp.route('/api/goals', methods=['POST'])
+@login_required
+def add_goal():
+    user_id = g.user_id
+    data = request.json
+    
+    try:
+        title = data.get('title')
+        description = data.get('description', '')
+        goal_type = data.get('goalType')
+        target_amount = float(data.get('targetAmount', 0))
+        current_amount = float(data.get('currentAmount', 0))
+        target_date_str = data.get('targetDate')
+        priority = int(data.get('priority', 3))
+        
+        if not title or not goal_type or not target_amount or not target_date_str:
+            return jsonify({
+                'success': False,
+                'message': 'Missing required fields'
+            }), 400
+        
+        # Parse date
+        try:
+            target_date = datetime.strptime(target_date_str, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': 'Invalid date format. Use YYYY-MM-DD.'
+            }), 400
+        
+        # Create and save goal
+        new_goal = FinancialGoal(
+            user_id=user_id,
+            title=title,
+            description=description,
+            goal_type=goal_type,
+            target_amount=target_amount,
+            current_amount=current_amount,
+            target_date=target_date,
+            priority=priority
+        )
+        db.session.add(new_goal)
+        db.session.flush()
+        if current_amount:
+            record_contribution(new_goal, 0, 'initial')
+        forecasting.mark_stale(user_id)
+        bump_data_version(user_id)
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'goal': {
+                'id': new_goal.id,
+                'title': new_goal.title,
+                'goalType': new_goal.goal_type,
+                'targetAmount': new_goal.target_amount,
+                'progressPercentage': new_goal.get_progress_percentage(),
+                'daysRemaining': new_goal.get_days_remaining(),
+                'version': new_goal.version
+            }
+        })
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error adding goal: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error adding goal: {str(e)}'
+        }), 500
+
+@bp.route('/api/goals/<int:goal_id>', methods=['PUT'])
+@login_required
+def update_goal(goal_id):
+    user_id = g.user_id
+    data = request.json or {}
+    
+    try:
+        expected_version = parse_goal_version(data.get('version'))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    try:
+        goal = FinancialGoal.query.filter_by(id=goal_id, user_id=user_id).first()
+        
+        if not goal:
+            return jsonify({
+                'success': False,
+                'message': 'Goal not found or unauthorized access'
+            }), 404
+        
+        # Edits made from an outdated copy of the goal are rejected rather than overwriting newer changes
+        if expected_version is not None and goal.version != expected_version:
+            return goal_conflict(goal)
+        
+        old_amount = goal.current_amount or 0
+        
+        # Update fields
+        if 'title' in data:
+            goal.title = data.get('title')
+        if 'description' in data:
+            goal.description = data.get('description', '')
+        if 'goalType' in data:
+            goal.goal_type = data.get('goalType')
+        if 'targetAmount' in data:
+            goal.target_amount = float(data.get('targetAmount', 0))
+        if 'currentAmount' in data:
+            goal.current_amount = float(data.get('currentAmount', 0))
+        if 'targetDate' in data:
+            try:
+                goal.target_date = datetime.strptime(data.get('targetDate'), '%Y-%m-%d').date()
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'message': 'Invalid date format. Use YYYY-MM-DD.'
+                }), 400
+        if 'priority' in data:
+            goal.priority = int(data.get('priority', 3))
+        
+        # Check if goal is completed
+        if goal.current_amount >= goal.target_amount:
+            goal.is_completed = True
+            goal.current_amount = goal.target_amount  # Cap at target amount
+        
+        # The UPDATE only applies if the goal still has the version it was read at
+        db.session.flush()
+        record_contribution(goal, old_amount, 'edit')
+        forecasting.mark_stale(user_id)
+        bump_data_version(user_id)
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'goal': {
+                'id': goal.id,
+                'title': goal.title,
+                'goalType': goal.goal_type,
+                'targetAmount': goal.target_amount,
+                'currentAmount': goal.current_amount,
+                'progressPercentage': goal.get_progress_percentage(),
+                'daysRemaining': goal.get_days_remaining(),
+                'isCompleted': goal.is_completed,
+                'version': goal.version
+            }
+        })
+    except StaleDataError:
+        db.session.rollback()
+        return goal_conflict(FinancialGoal.query.filter_by(id=goal_id, user_id=user_id).first())
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error updating goal: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error updating goal: {str(e)}'
+        }), 500
+
+def record_contribution(goal, old_amount, source):
+    """Append the change from old_amount to the goal's ledger, once the goal's UPDATE has been flushed."""
+    amount = (goal.current_amount or 0) - old_amount
+    if amount == 0 and source != 'initial':
+        return
+    db.session.add(GoalContribution(
+        goal_id=goal.id,
+        user_id=goal.user_id,
+        amount=amount,
+        balance=goal.current_amount or 0,
+        source=source,
+        goal_version=goal.version
+    ))
+
+def parse_goal_version(value):
+    """The goal version a client sent (None if it sent none); ValueError unless it is a whole number."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError('version must be a whole number')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError('version must be a whole number')
+
+def goal_conflict(goal):
+    """409 response for a goal write based on an outdated version."""
+    return jsonify({
+        'success': False,
+        'message': 'This goal was changed elsewhere. Reload it and try again.',
+        'goal': {
+            'id': goal.id,
+            'currentAmount': goal.current_amount,
+            'version': goal.version
+        } if goal else None
+    }), 409
+
+def update_goal_milestones(goal, new_amount):
+    """
+    Set goal.current_amount and adjust its milestones and completion
+
+    Returns:
+        tuple: (milestone_reached, milestone_lost) for the response
+    """
+    # Calculate old and new percentages
+    old_percentage = goal.get_progress_percentage()
+    
+    # Update the amount
+    goal.current_amount = new_amount
+    
+    # Calculate new percentage
+    new_percentage = goal.get_progress_percentage()
+    
+    # Check if milestone reached
+    milestone_reached = False
+    milestone_lost = False
+    
+    # Handle milestone changes
+    # First check if the progress decreased
+    if new_percentage < old_percentage:
+        # Reset milestones based on new percentage, but only if they need to change
+        # Use precise comparisons to avoid floating point issues (new_percentage should be exactly < 25.0)
+        if new_percentage < 25.0:
+            if goal.milestones_reached > 0:
+                # If previously we had any milestones, now we have none
+                goal.milestones_reached = 0
+                milestone_lost = 25
+        elif new_percentage < 50.0:
+            if goal.milestones_reached > 1:
+                # If we had 50%, 75% or 100% milestone, now we only have 25%
+                goal.milestones_reached = 1
+                milestone_lost = 50
+        elif new_percentage < 75.0:
+            if goal.milestones_reached > 2:
+                # If we had 75% or 100% milestone, now we only have 25% and 50%
+                goal.milestones_reached = 2
+                milestone_lost = 75
+        elif new_percentage < 100.0:
+            if goal.milestones_reached > 3:
+                # If we had 100% milestone, now we have 25%, 50%, and 75%
+                goal.milestones_reached = 3
+                milestone_lost = 100
+    else:
+        # Check for milestone increases (25%, 50%, 75%, 100%)
+        # Use a more precise comparison to avoid triggering at 24.998%
+        for milestone in [25, 50, 75, 100]:
+            # The key is to use a precise threshold - only trigger when we're truly past the milestone
+            # Adding a small buffer (0.01%) to ensure we're definitely past the milestone
+            if old_percentage < milestone and new_percentage >= milestone:
+                milestone_reached = True
+                if milestone == 25 and goal.milestones_reached < 1:
+                    goal.milestones_reached = 1
+                elif milestone == 50 and goal.milestones_reached < 2:
+                    goal.milestones_reached = 2
+                elif milestone == 75 and goal.milestones_reached < 3:
+                    goal.milestones_reached = 3
+                elif milestone == 100 and goal.milestones_reached < 4:
+                    goal.milestones_reached = 4
+    
+    # Set completed status based on percentage
+    if new_percentage >= 100:
+        goal.is_completed = True
+    else:
+        # If percentage is below 100%, ensure is_completed is False
+        goal.is_completed = False
+    
+    return milestone_reached, milestone_lost
+
+@bp.route('/api/goals/<int:goal_id>/progress', methods=['PUT'])
+@login_required
+def update_goal_progress(goal_id):
+    """
+    Set a goal's current amount, or add a contribution to it
+
+    Send ``amount`` to add a contribution (negative to withdraw); it is retried
+    against the latest amount if another request changes the goal first. Send
+    ``currentAmount`` to set the amount outright, with ``version`` from the
+    last read to get a 409 instead of overwriting someone else's change.
+    """
+    user_id = g.user_id
+    data = request.json or {}
+    
+    try:
+        contribution = float(data['amount']) if 'amount' in data else None
+        # Get the new amount
+        # Support both camelCase and snake_case for client compatibility
+        new_amount = float(data.get('current_amount', data.get('currentAmount', 0)))
+        expected_version = parse_goal_version(data.get('version'))
+    except (TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'message': 'Amount and version must be numbers'
+        }), 400
+    
+    try:
+        for attempt in range(GOAL_WRITE_ATTEMPTS):
+            goal = FinancialGoal.query.filter_by(id=goal_id, user_id=user_id).first()
+            
+            if not goal:
+                return jsonify({
+                    'success': False,
+                    'message': 'Goal not found or unauthorized access'
+                }), 404
+            
+            if expected_version is not None and goal.version != expected_version:
+                return goal_conflict(goal)
+            
+            old_amount = goal.current_amount or 0
+            if contribution is not None:
+                new_amount = old_amount + contribution
+            
+            # Validate amount
+            if new_amount < 0:
+                return jsonify({
+                    'success': False,
+                    'message': 'Current amount cannot be negative'
+                }), 400
+            
+            if new_amount > goal.target_amount:
+                new_amount = goal.target_amount  # Cap at target amount
+            
+            milestone_reached, milestone_lost = update_goal_milestones(goal, new_amount)
+            
+            try:
+                # The UPDATE only applies if the goal still has the version read above
+                db.session.flush()
+            except StaleDataError:
+                db.session.rollback()
+                if expected_version is not None:
+                    return goal_conflict(FinancialGoal.query.filter_by(id=goal_id, user_id=user_id).first())
+                continue
+            
+            record_contribution(goal, old_amount, 'contribution' if contribution is not None else 'progress')
+            forecasting.mark_stale(user_id)
+            bump_data_version(user_id)
+            db.session.commit()
+            
+            return jsonify({
+                'success': True,
+                'goal': {
+                    'id': goal.id,
+                    'currentAmount': goal.current_amount,
+                    'progressPercentage': goal.get_progress_percentage(),
+                    'isCompleted': goal.is_completed,
+                    'milestonesReached': goal.milestones_reached,
+                    'milestoneReached': milestone_reached,
+                    'milestoneLost': milestone_lost,
+                    'version': goal.version
+                }
+            })
+        
+        return jsonify({
+            'success': False,
+            'message': 'Goal is being updated by another request. Please try again.'
+        }), 409
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error updating goal progress: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error updating goal progress: {str(e)}'
+        }), 500
+
+@bp.route('/api/goals/<int:goal_id>', methods=['DELETE'])
+@login_required
+def delete_goal(goal_id):
+    """Delete a goal; pass ``version`` (JSON body or query string) to get a 409 if it changed since."""
+    user_id = g.user_id
+    data = request.get_json(silent=True)
+    
+    try:
+        version = data.get('version') if isinstance(data, dict) else None
+        expected_version = parse_goal_version(request.args.get('version', version))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
+    
+    try:
+        goal = FinancialGoal.query.filter_by(id=goal_id, user_id=user_id).first()
+        
+        if not goal:
+            return jsonify({
+                'success': False,
+                'message': 'Goal not found or not authorized'
+            }), 404
+        
+        if expected_version is not None and goal.version != expected_version:
+            return goal_conflict(goal)
+        
+        forecasting.delete_forecast(goal.id)
+        GoalContribution.query.filter_by(goal_id=goal.id).delete(synchronize_session=False)
+        db.session.delete(goal)
+        db.session.flush()
+        forecasting.mark_stale(user_id)
+        bump_data_version(user_id)
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'message': 'Goal deleted successfully'
+        })
+    except StaleDataError:
+        db.session.rollback()
+        return goal_conflict(FinancialGoal.query.filter_by(id=goal_id, user_id=user_id).first())
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error deleting goal: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'Error deleting goal: {str(e)}'
+        }), 500
+
+@bp.route('/api/goals/<int:goal_id>/contributions', methods=['GET'])
+@login_required
+@versioned_etag
+def get_goal_contributions(goal_id):
+    """A goal's ledger of amount changes, newest first (at most ``limit``, default 100)."""
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+    goal = db.session.get(FinancialGoal, goal_id, options=[load_only(FinancialGoal.user_id)])
+    
+    if not goal or goal.user_id != g.user_id:
+        return jsonify({
+            'success': False,
+            'message': 'Goal not found or unauthorized access'
+        }), 404
+    
+    contributions = GoalContribution.query.filter_by(goal_id=goal_id) \
+        .order_by(GoalContribution.id.desc()).limit(limit).all()
+    
+    return jsonify({
+        'success': True,
+        'contributions': [{
+            'id': contribution.id,
+            'amount': contribution.amount,
+            'balance': contribution.balance,
+            'source': contribution.source,
+            'version': contribution.goal_version,
+            'createdAt': contribution.created_at.strftime('%Y-%m-%dT%H:%M:%S')
+        } for contribution in contributions]
+    })
+
+@bp.route('/api/check-username', methods=['POST'])
+def check_username():
+    username = request.json.get('username')
+    if not username:
+        return jsonify({
+            'available': False,
+            'message': 'Username is required'
+        })
+    
+    # Check if username exists
+    user_exists = shards.find_user(username) is not None
+    
+    return jsonify({
+        'available': not user_exists,
+        'message': 'Username is already taken' if user_exists else 'Username is available'
+    })
+
+@bp.route('/api/dashboard-data')
+@login_required
+@versioned_etag
+def get_dashboard_data():
+    period = request.args.get('period', 'week')
+    
+    # Get current date and start date based on period
+    end_date = datetime.now()
+    if period == 'week':
+        start_date = end_date - timedelta(days=7)
+    else:  # month
+        start_date = end_date - timedelta(days=30)
+    
+    # Expenses for the period come from the in-memory expense store
+    columns = expense_store.columns(g.user_id)
+    start_day = analytics.to_day_number(start_date.date())
+    end_day = analytics.to_day_number(end_date.date())
+    in_period = (columns.days >= start_day) & (columns.days <= end_day)
+    
+    # Calculate metrics
+    total_expenses = float(columns.amounts[in_period].sum())
+    monthly_income_amount = recurrence.monthly_income(g.user_id) or 0
+    savings = monthly_income_amount - total_expenses if monthly_income_amount > 0 else 0
+    
+    # Group expenses by date for distribution chart (np.unique returns the dates sorted)
+    dates, date_codes = np.unique(columns.days[in_period], return_inverse=True)
+    daily_totals = np.bincount(date_codes, weights=columns.amounts[in_period], minlength=len(dates))
+    
+    # Get recent expenses (last 5), newest date first and latest added first within a date
+    recent = np.lexsort((-np.arange(len(columns.days)), -columns.days))[:5]
+    
+    return jsonify({
+        'metrics': {
+            'totalExpenses': total_expenses,
+            'monthlyIncome': monthly_income_amount,
+            'savings': savings
+        },
+        'expenseDistribution': {
+            'labels': dates.astype('datetime64[D]').astype(str).tolist(),
+            'values': daily_totals.tolist()
+        },
+        'recentExpenses': [{
+            'date': str(np.datetime64(int(columns.days[index]), 'D')),
+            'category': str(columns.names[columns.codes[index]]),
+            'amount': float(columns.amounts[index])
+        } for index in recent]
+    })
+
+@bp.route('/api/dashboard/bootstrap')
+@login_required
+@versioned_etag
+@cached_response
+def dashboard_bootstrap():
+    """
+    Everything the dashboard page needs on load, in one response.
+
+    Four queries: the user with their normalized monthly income, the year's
+    monthly rollup by category (which also yields the current month's category
+    totals), the current month's daily rollup and the recent expenses.
+    """
+    user_id = g.user_id
+    row = db.session.execute(
+        select(User, recurrence.monthly_income_column())
+        .options(load_only(*[getattr(User, column) for column in PROFILE_COLUMNS]))
+        .where(User.id == user_id)
+    ).first()
+    if not row:
+        return jsonify({
+            'success': False,
+            'message': 'User not found'
+        }), 404
+    user, monthly_income = row
+    g.current_user = user
+    
+    today = datetime.now().date()
+    year_start, year_end = year_range(today.year)
+    month_start, month_end = month_range(today.year, today.month)
+    
+    # Year to date by (month, category) from the monthly rollup
+    monthly_totals = {}
+    month_categories = []
+    for month, category, total, _ in rollups.monthly_category_totals(user_id, year_start, year_end):
+        monthly_totals[month] = monthly_totals.get(month, 0) + total
+        if month == month_start:
+            month_categories.append({'category': category, 'amount': total})
+    
+    expenses_by_month, savings_by_month = yearly_summary_payload(monthly_totals, monthly_income)
+    
+    if monthly_totals:
+        daily_expenses = rollups.daily_totals(user_id, month_start, month_end)
+        trend_labels, trend_values = month_trend_payload(daily_expenses, today.year, today.month)
+    else:
+        trend_labels, trend_values = [], []
+    
+    return jsonify({
+        'success': True,
+        'profile': profile_payload(user),
+        'currencies': CURRENCY_OPTIONS,
+        'monthlyExpenses': {
+            'month': today.month,
+            'year': today.year,
+            'total': monthly_totals.get(month_start, 0),
+            'categories': month_categories
+        },
+        'yearlySummary': {
+            'expenses': expenses_by_month,
+            'savings': savings_by_month,
+            'year': today.year
+        },
+        'trend': {
+            'range': 'month',
+            'labels': trend_labels,
+            'values': trend_values
+        },
+        'recentExpenses': recent_expenses_payload(user_id, today.year)
+    })
+
+@bp.route('/api/expense-distribution', methods=['GET'])
+@login_required
+@read_replica
+@versioned_etag
+@cached_response
+def get_expense_distribution():
+    user_id = g.user_id
+    period = request.args.get('period', 'week')
+    
+    # Calculate date range based on period
+    end_date = datetime.now()
+    current_year = end_date.year
+    
+    # Determine appropriate time range based on period selection
+    if period == 'week':
+        start_date = end_date - timedelta(days=7)
+    elif period == 'month':
+        start_date = end_date.replace(day=1)
+    elif period == 'last_6_months':
+        # Last 6 months from current date
+        start_date = end_date - timedelta(days=180)
+    else:
+        # Default to week if invalid period
+        start_date = end_date - timedelta(days=7)
+    
+    # Get expenses within the date range AND only for the current year
+    year_start, year_end = year_range(current_year)
+    start, end = clamp_range(start_date, end_date + timedelta(days=1), year_start, year_end)
+    columns = expense_store.columns(user_id)
+    in_range = (columns.days >= analytics.to_day_number(start)) & (columns.days < analytics.to_day_number(end))
+    
+    # Group expenses by category code, keeping only categories with expenses in range
+    totals = np.bincount(columns.codes[in_range], weights=columns.amounts[in_range], minlength=len(columns.names))
+    counts = np.bincount(columns.codes[in_range], minlength=len(columns.names))
+    
+    # Sort by amount (descending)
+    sorted_categories = {
+        str(columns.names[code]): float(totals[code])
+        for code in np.argsort(-totals, kind='stable') if counts[code]
+    }
+    
+    return jsonify({
+        'success': True,
+        'distribution': sorted_categories,
+        'period': period
+    })
+
+@bp.route('/api/analytics/spending', methods=['GET'])
+@login_required
+@versioned_etag
+@cached_response
+def spending_analytics():
+    """
+    Category shares, rolling 7/30-day averages and month-over-month deltas.
+
+    Query parameters:
+        top: Number of categories to return (1-20, default 5)
+        days: Days of daily/rolling series to return (7-365, default 90)
+        months: Calendar months for the category and monthly views (2-36, default 12)
+    """
+    user_id = g.user_id
+    top_n = min(max(request.args.get('top', 5, type=int), 1), 20)
+    days = min(max(request.args.get('days', 90, type=int), 7), 365)
+    months = min(max(request.args.get('months', 12, type=int), 2), 36)
+    
+    try:
+        today = datetime.now().date()
+        columns = analytics.load_columns(
+            user_id, analytics.window_start(today, days, months), today + timedelta(days=1)
+        )
+        return jsonify({
+            'success': True,
+            **analytics.analyze(columns, today, top_n, days, months)
+        })
+    except Exception as e:
+        logging.error(f"Error computing spending analytics: {e}")
+        return jsonify({
+            'success': False,
+            'message': 'Failed to compute spending analytics'
+        }), 500
+
+@bp.route('/api/recent-expenses')
+@login_required
+@versioned_etag
+def get_recent_expenses():
+    user_id = g.user_id
+    current_year = datetime.now().year
+    
+    try:
+        # Get only current year expenses for consistency
+        return jsonify(recent_expenses_payload(user_id, current_year))
+    except Exception as e:
+        logging.error(f"Error fetching recent expenses: {e}")
+        return jsonify([])
+
+@bp.route('/forgot-password', methods=['POST'])
+def forgot_password():
+    username = request.form.get('recover_username')
+    mobile = request.form.get('recover_mobile')
+    
+    # Find user by username and mobile number
+    user = shards.find_user(username)
+    
+    if not user or user.mobile != mobile:
+        flash('No account found with that username and mobile number', 'error')
+        return redirect(url_for('main.login'))
+    
+    # Generate a 6-digit OTP
+    otp = ''.join(random.choices(string.digits, k=6))
+    
+    # Store OTP in database
+    user.reset_otp = otp
+    user.reset_otp_created_at = datetime.now()
+    user.reset_otp_attempts = 0
+    
+    try:
+        db.session.commit()
+        
+        # In a real app, send the OTP via SMS to the user's mobile number
+        # For demonstration, we'll just flash it on screen
+        flash(f'Your OTP is: {otp} (In a real app, this would be sent to your mobile number)', 'info')
+        
+        # Store username in session for the verify_otp route
+        session['reset_username'] = username
+        
+        return redirect(url_for('main.verify_otp'))
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error generating OTP: {e}")
+        flash('An error occurred. Please try again.', 'error')
+        return redirect(url_for('main.login'))
+
+@bp.route('/verify-otp', methods=['GET', 'POST'])
+def verify_otp():
+    if 'reset_username' not in session:
+        flash('Please start the password reset process again', 'error')
+        return redirect(url_for('main.login'))
+    
+    username = session['reset_username']
+    user = shards.find_user(username)
+    
+    if not user:
+        session.pop('reset_username', None)
+        flash('User not found. Please try again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    if request.method == 'POST':
+        otp = request.form.get('otp')
+        
+        # Check if OTP is valid
+        if not user.reset_otp or user.reset_otp != otp:
+            user.reset_otp_attempts += 1
+            db.session.commit()
+            
+            # Limit failed attempts
+            if user.reset_otp_attempts >= 3:
+                user.reset_otp = None
+                user.reset_otp_created_at = None
+                user.reset_otp_attempts = 0
+                db.session.commit()
+                
+                session.pop('reset_username', None)
+                flash('Too many failed attempts. Please restart the password reset process.', 'error')
+                return redirect(url_for('main.login'))
+            
+            flash('Invalid OTP. Please try again.', 'error')
+            return render_template('verify_otp.html')
+        
+        # Check if OTP is expired
+        if datetime.now() - user.reset_otp_created_at > RESET_OTP_LIFETIME:
+            user.reset_otp = None
+            user.reset_otp_created_at = None
+            user.reset_otp_attempts = 0
+            db.session.commit()
+            
+            session.pop('reset_username', None)
+            flash('OTP has expired. Please restart the password reset process.', 'error')
+            return redirect(url_for('main.login'))
+        
+        # OTP is valid, proceed to reset password
+        session['otp_verified'] = True
+        return redirect(url_for('main.reset_password'))
+    
+    return render_template('verify_otp.html')
+
+@bp.route('/reset-password', methods=['GET', 'POST'])
+def reset_password():
+    if 'reset_username' not in session or 'otp_verified' not in session:
+        flash('Please complete the verification process first', 'error')
+        return redirect(url_for('main.login'))
+    
+    username = session['reset_username']
+    user = shards.find_user(username)
+    
+    if not user:
+        session.pop('reset_username', None)
+        session.pop('otp_verified', None)
+        flash('User not found. Please try again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    if request.method == 'POST':
+        new_password = request.form.get('new_password')
+        confirm_password = request.form.get('confirm_password')
+        
+        if new_password != confirm_password:
+            flash('Passwords do not match', 'error')
+            return render_template('reset_password.html')
+        
+        # Update password
+        user.password = generate_password_hash(new_password)
+        user.reset_otp = None
+        user.reset_otp_created_at = None
+        user.reset_otp_attempts = 0
+        
+        try:
+            db.session.commit()
+            
+            # Clear session
+            session.pop('reset_username', None)
+            session.pop('otp_verified', None)
+            
+            flash('Password has been reset successfully. You can now log in with your new password.', 'success')
+            return redirect(url_for('main.login'))
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error resetting password: {e}")
+            flash('An error occurred. Please try again.', 'error')
+            return redirect(url_for('main.login'))
+    
+    return render_template('reset_password.html')
+
+@bp.route('/api/yearly-summary')
+@login_required
+@read_replica
+@versioned_etag
+@cached_response
+def yearly_summary():
+    """Get yearly expense and savings summary for the current year."""
+    try:
+        current_year = datetime.now().year
+        user_id = g.user_id
+        
+        # Income records normalized to a monthly amount, or the profile's monthly income
+        monthly_income = recurrence.monthly_income(user_id)
+        if monthly_income is None:
+            return jsonify({'success': False, 'message': 'User not found'})
+        
+        # Monthly totals come from the monthly rollup
+        start, end = year_range(current_year)
+        monthly_expenses = rollups.monthly_totals(user_id, start, end)
+        expenses_by_month, savings_by_month = yearly_summary_payload(monthly_expenses, monthly_income)
+        
+        return jsonify({
+            'success': True,
+            'expenses': expenses_by_month,
+            'savings': savings_by_month,
+            'year': current_year
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"Error fetching yearly summary: {str(e)}")
+        return jsonify({'success': False, 'message': 'Failed to fetch yearly summary data'})
+
+# Achievements API endpoint
+@bp.route('/api/achievements', methods=['GET'])
+@login_required
+def get_achievements():
+    user_id = g.user_id
+    
+    # This is a placeholder API that will return an empty list
+    # In a real implementation, we would query the database for user achievements
+    
+    return jsonify({
+        'success': True,
+        'achievements': []  # Empty array as placeholder until achievement system is fully implemented
+    })
+
+# Derived data written by the nightly batch (see batch.py)
+@bp.route('/api/insights', methods=['GET'])
+@login_required
+def get_insights():
+    insight = db.session.get(UserInsight, g.user_id)
+    
+    if not insight:
+        return jsonify({
+            'success': True,
+            'insight': None
+        })
+    
+    return jsonify({
+        'success': True,
+        'insight': {
+            'advice': insight.advice,
+            'goalsTotal': insight.goals_total,
+            'goalsCompleted': insight.goals_completed,
+            'goalsOnTrack': insight.goals_on_track,
+            'computedAt': insight.computed_at.strftime('%Y-%m-%dT%H:%M:%S')
+        }
+    })
+
+# Response cache counters
+@bp.route('/api/cache-stats', methods=['GET'])
+@login_required
+def get_cache_stats():
+    return jsonify({
+        'success': True,
+        'cache': response_cache.stats(),
+        'expenseStore': expense_store.stats()
+    })
+
+# Handle 404 errors
+@bp.app_errorhandler(404)
+def page_not_found(e):
+    return render_template('404.html'), 404
@@ -0,0 +1,296 @@
+"""
+Lightweight scheduler for periodic maintenance.
+
+Jobs are registered with @job(name, interval), and their schedule lives in
+the ScheduledJob table. Before running a due job, a worker takes its lease
+with one conditional UPDATE, so each run happens once even when several
+processes run the scheduler (for example every gunicorn worker). Leases of
+running jobs are renewed on every tick. If a worker dies, its lease expires
+and another worker picks the job up. Jobs run on a small thread pool, each in
+its own app context, and with sharding once per shard.
+
+Run it as its own process:
+
+    flask scheduler
+
+or inside the web workers by setting SCHEDULER_ENABLED=1.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import insert, or_, select, text, update
+from sqlalchemy.exc import IntegrityError
+
+import forecasting
+import recurrence
+import shards
+from extensions import db
+from models import ExpenseDailyRollup, ExpenseMonthlyRollup, ScheduledJob, User, RESET_OTP_LIFETIME
+
+logger = logging.getLogger(__name__)
+
+LEASE_DURATION = timedelta(minutes=5)
+POLL_SECONDS = 30
+MAX_WORKERS = 2
+
+Job = namedtuple('Job', 'name func interval')
+JOBS = {}
+
+
+def job(name, interval):
+    """Register a function (returning a short summary) to run every ``interval``."""
+    def register(func):
+        JOBS[name] = Job(name, func, interval)
+        return func
+    return register
+
+
+@job('compact_rollups', timedelta(days=1))
+def compact_rollups():
+    """Drop empty rollup buckets and refresh the rollup tables' planner statistics."""
+    models = (ExpenseDailyRollup, ExpenseMonthlyRollup)
+    removed = 0
+    for model in models:
+        removed += model.query.filter(model.expense_count <= 0).delete(synchronize_session=False)
+    db.session.commit()
+
+    if db.engine.dialect.name in ('sqlite', 'postgresql'):
+        for model in models:
+            db.session.execute(text(f'ANALYZE {model.__tablename__}'))
+        db.session.commit()
+    return f'{removed} empty buckets removed'
+
+
+@job('cleanup_expired_otps', timedelta(minutes=15))
+def cleanup_expired_otps():
+    """Clear password reset OTPs that can no longer be used."""
+    # reset_otp_created_at is stored in local time
+    cutoff = datetime.now() - RESET_OTP_LIFETIME
+    result = db.session.execute(
+        update(User)
+        .where(User.reset_otp_created_at < cutoff)
+        .values(reset_otp=None, reset_otp_created_at=None, reset_otp_attempts=0)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return f'{result.rowcount} expired OTPs cleared'
+
+
+@job('materialize_recurring_expenses', timedelta(hours=1))
+def materialize_recurring_expenses():
+    """Add the expenses recurring templates have produced up to today."""
+    return f'{recurrence.materialize_recurring_expenses()} recurring expenses added'
+
+
+@job('refresh_forecasts', timedelta(days=1))
+def refresh_forecasts():
+    return f'{forecasting.refresh_forecasts()} forecasts refreshed'
+
+
+@job('refresh_stale_forecasts', timedelta(minutes=5))
+def refresh_stale_forecasts():
+    """Refit the forecasts goal writes have marked stale, and those of new goals."""
+    return f'{forecasting.refresh_stale_forecasts()} stale forecasts refreshed'
+
+
+class Scheduler:
+    """Runs due JOBS on a bounded thread pool, coordinating with other processes through leases."""
+
+    def __init__(self, app, jobs=None, max_workers=MAX_WORKERS, poll_seconds=POLL_SECONDS,
+                 lease_duration=LEASE_DURATION):
+        self.app = app
+        self.jobs = jobs or JOBS
+        self.max_workers = max_workers
+        self.poll_seconds = poll_seconds
+        self.lease_duration = lease_duration
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='scheduler')
+        self._running = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def ensure_jobs(self):
+        """Create schedule rows (due now) for registered jobs that don't have one yet."""
+        existing = set(db.session.scalars(select(ScheduledJob.name)))
+        for name in self.jobs:
+            if name in existing:
+                continue
+            try:
+                db.session.execute(insert(ScheduledJob).values(
+                    name=name, next_run_at=datetime.utcnow(), run_count=0
+                ))
+                db.session.commit()
+            except IntegrityError:
+                # Another process created it first
+                db.session.rollback()
+
+    def _lease_free(self, now):
+        return or_(ScheduledJob.lease_expires_at.is_(None), ScheduledJob.lease_expires_at < now)
+
+    def _acquire(self, name, now):
+        result = db.session.execute(
+            update(ScheduledJob)
+            .where(ScheduledJob.name == name, ScheduledJob.next_run_at <= now, self._lease_free(now))
+            .values(lease_owner=self.owner, lease_expires_at=now + self.lease_duration, last_started_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def _renew(self, names, now):
+        db.session.execute(
+            update(ScheduledJob)
+            .where(ScheduledJob.name.in_(names), ScheduledJob.lease_owner == self.owner)
+            .values(lease_expires_at=now + self.lease_duration)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def _finish(self, job, status, error=None):
+        now = datetime.utcnow()
+        db.session.execute(
+            update(ScheduledJob)
+            .where(ScheduledJob.name == job.name, ScheduledJob.lease_owner == self.owner)
+            .values(lease_owner=None, lease_expires_at=None, next_run_at=now + job.interval,
+                    last_finished_at=now, last_status=status, last_error=error,
+                    run_count=ScheduledJob.run_count + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def _run(self, job):
+        with self.app.app_context():
+            started = time.perf_counter()
+            try:
+                # Jobs work on users' rows, so they run once per shard
+                summary = '; '.join(str(job.func()) for _ in shards.each_shard())
+            except Exception as e:
+                db.session.rollback()
+                logger.exception(f"Job {job.name} failed")
+                self._finish(job, 'failed', str(e))
+                return
+            logger.info(f"Job {job.name} finished in {time.perf_counter() - started:.1f}s: {summary}")
+            self._finish(job, 'succeeded')
+
+    def tick(self):
+        """
+        Renew the leases of running jobs and start due jobs while there are free workers
+        (inside an app context)
+
+        Returns:
+            list: Names of the jobs started
+        """
+        now = datetime.utcnow()
+        started = []
+        with self._lock:
+            self._running = {name: future for name, future in self._running.items() if not future.done()}
+            if self._running:
+                self._renew(list(self._running), now)
+
+            due = db.session.scalars(
+                select(ScheduledJob.name)
+                .where(ScheduledJob.name.in_(list(self.jobs)), ScheduledJob.next_run_at <= now,
+                       self._lease_free(now))
+                .order_by(ScheduledJob.next_run_at)
+            ).all()
+            for name in due:
+                if len(self._running) >= self.max_workers:
+                    break
+                if name not in self._running and self._acquire(name, now):
+                    self._running[name] = self._executor.submit(self._run, self.jobs[name])
+                    started.append(name)
+        return started
+
+    def wait(self):
+        """Block until the running jobs finish."""
+        for future in list(self._running.values()):
+            future.result()
+
+    def run_forever(self):
+        with self.app.app_context():
+            self.ensure_jobs()
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    self.tick()
+            except Exception:
+                logger.exception("Scheduler tick failed")
+            self._stop.wait(self.poll_seconds)
+
+    def start(self):
+        """Run the scheduler loop on a daemon thread."""
+        self._thread = threading.Thread(target=self.run_forever, name='scheduler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, wait=True):
+        self._stop.set()
+        if self._thread is not None and wait:
+            self._thread.join()
+        self._executor.shutdown(wait=wait)
+
+
+def init_app(app):
+    """Start a scheduler in each web worker process if SCHEDULER_ENABLED is set."""
+    if not app.config.get('SCHEDULER_ENABLED'):
+        return
+
+    lock = threading.Lock()
+    started_in = []
+
+    @app.before_request
+    def start_scheduler():
+        # Started on the first request so it runs in the worker, not in a preloading parent process
+        if os.getpid() in started_in:
+            return
+        with lock:
+            if os.getpid() not in started_in:
+                started_in.append(os.getpid())
+                app.extensions['scheduler'] = Scheduler(
+                    app,
+                    max_workers=app.config.get('SCHEDULER_MAX_WORKERS', MAX_WORKERS),
+                    poll_seconds=app.config.get('SCHEDULER_POLL_SECONDS', POLL_SECONDS)
+                ).start()
+
+
+@click.command('scheduler')
+@click.option('--once', is_flag=True, help='Run the jobs that are due, wait for them and exit.')
+@click.option('--job', 'names', multiple=True, type=click.Choice(sorted(JOBS)),
+              help='Only run this job (repeatable); defaults to all of them.')
+@click.option('--workers', type=int, default=MAX_WORKERS, help='Jobs that may run at the same time.')
+@click.option('--poll-seconds', type=float, default=POLL_SECONDS, help='Seconds between checks for due jobs.')
+@with_appcontext
+def scheduler_command(once, names, workers, poll_seconds):
+    """Run periodic maintenance jobs."""
+    jobs = {name: JOBS[name] for name in names} if names else JOBS
+    scheduler = Scheduler(current_app._get_current_object(), jobs=jobs, max_workers=workers,
+                          poll_seconds=poll_seconds)
+    if once:
+        scheduler.ensure_jobs()
+        started = []
+        while True:
+            batch = scheduler.tick()
+            if not batch:
+                break
+            started.extend(batch)
+            scheduler.wait()
+        scheduler.stop()
+        click.echo(f"Ran {len(started)} due jobs: {', '.join(started) or 'none'}.")
+        return
+
+    click.echo(f"Scheduler {scheduler.owner} running {', '.join(jobs)}.")
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        scheduler.stop(wait=False)
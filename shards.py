@@ -0,0 +1,571 @@
+"""
+User-id sharding.
+
+When SHARD_DATABASE_URLS lists N databases, every user's rows (the user, and
+its expenses, incomes, goals and everything derived from them) live in one
+of those shards. Each database has its own write lock (one SQLite file per
+shard), so writes by users on different shards no longer wait for each other.
+The main database (SQLALCHEMY_DATABASE_URI) keeps the ShardDirectory, which
+maps each user id and username to a shard, and the ScheduledJob leases.
+
+New users are placed with a jump consistent hash of their id. When shards
+are added, only about 1/N of the users hash elsewhere, and
+`flask shard-rebalance` moves just those users. The directory records where
+each user actually is, so placement never changes until a user is moved.
+A moved user's rows keep their ids where the target shard doesn't already
+use them. The ones that clash are renumbered, and move_user returns (and the
+CLI prints) the old -> new ids, since each shard numbers its rows on its own.
+
+Requests select a shard once the user is known (login_required, or
+find_user for the login and password reset forms). The session then sends
+statements on user tables to that shard's engine. Background work runs once
+per shard:
+
+    for _ in shards.each_shard():
+        ...
+
+Without SHARD_DATABASE_URLS, everything stays in the main database and none
+of this costs a query.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import click
+from flask import current_app, g, has_app_context, jsonify
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func, insert, inspect, select, update
+from sqlalchemy.sql.util import find_tables
+
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+BIND_PREFIX = 'shard_'
+# Always in the main database
+DIRECTORY_TABLES = frozenset({'shard_directory', 'scheduled_job'})
+# In every database, following the selected shard (each database records its own migrations)
+PER_DATABASE_TABLES = frozenset({'schema_migration'})
+# Seconds a rebalance waits after marking a user as moving, so requests already past the check finish
+DRAIN_SECONDS = 2
+COPY_BATCH_SIZE = 1000
+
+
+class ShardNotSelected(RuntimeError):
+    """A user table was queried with sharding enabled but no shard selected."""
+
+
+class UserMoving(Exception):
+    """The user's rows are being moved to another shard."""
+
+
+def jump_hash(key, buckets):
+    """Jump consistent hash (Lamping and Veach) of an integer key into range(buckets)."""
+    key &= 0xFFFFFFFFFFFFFFFF
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_count():
+    """Number of shard databases, 0 when sharding is off."""
+    return current_app.config.get('SHARD_COUNT', 0) if has_app_context() else 0
+
+
+def bind_key(shard):
+    return f'{BIND_PREFIX}{shard}'
+
+
+def configure(app):
+    """Add a bind per URL in SHARD_DATABASE_URLS (before db.init_app)."""
+    import database
+
+    urls = app.config.get('SHARD_DATABASE_URLS') or []
+    if isinstance(urls, str):
+        urls = [url.strip() for url in urls.split(',') if url.strip()]
+    app.config['SHARD_DATABASE_URLS'] = urls
+    app.config['SHARD_COUNT'] = len(urls)
+    if not urls:
+        return
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    for shard, url in enumerate(urls):
+        binds[bind_key(shard)] = dict(database.engine_options(url, app.config), url=url)
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+
+def init_app(app):
+    """Answer requests for users being moved with 503 until the move finishes."""
+    @app.errorhandler(UserMoving)
+    def user_moving(error):
+        response = jsonify({'success': False, 'message': 'Your data is being moved. Please try again shortly.'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(DRAIN_SECONDS + 1)
+        return response
+
+
+def current_shard():
+    return g.get('shard') if has_app_context() else None
+
+
+def engine_for(shard):
+    """Engine of a shard, or of the main database for None."""
+    return db.engines[bind_key(shard)] if shard is not None else db.engine
+
+
+def current_engine():
+    """Engine of the selected shard, or of the main database."""
+    return engine_for(current_shard())
+
+
+def _table_names(mapper, clause):
+    if mapper is not None:
+        return {inspect(mapper).local_table.name}
+    if clause is not None:
+        return {table.name for table in find_tables(clause, include_crud=True) if hasattr(table, 'name')}
+    return set()
+
+
+def route(engines, mapper=None, clause=None):
+    """
+    Engine for a statement under sharding, or None for the default routing
+
+    Raises:
+        ShardNotSelected: A user table is used while no shard is selected
+    """
+    if not shard_count():
+        return None
+    names = _table_names(mapper, clause)
+    if names & DIRECTORY_TABLES:
+        return None
+    shard = g.get('shard')
+    if shard is None:
+        if names - PER_DATABASE_TABLES:
+            raise ShardNotSelected(f"No shard selected for {', '.join(sorted(names))}")
+        return None
+    return engines[bind_key(shard)]
+
+
+def select_shard(shard):
+    """Send this app context's user-table statements to ``shard``."""
+    g.shard = shard
+
+
+@contextmanager
+def use_shard(shard):
+    """
+    Select ``shard`` for the block, then restore the previous selection
+
+    The session is closed when the selection changes, so objects and
+    transactions from one database never leak into another.
+    """
+    previous = g.get('shard')
+    if shard != previous:
+        db.session.close()
+    g.shard = shard
+    try:
+        yield shard
+    finally:
+        if shard != previous:
+            db.session.close()
+        g.shard = previous
+
+
+def each_shard():
+    """Run the loop body once per shard with it selected (once, unchanged, without sharding)."""
+    if not shard_count():
+        yield None
+        return
+    for shard in range(shard_count()):
+        with use_shard(shard):
+            yield shard
+
+
+def each_database():
+    """Like each_shard, but starting with the main database."""
+    if shard_count():
+        with use_shard(None):
+            yield None
+    yield from each_shard()
+
+
+def _directory_entry(user_id=None, username=None):
+    from models import ShardDirectory
+
+    query = select(ShardDirectory)
+    if user_id is not None:
+        query = query.where(ShardDirectory.user_id == user_id)
+    else:
+        query = query.where(ShardDirectory.username == username)
+    return db.session.scalar(query)
+
+
+def select_for_user(user_id):
+    """
+    Select the shard holding ``user_id`` for the current request
+
+    Returns:
+        bool: False if sharding is on and the user isn't in the directory
+
+    Raises:
+        UserMoving: The user is being moved to another shard
+    """
+    if not shard_count():
+        return True
+    entry = _directory_entry(user_id=user_id)
+    if entry is None:
+        return False
+    if entry.moving:
+        raise UserMoving(user_id)
+    select_shard(entry.shard)
+    return True
+
+
+def find_user(username):
+    """The User with ``username`` (selecting its shard), or None."""
+    from models import User
+
+    if not shard_count():
+        return User.query.filter_by(username=username).first()
+    entry = _directory_entry(username=username)
+    if entry is None:
+        return None
+    if entry.moving:
+        raise UserMoving(entry.user_id)
+    select_shard(entry.shard)
+    return db.session.get(User, entry.user_id)
+
+
+def allocate(usernames):
+    """
+    Reserve ids and shards for new users in one transaction
+
+    Returns:
+        list: (user_id, shard) per username, or (None, None) each without sharding
+    """
+    from models import ShardDirectory
+
+    if not shard_count():
+        return [(None, None)] * len(usernames)
+    with use_shard(None):
+        entries = [ShardDirectory(username=username, shard=0, moving=False) for username in usernames]
+        db.session.add_all(entries)
+        db.session.flush()
+        for entry in entries:
+            entry.shard = jump_hash(entry.user_id, shard_count())
+        placements = [(entry.user_id, entry.shard) for entry in entries]
+        db.session.commit()
+    return placements
+
+
+def register(username):
+    """
+    Reserve a user id and shard for a new user and select the shard
+
+    Returns:
+        int: The id to create the User with, or None without sharding (the database assigns it)
+    """
+    user_id, shard = allocate([username])[0]
+    if user_id is not None:
+        select_shard(shard)
+    return user_id
+
+
+def release(user_id):
+    """Drop a directory entry whose user could not be created."""
+    from models import ShardDirectory
+
+    if user_id is None or not shard_count():
+        return
+    with use_shard(None):
+        db.session.execute(delete(ShardDirectory).where(ShardDirectory.user_id == user_id))
+        db.session.commit()
+
+
+def user_tables():
+    """(table, user id column) for every table holding a user's rows, parents first."""
+    from models import (Expense, ExpenseDailyRollup, ExpenseMonthlyRollup, FinancialGoal, GoalContribution,
+                        GoalForecast, Income, RecurringExpense, User, UserDataVersion, UserInsight)
+
+    return [(User.__table__, User.__table__.c.id)] + [
+        (model.__table__, model.__table__.c.user_id)
+        for model in (FinancialGoal, GoalContribution, GoalForecast, Expense, Income, RecurringExpense,
+                      ExpenseDailyRollup, ExpenseMonthlyRollup, UserDataVersion, UserInsight)
+    ]
+
+
+def _sync_sequence(connection, table, column='id'):
+    """Move a Postgres id sequence past ids inserted explicitly (SQLite follows max(rowid) itself)."""
+    if connection.dialect.name == 'postgresql':
+        connection.execute(select(func.setval(
+            func.pg_get_serial_sequence(table.name, column),
+            select(func.coalesce(func.max(table.c[column]), 0) + 1).scalar_subquery(),
+            False
+        )))
+
+
+def _copy_user(user_id, source, target, batch_size):
+    """
+    Copy a user's rows from the source to the target connection
+
+    Rows keep their ids unless the id is taken on the target by another user's
+    row. Only those rows get a new id; references to renumbered goals are
+    rewritten.
+
+    Returns:
+        tuple: (rows copied, {table name: {old id: new id}} for the renumbered rows)
+    """
+    from models import FinancialGoal, UserDataVersion
+
+    goal_table = FinancialGoal.__table__
+    renumbered = {}
+    copied = 0
+    for table, user_column in user_tables():
+        has_id = 'id' in table.c and table.c.id is not user_column
+        table_map = {}
+        result = source.execution_options(yield_per=batch_size).execute(select(table).where(user_column == user_id))
+        for rows in result.mappings().partitions():
+            rows = [dict(row) for row in rows]
+            if 'goal_id' in table.c:
+                goal_map = renumbered.get(goal_table.name, {})
+                for row in rows:
+                    row['goal_id'] = goal_map.get(row['goal_id'], row['goal_id'])
+            copied += len(rows)
+            clashes = []
+            if has_id:
+                taken = set(target.scalars(select(table.c.id).where(table.c.id.in_([row['id'] for row in rows]))))
+                clashes = [row for row in rows if row['id'] in taken]
+                rows = [row for row in rows if row['id'] not in taken]
+            if rows:
+                target.execute(insert(table), rows)
+            # After the kept ids, so the new ids (max + 1) can't take one of them
+            for row in clashes:
+                old_id = row.pop('id')
+                table_map[old_id] = target.execute(insert(table).values(**row)).inserted_primary_key[0]
+        if has_id:
+            _sync_sequence(target, table)
+        if table_map:
+            renumbered[table.name] = table_map
+
+    # Responses cached under the old data version must not be served for the moved rows
+    versions = UserDataVersion.__table__
+    target.execute(update(versions).where(versions.c.user_id == user_id)
+                   .values(version=versions.c.version + 1))
+    return copied, renumbered
+
+
+def _delete_user(connection, user_id):
+    for table, user_column in reversed(user_tables()):
+        connection.execute(delete(table).where(user_column == user_id))
+
+
+def move_user(user_id, target, batch_size=COPY_BATCH_SIZE, drain_seconds=DRAIN_SECONDS):
+    """
+    Move every row of a user to the ``target`` shard (inside an app context)
+
+    The user is marked as moving, so its requests get a 503. After
+    drain_seconds the rows are copied to the target in one transaction. The
+    directory is then pointed at the target, and finally the rows are
+    deleted from the source. If the copy fails, the user stays where it was.
+    If the final delete fails, the source keeps stale rows, which a later
+    move to that shard clears first.
+
+    Ids are kept, so bookmarks, pagination cursors and clients' copies stay
+    valid, except for rows whose id another user already has on the target.
+    Those are renumbered and reported in the returned map.
+
+    Returns:
+        tuple: (rows copied, {table name: {old id: new id}}); (0, {}) when the user is already on the target
+    """
+    from models import ShardDirectory
+
+    with use_shard(None):
+        entry = _directory_entry(user_id=user_id)
+        if entry is None:
+            raise ValueError(f'User {user_id} is not in the shard directory')
+        source = entry.shard
+        if source == target:
+            return 0, {}
+        entry.moving = True
+        db.session.commit()
+
+    try:
+        time.sleep(drain_seconds)
+        with engine_for(source).connect() as source_connection, engine_for(target).begin() as target_connection:
+            # Leftovers of an earlier move that failed before cleaning up
+            _delete_user(target_connection, user_id)
+            copied, renumbered = _copy_user(user_id, source_connection, target_connection, batch_size)
+    except BaseException:
+        with use_shard(None):
+            db.session.execute(update(ShardDirectory).where(ShardDirectory.user_id == user_id)
+                               .values(moving=False))
+            db.session.commit()
+        raise
+
+    with use_shard(None):
+        db.session.execute(update(ShardDirectory).where(ShardDirectory.user_id == user_id)
+                           .values(shard=target, moving=False, moved_at=datetime.utcnow()))
+        db.session.commit()
+
+    try:
+        with engine_for(source).begin() as source_connection:
+            _delete_user(source_connection, user_id)
+    except Exception as e:
+        logger.error(f"User {user_id} moved to shard {target} but its rows on shard {source} remain: {e}")
+    for table_name, table_map in renumbered.items():
+        logger.warning(f"User {user_id}: {len(table_map)} {table_name} rows renumbered on shard {target}: {table_map}")
+    return copied, renumbered
+
+
+def backfill(batch_size=COPY_BATCH_SIZE, delete_source=False, limit=None):
+    """
+    Copy the users of the main database into their shards (inside an app context)
+
+    For databases that held every user's rows before sharding was turned on.
+    Each user not yet in the directory is copied, with its ids, to the shard
+    its id hashes to and then entered in the directory, so it can log in
+    again. Run it before serving requests: until a user is entered, they
+    can't log in, and new users could be given a taken id. Users already in
+    the directory are skipped, so an interrupted backfill can be rerun.
+
+    Returns:
+        list: (user_id, shard, rows copied) per user copied
+    """
+    from models import ShardDirectory, User
+
+    users = User.__table__
+    directory = ShardDirectory.__table__
+    main_engine = engine_for(None)
+    copied_users = []
+    last_id = 0
+    while limit is None or len(copied_users) < limit:
+        with main_engine.connect() as main:
+            rows = main.execute(
+                select(users.c.id, users.c.username).where(users.c.id > last_id).order_by(users.c.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            entered = set(main.scalars(
+                select(directory.c.user_id).where(directory.c.user_id.in_([row.id for row in rows]))
+            ))
+        for user_id, username in rows:
+            if user_id in entered:
+                continue
+            shard = jump_hash(user_id, shard_count())
+            with main_engine.connect() as main, engine_for(shard).begin() as target:
+                # Leftovers of an earlier backfill that stopped before entering the user
+                _delete_user(target, user_id)
+                copied, _ = _copy_user(user_id, main, target, batch_size)
+            with main_engine.begin() as main:
+                main.execute(insert(directory).values(user_id=user_id, username=username, shard=shard, moving=False))
+                if delete_source:
+                    _delete_user(main, user_id)
+            copied_users.append((user_id, shard, copied))
+            if limit is not None and len(copied_users) >= limit:
+                break
+    with main_engine.begin() as main:
+        # New users are numbered after the backfilled ones
+        _sync_sequence(main, directory, 'user_id')
+    return copied_users
+
+
+def misplaced_users(limit=None):
+    """(user_id, current shard, hashed shard) for users not on the shard their id hashes to."""
+    from models import ShardDirectory
+
+    count = shard_count()
+    with use_shard(None):
+        rows = db.session.execute(
+            select(ShardDirectory.user_id, ShardDirectory.shard).order_by(ShardDirectory.user_id)
+        )
+        misplaced = []
+        for user_id, shard in rows:
+            wanted = jump_hash(user_id, count)
+            if wanted != shard:
+                misplaced.append((user_id, shard, wanted))
+                if limit is not None and len(misplaced) >= limit:
+                    break
+    return misplaced
+
+
+@click.command('shard-status')
+@with_appcontext
+def shard_status_command():
+    """Show how many users each shard holds."""
+    from models import ShardDirectory
+
+    if not shard_count():
+        raise click.ClickException('SHARD_DATABASE_URLS is not set.')
+    counts = dict(db.session.execute(
+        select(ShardDirectory.shard, func.count()).group_by(ShardDirectory.shard)
+    ).all())
+    for shard in range(shard_count()):
+        click.echo(f'Shard {shard}: {counts.get(shard, 0)} users')
+    click.echo(f'{len(misplaced_users())} users are not on the shard their id hashes to.')
+
+
+@click.command('shard-backfill')
+@click.option('--batch-size', type=int, default=COPY_BATCH_SIZE, show_default=True)
+@click.option('--limit', type=int, default=None, help='Copy at most this many users.')
+@click.option('--delete-source', is_flag=True, help="Delete each user's rows from the main database once copied.")
+@with_appcontext
+def shard_backfill_command(batch_size, limit, delete_source):
+    """Copy the users of an unsharded main database into the shards."""
+    if not shard_count():
+        raise click.ClickException('SHARD_DATABASE_URLS is not set.')
+    try:
+        copied_users = backfill(batch_size, delete_source, limit)
+        for user_id, shard, rows in copied_users:
+            click.echo(f'User {user_id}: copied {rows} rows to shard {shard}')
+        click.echo(f'Backfilled {len(copied_users)} users.')
+    except Exception as e:
+        logger.error(f"Error backfilling shards: {e}")
+        raise click.ClickException(str(e))
+
+
+@click.command('shard-rebalance')
+@click.option('--user-id', type=int, default=None, help='Only move this user.')
+@click.option('--to-shard', type=int, default=None, help='Shard to move --user-id to (defaults to its hashed shard).')
+@click.option('--limit', type=int, default=None, help='Move at most this many users.')
+@click.option('--drain-seconds', type=float, default=DRAIN_SECONDS, show_default=True,
+              help='Wait after marking a user as moving before copying it.')
+@click.option('--batch-size', type=int, default=COPY_BATCH_SIZE, show_default=True)
+@click.option('--dry-run', is_flag=True, help='List the moves without making them.')
+@with_appcontext
+def shard_rebalance_command(user_id, to_shard, limit, drain_seconds, batch_size, dry_run):
+    """Move users' rows to the shard their id hashes to (e.g. after adding shards)."""
+    count = shard_count()
+    if not count:
+        raise click.ClickException('SHARD_DATABASE_URLS is not set.')
+    if to_shard is not None and (user_id is None or not 0 <= to_shard < count):
+        raise click.UsageError(f'--to-shard needs --user-id and must be between 0 and {count - 1}')
+    try:
+        if user_id is not None:
+            entry = _directory_entry(user_id=user_id)
+            if entry is None:
+                raise click.ClickException(f'User {user_id} is not in the shard directory.')
+            target = to_shard if to_shard is not None else jump_hash(user_id, count)
+            moves = [(user_id, entry.shard, target)] if entry.shard != target else []
+        else:
+            moves = misplaced_users(limit)
+
+        for moved_id, source, target in moves:
+            if dry_run:
+                click.echo(f'User {moved_id}: shard {source} -> {target}')
+                continue
+            rows, renumbered = move_user(moved_id, target, batch_size, drain_seconds)
+            click.echo(f'User {moved_id}: moved {rows} rows from shard {source} to {target}')
+            for table_name, table_map in renumbered.items():
+                changes = ', '.join(f'{old}->{new}' for old, new in sorted(table_map.items()))
+                click.echo(f'  Renumbered {table_name} ids: {changes}')
+        click.echo(f"{'Would move' if dry_run else 'Moved'} {len(moves)} users.")
+    except click.ClickException:
+        raise
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error rebalancing shards: {e}")
+        raise click.ClickException(str(e))
@@ -133,12 +133,9 @@ document.addEventListener('DOMContentLoaded', () => {
                 if (selectedCurrency) {
                     // Get user profile
                     try {
-                        const profileResponse = await fetch('/api/profile');
-                        const profileData = await profileResponse.json();
+                        const profile = await getCachedProfile();
                         
-                        if (profileData.success && profileData.profile) {
-                            const profile = profileData.profile;
-                            
+                        if (profile) {
                             // Update currency
                             const response = await fetch('/api/update-profile', {
                                 method: 'POST',
@@ -179,16 +176,50 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
     
-    // Load user profile for currency
-    async function loadUserProfile() {
+    // Data for the whole page from /api/dashboard/bootstrap, loaded once in initDashboard
+    let dashboardBootstrap = null;
+    
+    // Load everything the dashboard needs on page load in a single request
+    async function loadDashboardBootstrap() {
         try {
-            const response = await fetch('/api/profile');
-            if (!response.ok) throw new Error('Failed to fetch profile data');
+            const response = await fetch('/api/dashboard/bootstrap');
+            if (!response.ok) throw new Error('Failed to fetch dashboard data');
             
             const data = await response.json();
+            if (data.success) {
+                dashboardBootstrap = data;
+            }
+        } catch (error) {
+            console.error('Error loading dashboard data:', error);
+        }
+        
+        return dashboardBootstrap;
+    }
+    
+    // Get the user's profile, reusing the bootstrap copy when it's available
+    async function getCachedProfile() {
+        if (dashboardBootstrap && dashboardBootstrap.profile) {
+            return dashboardBootstrap.profile;
+        }
+        
+        const response = await fetch('/api/profile');
+        const data = await response.json();
+        return data.success && data.profile ? data.profile : null;
+    }
+    
+    // Load user profile for currency
+    async function loadUserProfile(preloadedProfile = null) {
+        try {
+            let profile = preloadedProfile;
+            if (!profile) {
+                const response = await fetch('/api/profile');
+                if (!response.ok) throw new Error('Failed to fetch profile data');
+                
+                const data = await response.json();
+                profile = data.success ? data.profile : null;
+            }
             
-            if (data.success && data.profile) {
-                const profile = data.profile;
+            if (profile) {
                 
                 // Cache profile in localStorage for other functions
                 localStorage.setItem('userProfile', JSON.stringify({
@@ -235,14 +266,18 @@ document.addEventListener('DOMContentLoaded', () => {
         if (!currencyList) return;
         
         try {
-            const response = await fetch('/api/currency-options');
-            const data = await response.json();
+            let data;
+            if (dashboardBootstrap && dashboardBootstrap.currencies) {
+                data = { success: true, currencies: dashboardBootstrap.currencies };
+            } else {
+                const response = await fetch('/api/currency-options');
+                data = await response.json();
+            }
             
             if (data.success) {
                 // Get user's current currency
-                const profileResponse = await fetch('/api/profile');
-                const profileData = await profileResponse.json();
-                const currentCurrency = profileData.success && profileData.profile ? profileData.profile.currency : 'INR';
+                const profile = await getCachedProfile();
+                const currentCurrency = profile ? profile.currency : 'INR';
                 
                 // Populate currency options
                 currencyList.innerHTML = '';
@@ -435,7 +470,7 @@ document.addEventListener('DOMContentLoaded', () => {
     }
     
     // Load expense trend data and render chart
-    async function loadExpenseTrend(range = 'monthly') {
+    async function loadExpenseTrend(range = 'monthly', preloadedData = null) {
         console.log(`[DEBUG] Loading expense trend for range: ${range}`);
         
         // Get chart element
@@ -466,23 +501,30 @@ document.addEventListener('DOMContentLoaded', () => {
                 apiUrl = '/api/expense-trend?range=month';
             }
             
-            console.log(`[DEBUG] Fetching data from URL: "${apiUrl}" for range: "${range}"`);
-            
-            // Fetch data from API
-            console.log(`[DEBUG] Sending API request...`);
-            const response = await fetch(apiUrl);
-            console.log(`[DEBUG] API response status:`, response.status, response.statusText);
-            
-            // Remove loading state
-            chartContainer.classList.remove('loading');
-            
-            if (!response.ok) {
-                console.error(`[DEBUG] API response not OK: ${response.status} ${response.statusText}`);
-                showEmptyTrend(trendChartElement);
-                return;
+            let data;
+            if (preloadedData) {
+                // Initial render uses the series from the dashboard bootstrap
+                data = { success: true, ...preloadedData };
+                chartContainer.classList.remove('loading');
+            } else {
+                console.log(`[DEBUG] Fetching data from URL: "${apiUrl}" for range: "${range}"`);
+                
+                // Fetch data from API
+                console.log(`[DEBUG] Sending API request...`);
+                const response = await fetch(apiUrl);
+                console.log(`[DEBUG] API response status:`, response.status, response.statusText);
+                
+                // Remove loading state
+                chartContainer.classList.remove('loading');
+                
+                if (!response.ok) {
+                    console.error(`[DEBUG] API response not OK: ${response.status} ${response.statusText}`);
+                    showEmptyTrend(trendChartElement);
+                    return;
+                }
+                
+                data = await response.json();
             }
-            
-            const data = await response.json();
             console.log(`[DEBUG] API response data:`, JSON.stringify(data, null, 2));
             
             if (!data.success) {
@@ -723,15 +765,13 @@ document.addEventListener('DOMContentLoaded', () => {
         
         try {
             // Get user profile data for monthly income
-            const profileResponse = await fetch('/api/profile');
-            const profileData = await profileResponse.json();
+            const profile = await getCachedProfile();
             
-            if (!profileData.success || !profileData.profile) {
+            if (!profile) {
                 console.error('Failed to load profile data');
                 return;
             }
             
-            const profile = profileData.profile;
             const monthlyIncome = profile.monthlyIncome || 0;
             
             // Get total expenses for the current month
@@ -877,15 +917,13 @@ document.addEventListener('DOMContentLoaded', () => {
         
         try {
             // Get user profile data for savings goal
-            const profileResponse = await fetch('/api/profile');
-            const profileData = await profileResponse.json();
+            const profile = await getCachedProfile();
             
-            if (!profileData.success || !profileData.profile) {
+            if (!profile) {
                 console.error('Failed to load profile data');
                 return;
             }
             
-            const profile = profileData.profile;
             const savingsGoal = profile.savingsGoal || 0;
             
             // Calculate current savings based on income - expenses
@@ -1137,7 +1175,7 @@ document.addEventListener('DOMContentLoaded', () => {
     }
     
     // Update the chart with actual data
-    async function updateFinancialSummaryChart() {
+    async function updateFinancialSummaryChart(preloadedSummary = null) {
         if (!financialSummaryChartInstance) return;
 
         try {
@@ -1146,9 +1184,14 @@ document.addEventListener('DOMContentLoaded', () => {
             const profile = profileData ? JSON.parse(profileData) : { currency: 'INR' };
             const currencySymbol = CURRENCY_SYMBOLS[profile.currency] || '₹';
 
-            // Fetch monthly expense data for the year
-            const response = await fetch('/api/yearly-summary');
-            const data = await response.json();
+            // Fetch monthly expense data for the year, unless the bootstrap already has it
+            let data;
+            if (preloadedSummary) {
+                data = { success: true, ...preloadedSummary };
+            } else {
+                const response = await fetch('/api/yearly-summary');
+                data = await response.json();
+            }
 
             if (data.success) {
                 // Update chart data
@@ -1329,20 +1372,24 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // Load recent expenses
-    function loadRecentExpenses() {
+    function loadRecentExpenses(preloadedExpenses = null) {
         console.log("Loading recent expenses");
         const recentExpensesContainer = document.getElementById('recentExpensesList');
         
         // Show loading state
         recentExpensesContainer.innerHTML = '<tr><td colspan="5" class="loading">Loading recent expenses...</td></tr>';
         
-        fetch('/api/recent-expenses')
-            .then(response => {
-                if (!response.ok) {
-                    throw new Error('Failed to fetch recent expenses');
-                }
-                return response.json();
-            })
+        const request = preloadedExpenses
+            ? Promise.resolve(preloadedExpenses)
+            : fetch('/api/recent-expenses')
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error('Failed to fetch recent expenses');
+                    }
+                    return response.json();
+                });
+        
+        return request
             .then(data => {
                 recentExpensesContainer.innerHTML = '';
                 
@@ -1387,9 +1434,12 @@ document.addEventListener('DOMContentLoaded', () => {
         try {
             console.log(`[DEBUG] Initializing dashboard...`);
             
+            // One request for profile, summary, trend and recent expenses
+            const bootstrap = await loadDashboardBootstrap();
+            
             // Load user profile first
             try {
-                const profile = await loadUserProfile();
+                const profile = await loadUserProfile(bootstrap ? bootstrap.profile : null);
                 console.log(`[DEBUG] User profile loaded:`, profile ? 'success' : 'failed');
             } catch (profileError) {
                 console.error('[DEBUG] Error loading user profile:', profileError);
@@ -1401,7 +1451,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 if (typeof initFinancialSummaryChart === 'function') {
                     initFinancialSummaryChart();
                     if (typeof updateFinancialSummaryChart === 'function') {
-                        await updateFinancialSummaryChart();
+                        await updateFinancialSummaryChart(bootstrap ? bootstrap.yearlySummary : null);
                         console.log(`[DEBUG] Financial summary chart updated`);
                     }
                 }
@@ -1431,7 +1481,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     
                     // Load initial trend chart with monthly data
                     if (typeof loadExpenseTrend === 'function') {
-                        loadExpenseTrend('monthly');
+                        loadExpenseTrend('monthly', bootstrap ? bootstrap.trend : null);
                         console.log(`[DEBUG] Initial expense trend chart loaded (monthly)`);
                     }
                 }
@@ -1442,7 +1492,7 @@ document.addEventListener('DOMContentLoaded', () => {
             // Load recent expenses
             try {
                 if (typeof loadRecentExpenses === 'function') {
-                    await loadRecentExpenses();
+                    await loadRecentExpenses(bootstrap ? bootstrap.recentExpenses : null);
                     console.log(`[DEBUG] Recent expenses loaded`);
                 }
             } catch (expensesError) {
@@ -28,9 +28,12 @@ document.addEventListener('DOMContentLoaded', () => {
     }
     
     // State variables
-    let allExpenses = [];
+    let currentExpenses = [];
     let currentPage = 1;
     const itemsPerPage = 10;
+    // Keyset cursor for the start of each visited page (index 0 = first page)
+    let pageCursors = [null];
+    let hasNextPage = false;
     let currentFilter = 'all';
     let currentSort = 'date-desc';
     let currentDateFilter = 'this-month';
@@ -78,111 +81,97 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
     
-    // Update expense summary with current month data
-    function updateExpenseSummary(expenses) {
-        updateExpenseSummaryWithDateFilter(expenses);
+    // Format a Date as YYYY-MM-DD in local time
+    function formatISODate(date) {
+        const year = date.getFullYear();
+        const month = String(date.getMonth() + 1).padStart(2, '0');
+        const day = String(date.getDate()).padStart(2, '0');
+        return `${year}-${month}-${day}`;
     }
     
-    // Update expense summary with selected date filter
-    function updateExpenseSummaryWithDateFilter(expensesData = null) {
-        const expenses = expensesData || allExpenses;
-        // Get current date information
+    // Resolve the selected date filter into an inclusive start/end range
+    function getDateFilterRange() {
         const today = new Date();
         const currentMonth = today.getMonth(); // 0-11
         const currentYear = today.getFullYear();
         
-        // Filter expenses based on date filter
-        let filteredExpenses = [];
-        let periodLabel = 'This Month';
-        
         switch(currentDateFilter) {
-            case 'this-month':
-                filteredExpenses = expenses.filter(expense => {
-                    const expenseDate = new Date(expense.date);
-                    return expenseDate.getMonth() === currentMonth && 
-                          expenseDate.getFullYear() === currentYear;
-                });
-                periodLabel = 'This Month';
-                break;
             case 'last-month':
-                const lastMonth = currentMonth === 0 ? 11 : currentMonth - 1;
-                const lastMonthYear = currentMonth === 0 ? currentYear - 1 : currentYear;
-                filteredExpenses = expenses.filter(expense => {
-                    const expenseDate = new Date(expense.date);
-                    return expenseDate.getMonth() === lastMonth && 
-                          expenseDate.getFullYear() === lastMonthYear;
-                });
-                periodLabel = 'Last Month';
-                break;
-            case '3-months':
+                return {
+                    start: formatISODate(new Date(currentYear, currentMonth - 1, 1)),
+                    end: formatISODate(new Date(currentYear, currentMonth, 0)),
+                    label: 'Last Month'
+                };
+            case '3-months': {
                 const threeMonthsAgo = new Date();
                 threeMonthsAgo.setMonth(currentMonth - 3);
-                filteredExpenses = expenses.filter(expense => {
-                    const expenseDate = new Date(expense.date);
-                    return expenseDate >= threeMonthsAgo;
-                });
-                periodLabel = 'Last 3 Months';
-                break;
-            case '6-months':
+                return { start: formatISODate(threeMonthsAgo), end: null, label: 'Last 3 Months' };
+            }
+            case '6-months': {
                 const sixMonthsAgo = new Date();
                 sixMonthsAgo.setMonth(currentMonth - 6);
-                filteredExpenses = expenses.filter(expense => {
-                    const expenseDate = new Date(expense.date);
-                    return expenseDate >= sixMonthsAgo;
-                });
-                periodLabel = 'Last 6 Months';
-                break;
+                return { start: formatISODate(sixMonthsAgo), end: null, label: 'Last 6 Months' };
+            }
             case 'this-year':
-                filteredExpenses = expenses.filter(expense => {
-                    const expenseDate = new Date(expense.date);
-                    return expenseDate.getFullYear() === currentYear;
-                });
-                periodLabel = 'This Year';
-                break;
+                return {
+                    start: formatISODate(new Date(currentYear, 0, 1)),
+                    end: formatISODate(new Date(currentYear, 11, 31)),
+                    label: 'This Year'
+                };
             case 'all':
-                filteredExpenses = expenses;
-                periodLabel = 'All Time';
-                break;
+                return { start: null, end: null, label: 'All Time' };
+            case 'this-month':
             default:
-                filteredExpenses = expenses.filter(expense => {
-                    const expenseDate = new Date(expense.date);
-                    return expenseDate.getMonth() === currentMonth && 
-                          expenseDate.getFullYear() === currentYear;
-                });
-                periodLabel = 'This Month';
-        }
-        
-        // Calculate total expenses for the filtered period
-        const total = filteredExpenses.reduce((sum, expense) => sum + expense.amount, 0);
-        
-        // Update the total label to reflect time period
-        const totalLabel = document.querySelector('.expense-summary h3');
-        if (totalLabel) {
-            totalLabel.textContent = `Total Expenses: ${periodLabel}`;
-        }
-        
-        // Update the total amount
-        if (totalMonthlyExpenses) {
-            totalMonthlyExpenses.textContent = `₹${total.toFixed(2)}`;
+                return {
+                    start: formatISODate(new Date(currentYear, currentMonth, 1)),
+                    end: formatISODate(new Date(currentYear, currentMonth + 1, 0)),
+                    label: 'This Month'
+                };
         }
+    }
+    
+    // Build the query string for the current date filter
+    function getDateFilterParams() {
+        const range = getDateFilterRange();
+        const params = new URLSearchParams();
+        if (range.start) params.set('start_date', range.start);
+        if (range.end) params.set('end_date', range.end);
+        if (!range.start && !range.end) params.set('range', 'all');
+        return params;
+    }
+    
+    // Update expense summary with selected date filter
+    async function updateExpenseSummaryWithDateFilter() {
+        const periodLabel = getDateFilterRange().label;
         
-        // Calculate expenses by category for the filtered period
-        const categoryTotals = filteredExpenses.reduce((acc, expense) => {
-            acc[expense.category] = (acc[expense.category] || 0) + expense.amount;
-            return acc;
-        }, {});
-        
-        // Update chart data
-        const categories = Object.keys(categoryTotals);
-        const amounts = Object.values(categoryTotals);
-        
-        console.log(`Chart data updated for ${periodLabel} with ${categories.length} categories`);
-        
-        // Update the chart if it exists
-        if (categoryChart) {
-            categoryChart.data.labels = categories;
-            categoryChart.data.datasets[0].data = amounts;
-            categoryChart.update();
+        try {
+            // Category totals are aggregated server-side for the whole period
+            const response = await fetch(`/api/expense-categories?${getDateFilterParams()}`);
+            const data = await response.json();
+            if (!data.success) return;
+            
+            const categoryTotals = data.categories;
+            const total = categoryTotals.reduce((sum, item) => sum + item.amount, 0);
+            
+            // Update the total label to reflect time period
+            const totalLabel = document.querySelector('.expense-summary h3');
+            if (totalLabel) {
+                totalLabel.textContent = `Total Expenses: ${periodLabel}`;
+            }
+            
+            // Update the total amount
+            if (totalMonthlyExpenses) {
+                totalMonthlyExpenses.textContent = `₹${total.toFixed(2)}`;
+            }
+            
+            // Update the chart if it exists
+            if (categoryChart) {
+                categoryChart.data.labels = categoryTotals.map(item => item.category);
+                categoryChart.data.datasets[0].data = categoryTotals.map(item => item.amount);
+                categoryChart.update();
+            }
+        } catch (error) {
+            console.error('Error loading expense summary:', error);
         }
     }
     
@@ -289,18 +278,40 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
     
-    // Load expenses
+    // Load the current page of expenses from the server
     async function loadExpenses() {
         if (!expensesTable) return;
         
+        const params = getDateFilterParams();
+        params.delete('range');
+        params.set('limit', itemsPerPage);
+        params.set('sort', currentSort);
+        if (currentFilter !== 'all') {
+            params.set('category', currentFilter);
+        }
+        const cursor = pageCursors[currentPage - 1];
+        if (cursor) {
+            params.set('cursor', cursor);
+        }
+        
         try {
-            const response = await fetch('/api/expenses');
+            const response = await fetch(`/api/expenses?${params}`);
             const data = await response.json();
             
             if (data.success) {
-                allExpenses = data.expenses;
-                applyFilterAndSort();
-                updateExpenseSummary(allExpenses);
+                currentExpenses = data.expenses;
+                hasNextPage = data.hasMore;
+                pageCursors[currentPage] = data.nextCursor;
+                
+                // A page emptied by deletes falls back to the previous one
+                if (currentExpenses.length === 0 && currentPage > 1) {
+                    currentPage--;
+                    pageCursors = pageCursors.slice(0, currentPage);
+                    return loadExpenses();
+                }
+                
+                renderExpenses(currentExpenses);
+                renderPagination();
             } else {
                 showNotification('Failed to load expenses. Please refresh the page.', 'error');
             }
@@ -308,106 +319,15 @@ document.addEventListener('DOMContentLoaded', () => {
             console.error('Error loading expenses:', error);
             renderExpenses([]); // Show empty state
         }
-    }
-    
-    // Apply filter and sort
-    function applyFilterAndSort() {
-        // Get current date information
-        const today = new Date();
-        const currentMonth = today.getMonth(); // 0-11
-        const currentYear = today.getFullYear();
-
-        // Apply date filter based on selected option
-        let filteredExpenses = allExpenses.filter(expense => {
-            // Parse the expense date
-            const expenseDate = new Date(expense.date);
-            const expenseMonth = expenseDate.getMonth();
-            const expenseYear = expenseDate.getFullYear();
-            
-            // Apply different date filters based on selection
-            let passesDateFilter = false;
-            
-            switch(currentDateFilter) {
-                case 'this-month':
-                    passesDateFilter = (expenseMonth === currentMonth && expenseYear === currentYear);
-                    break;
-                case 'last-month':
-                    const lastMonth = currentMonth === 0 ? 11 : currentMonth - 1;
-                    const lastMonthYear = currentMonth === 0 ? currentYear - 1 : currentYear;
-                    passesDateFilter = (expenseMonth === lastMonth && expenseYear === lastMonthYear);
-                    break;
-                case '3-months':
-                    // Calculate date 3 months ago
-                    const threeMonthsAgo = new Date();
-                    threeMonthsAgo.setMonth(currentMonth - 3);
-                    passesDateFilter = expenseDate >= threeMonthsAgo;
-                    break;
-                case '6-months':
-                    // Calculate date 6 months ago
-                    const sixMonthsAgo = new Date();
-                    sixMonthsAgo.setMonth(currentMonth - 6);
-                    passesDateFilter = expenseDate >= sixMonthsAgo;
-                    break;
-                case 'this-year':
-                    passesDateFilter = expenseYear === currentYear;
-                    break;
-                case 'all':
-                    passesDateFilter = true;
-                    break;
-                default:
-                    passesDateFilter = (expenseMonth === currentMonth && expenseYear === currentYear);
-            }
-            
-            // Apply category filter if selected
-            const matchesCategory = (currentFilter === 'all' || expense.category === currentFilter);
-            
-            // Include expense if it matches both filters
-            return passesDateFilter && matchesCategory;
-        });
-        
-        console.log(`Filtered to ${filteredExpenses.length} expenses with date filter: ${currentDateFilter} and category: ${currentFilter}`);
-        
-        // Apply sorting
-        const [sortBy, sortOrder] = currentSort.split('-');
-        
-        filteredExpenses.sort((a, b) => {
-            if (sortBy === 'date') {
-                return sortOrder === 'asc' 
-                    ? new Date(a.date) - new Date(b.date)
-                    : new Date(b.date) - new Date(a.date);
-            } else if (sortBy === 'amount') {
-                return sortOrder === 'asc'
-                    ? a.amount - b.amount
-                    : b.amount - a.amount;
-            }
-            return 0;
-        });
         
-        // Render with pagination
-        renderPaginatedExpenses(filteredExpenses);
+        updateExpenseSummaryWithDateFilter();
     }
     
-    // Render paginated expenses
-    function renderPaginatedExpenses(expenses) {
-        const totalPages = Math.ceil(expenses.length / itemsPerPage);
-        
-        // Adjust current page if needed
-        if (currentPage > totalPages) {
-            currentPage = totalPages || 1;
-        }
-        
-        // Calculate slice indices
-        const startIndex = (currentPage - 1) * itemsPerPage;
-        const endIndex = startIndex + itemsPerPage;
-        
-        // Get expenses for current page
-        const paginatedExpenses = expenses.slice(startIndex, endIndex);
-        
-        // Render expenses
-        renderExpenses(paginatedExpenses);
-        
-        // Render pagination controls
-        renderPagination(totalPages);
+    // Apply filter and sort, starting again from the first page
+    function applyFilterAndSort() {
+        currentPage = 1;
+        pageCursors = [null];
+        loadExpenses();
     }
     
     // Render expenses in table
@@ -522,12 +442,12 @@ document.addEventListener('DOMContentLoaded', () => {
     }
     
     // Render pagination controls
-    function renderPagination(totalPages) {
+    function renderPagination() {
         if (!paginationContainer) return;
         
         paginationContainer.innerHTML = '';
         
-        if (totalPages <= 1) return;
+        if (currentPage === 1 && !hasNextPage) return;
         
         // Previous button
         const prevButton = document.createElement('button');
@@ -540,85 +460,29 @@ document.addEventListener('DOMContentLoaded', () => {
         prevButton.addEventListener('click', () => {
             if (currentPage > 1) {
                 currentPage--;
-                applyFilterAndSort();
+                loadExpenses();
             }
         });
         paginationContainer.appendChild(prevButton);
         
-        // Page buttons
-        const maxButtonsToShow = 5;
-        let startPage = Math.max(1, currentPage - Math.floor(maxButtonsToShow / 2));
-        let endPage = Math.min(totalPages, startPage + maxButtonsToShow - 1);
-        
-        // Adjust start page if needed
-        if (endPage - startPage + 1 < maxButtonsToShow) {
-            startPage = Math.max(1, endPage - maxButtonsToShow + 1);
-        }
-        
-        // First page button if needed
-        if (startPage > 1) {
-            const firstPageBtn = document.createElement('button');
-            firstPageBtn.className = 'pagination-item';
-            firstPageBtn.textContent = '1';
-            firstPageBtn.addEventListener('click', () => {
-                currentPage = 1;
-                applyFilterAndSort();
-            });
-            paginationContainer.appendChild(firstPageBtn);
-            
-            // Add ellipsis if needed
-            if (startPage > 2) {
-                const ellipsis = document.createElement('span');
-                ellipsis.className = 'pagination-ellipsis';
-                ellipsis.textContent = '...';
-                paginationContainer.appendChild(ellipsis);
-            }
-        }
-        
-        // Page number buttons
-        for (let i = startPage; i <= endPage; i++) {
-            const pageBtn = document.createElement('button');
-            pageBtn.className = `pagination-item ${i === currentPage ? 'active' : ''}`;
-            pageBtn.textContent = i;
-            pageBtn.addEventListener('click', () => {
-                currentPage = i;
-                applyFilterAndSort();
-            });
-            paginationContainer.appendChild(pageBtn);
-        }
-        
-        // Last page button if needed
-        if (endPage < totalPages) {
-            // Add ellipsis if needed
-            if (endPage < totalPages - 1) {
-                const ellipsis = document.createElement('span');
-                ellipsis.className = 'pagination-ellipsis';
-                ellipsis.textContent = '...';
-                paginationContainer.appendChild(ellipsis);
-            }
-            
-            const lastPageBtn = document.createElement('button');
-            lastPageBtn.className = 'pagination-item';
-            lastPageBtn.textContent = totalPages;
-            lastPageBtn.addEventListener('click', () => {
-                currentPage = totalPages;
-                applyFilterAndSort();
-            });
-            paginationContainer.appendChild(lastPageBtn);
-        }
+        // Current page indicator
+        const pageBtn = document.createElement('button');
+        pageBtn.className = 'pagination-item active';
+        pageBtn.textContent = currentPage;
+        paginationContainer.appendChild(pageBtn);
         
         // Next button
         const nextButton = document.createElement('button');
-        nextButton.className = `pagination-item ${currentPage === totalPages ? 'disabled' : ''}`;
+        nextButton.className = `pagination-item ${hasNextPage ? '' : 'disabled'}`;
         nextButton.innerHTML = `
             <svg xmlns="http://www.w3.org/2000/svg" width="16" height="16" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
                 <polyline points="9 18 15 12 9 6"></polyline>
             </svg>
         `;
         nextButton.addEventListener('click', () => {
-            if (currentPage < totalPages) {
+            if (hasNextPage) {
                 currentPage++;
-                applyFilterAndSort();
+                loadExpenses();
             }
         });
         paginationContainer.appendChild(nextButton);
@@ -640,9 +504,6 @@ document.addEventListener('DOMContentLoaded', () => {
             currentDateFilter = dateFilter.value;
             currentPage = 1; // Reset to first page
             applyFilterAndSort();
-            
-            // Update expense summary based on date filter
-            updateExpenseSummaryWithDateFilter();
         });
     }
     
@@ -772,19 +633,21 @@ document.addEventListener('DOMContentLoaded', () => {
                 
                 try {
                     if (isMultiple) {
-                        // Handle multiple delete
+                        // Handle multiple delete in a single request
                         const idsToDelete = JSON.parse(idInput.value);
-                        let successCount = 0;
+                        const response = await fetch('/api/expenses/bulk-delete', {
+                            method: 'POST',
+                            headers: {
+                                'Content-Type': 'application/json'
+                            },
+                            body: JSON.stringify({ ids: idsToDelete.map(Number) })
+                        });
                         
-                        for (const id of idsToDelete) {
-                            const response = await fetch(`/api/expenses/${id}`, {
-                                method: 'DELETE'
-                            });
-                            
-                            if (response.ok) {
-                                successCount++;
-                            }
+                        const data = await response.json();
+                        if (!data.success) {
+                            throw new Error(data.message || 'Bulk delete failed');
                         }
+                        const successCount = data.deleted;
                         
                         // Close the modal
                         deleteConfirmModal.classList.remove('show');
@@ -1,6 +1,46 @@
 """
 Utility functions for the financial assistant application
 """
+import logging
+from datetime import datetime
+
+import numpy as np
+
+def parse_expense_data(data):
+    """
+    Validate and convert raw expense fields, as accepted by the add expense API
+    
+    Args:
+        data: A dictionary with amount, category, description and date (YYYY-MM-DD)
+    
+    Returns:
+        dict: amount, category, description and date ready for an Expense row
+    
+    Raises:
+        ValueError: With a user facing message if a field is missing or invalid
+    """
+    try:
+        amount = float(data.get('amount'))
+    except (TypeError, ValueError):
+        amount = None
+    category = data.get('category')
+    description = data.get('description', '') or ''
+    date_str = data.get('date')
+    
+    if not amount or not category or not date_str:
+        raise ValueError('Missing required fields')
+    
+    try:
+        date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('Invalid date format. Use YYYY-MM-DD.')
+    
+    return {
+        'amount': amount,
+        'category': category,
+        'description': description,
+        'date': date
+    }
 
 def generate_financial_advice(user_profile):
     """
@@ -57,6 +97,9 @@ def analyze_spending_patterns(expenses):
     """
     Analyze spending patterns from expense data
     
+    For a user's full history, prefer analytics.analyze over the daily rollup,
+    which avoids building the list of records at all.
+    
     Args:
         expenses: List of expense records
         
@@ -67,22 +110,21 @@ def analyze_spending_patterns(expenses):
         return None
         
     try:
-        # Group expenses by category
-        categories = {}
-        for expense in expenses:
-            category = expense.get('category', 'Other')
-            amount = float(expense.get('amount', 0))
-            if category in categories:
-                categories[category] += amount
-            else:
-                categories[category] = amount
-                
+        # Group expenses by category as int codes so the totals are one bincount
+        amounts = np.fromiter((float(expense.get('amount', 0)) for expense in expenses),
+                              dtype=np.float64, count=len(expenses))
+        names, codes = np.unique([expense.get('category', 'Other') for expense in expenses],
+                                 return_inverse=True)
+        totals = np.bincount(codes, weights=amounts, minlength=len(names))
+        
         # Find top spending categories
-        sorted_categories = sorted(categories.items(), key=lambda x: x[1], reverse=True)
+        order = np.argsort(-totals, kind='stable')
+        sorted_categories = [(str(names[index]), float(totals[index])) for index in order]
         
         # Calculate percentage distribution
-        total_spend = sum(categories.values())
-        distribution = {cat: (amt/total_spend)*100 for cat, amt in categories.items()}
+        total_spend = float(totals.sum())
+        shares = totals / total_spend * 100 if total_spend else np.zeros_like(totals)
+        distribution = {str(name): float(share) for name, share in zip(names, shares)}
         
         return {
             'top_categories': sorted_categories[:3],